@@ -0,0 +1,144 @@
+from argparse import ArgumentParser
+from os.path import abspath, dirname
+from random import Random
+import sys
+from time import perf_counter
+
+import pandas as pd
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from wdpd.helper import get_actions
+from wdpd.query import EDIT_SUMMARY_COLUMNS, _amend_edit_summaries
+
+
+# benchmark and equivalence fuzz of the single-pass edit summary parser against the four-pass
+# implementation it replaced; run from the repository root: python benchmarks/edit_summaries.py
+
+FREE_TEXT_FRAGMENTS = [ 'a', 'b', ' ', '|', '||', ':', '*/', ' */', '/*', '/* ', '\n', '\\2', 'ü', '0', '42', 'Q42',
+                        '[[Property:P14]]: ', '[[Property:P31]]:', '[[Q5]]', '#quickstatements', ', ', '-' ]
+MISSING = '<missing>'
+
+
+#### previous implementation
+def _baseline_broad_category(magic_action:str, actions:dict[str, list[str]]) -> str:
+    generic_actions = ['allclaims', 'terms', 'allsitelinks']
+    for key in actions:
+        if magic_action in actions[key] and magic_action not in generic_actions:
+            return key
+    return 'NO_CAT'
+
+
+def baseline_amend_edit_summaries(unpatrolled_changes:pd.DataFrame, actions:dict[str, list[str]]) -> pd.DataFrame:
+    unpatrolled_changes = unpatrolled_changes.merge(
+        right=unpatrolled_changes['comment_text'].str.extract(pat=r'^\/\* ((?<!\*\/).+?) \*\/ ?(.*)?', expand=True),
+        how='left',
+        left_index=True,
+        right_index=True
+    ).rename(columns={ 0 : 'editsummary-magic', 1 : 'editsummary-free' })
+
+    unpatrolled_changes = unpatrolled_changes.merge(
+        right=unpatrolled_changes['editsummary-magic'].str.extract(pat=r'^([a-z\-]+):(.*)', expand=True),
+        how='left',
+        left_index=True,
+        right_index=True
+    ).rename(columns={ 0 : 'editsummary-magic-action', 1 : 'editsummary-magic-rest' })
+
+    unpatrolled_changes = unpatrolled_changes.merge(
+        right=unpatrolled_changes['editsummary-magic-rest'].str.extract(
+            pat=r'^([\d]+)\|([^\|]+)?[\|]?([^\|]+)?[\|]?([^\|]+)?',
+            expand=True
+        ),
+        how='left',
+        left_index=True,
+        right_index=True
+    ).rename(columns={ 0 : 'editsummary-magic-param0', 1 : 'editsummary-magic-param1',
+                       2 : 'editsummary-magic-param2', 3 : 'editsummary-magic-param3' })
+
+    filt_merge = (unpatrolled_changes['editsummary-magic-action'].isin(actions['allclaims']))
+    unpatrolled_changes = unpatrolled_changes.merge(
+        right=unpatrolled_changes.loc[filt_merge, 'editsummary-free'].str.extract(pat=r'^\[\[Property:(P\d+)]]: (.*)$', expand=True),
+        how='left',
+        left_index=True,
+        right_index=True
+    ).rename(columns={ 0 : 'editsummary-free-property', 1 : 'editsummary-free-value' })
+
+    unpatrolled_changes['editsummary-magic-action-broad'] = \
+        unpatrolled_changes['editsummary-magic-action'].apply(_baseline_broad_category, args=(actions,))
+
+    return unpatrolled_changes
+
+
+#### synthetic corpus
+def _random_text(rnd:Random, max_fragments:int) -> str:
+    return ''.join(rnd.choices(FREE_TEXT_FRAGMENTS, k=rnd.randint(0, max_fragments)))
+
+
+def make_corpus(rows:int, actions:dict[str, list[str]], seed:int) -> pd.DataFrame:
+    rnd = Random(seed)
+    magic_actions = sorted({ magic_action for magic_action_list in actions.values() for magic_action in magic_action_list })
+    magic_actions += [ 'unknown-action', 'wbsetclaim-' ]
+
+    comments = []
+    for _ in range(rows):
+        kind = rnd.random()
+        if kind < 0.05:  # no magic part
+            comments.append(_random_text(rnd, 8))
+            continue
+
+        params = '|'.join([ _random_text(rnd, 2) for _ in range(rnd.randint(0, 4)) ])
+        magic = f'{rnd.choice(magic_actions)}:{rnd.choice(["", "0", "1", "2"])}{"|" if rnd.random() < 0.9 else ""}{params}'
+        if kind < 0.08:  # malformed magic part
+            magic = _random_text(rnd, 4)
+
+        free = _random_text(rnd, 6)
+        if rnd.random() < 0.5:
+            free = f'[[Property:P{rnd.randint(1, 9999)}]]: {free}'
+        comments.append(f'/* {magic} */{rnd.choice(["", " "])}{free}')
+
+    return pd.DataFrame(data={ 'comment_text' : comments })
+
+
+#### comparison
+def count_differences(expected:pd.DataFrame, actual:pd.DataFrame) -> int:
+    differences = 0
+    for column in EDIT_SUMMARY_COLUMNS.values():
+        expected_values = expected[column].astype('object').where(expected[column].notna(), MISSING)
+        actual_values = actual[column].astype('object').where(actual[column].notna(), MISSING)
+        filt = (expected_values!=actual_values)
+        if filt.any():
+            row = filt.idxmax()
+            print(f'  {column}: {filt.sum()} differences, e.g. {expected.loc[row, "comment_text"]!r}: ' \
+                  f'expected {expected_values[row]!r}, got {actual_values[row]!r}')
+        differences += int(filt.sum())
+
+    return differences
+
+
+def main() -> None:
+    parser = ArgumentParser(description='Benchmark and fuzz the edit summary parser against the previous implementation')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='rows of the benchmark corpus')
+    parser.add_argument('--fuzz-rows', type=int, default=200_000, help='rows per fuzz round')
+    parser.add_argument('--fuzz-rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    actions = get_actions()
+
+    differences = 0
+    for fuzz_round in range(args.fuzz_rounds):
+        corpus = make_corpus(args.fuzz_rows, actions, seed=fuzz_round)
+        print(f'Fuzz round {fuzz_round+1}/{args.fuzz_rounds} with {args.fuzz_rows} rows')
+        differences += count_differences(baseline_amend_edit_summaries(corpus.copy(), actions), _amend_edit_summaries(corpus.copy(), actions))
+    print(f'{differences} differences in total')
+
+    corpus = make_corpus(args.rows, actions, seed=args.fuzz_rounds)
+    for name, amend_edit_summaries in [ ('previous', baseline_amend_edit_summaries), ('single pass', _amend_edit_summaries) ]:
+        t_start = perf_counter()
+        amend_edit_summaries(corpus.copy(), actions)
+        print(f'{name}: {perf_counter()-t_start:.1f} sec for {args.rows} rows')
+
+    sys.exit(1 if differences > 0 else 0)
+
+
+if __name__ == '__main__':
+    main()
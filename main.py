@@ -9,41 +9,53 @@ logging.config.fileConfig('./logging.conf')
 import wdpd.query as query
 import wdpd.plot as plot
 import wdpd.dump as dump
-from wdpd.config import DEBUG, PLOT_WINDOW_DAYS
-from wdpd.helper import dump_update_timestamp, get_actions, init_directories, df_info
+from wdpd.config import DEBUG, PLOT_WINDOW_DAYS, TASK_WORKERS
+from wdpd.helper import TaskGraph, dump_update_timestamp, start_run_metrics, dump_run_metrics, remove_stale_outputs, \
+    dump_output_manifest, get_actions, init_directories, df_info
 
 
 LOG = logging.getLogger()
 
 
+def query_top_patrollers_since_first_change(unpatrolled_changes:pd.DataFrame) -> pd.DataFrame:
+    return query.query_top_patrollers(int(unpatrolled_changes['time'].min().strftime('%Y%m%d%H%M%S')))
+
+
 def main() -> None:
     LOG.info('Script execution started')
+    start_run_metrics()
 
     #### Aux variables
     start_timestamp = time()
     actions=get_actions()
     init_directories()
 
-    #### Query data
+    #### Query data; dumps that need slow fetches run as soon as their inputs are ready
     LOG.info('Start querying data')
-    change_tags = query.query_change_tags()
-    ores_scores = query.query_ores_scores()
-    unpatrolled_changes = query.get_unpatrolled_changes(change_tags, ores_scores, actions)
-    top_patrollers = query.query_top_patrollers(int(unpatrolled_changes['time'].min().strftime('%Y%m%d%H%M%S')))
-    block_history = query.query_block_history()
-    current_user_blocks = query.query_current_blocks()
-    highly_used_items_toplist = query.retrieve_highly_used_item_list()
-    rfd_links = query.retrieve_wdrfd_links()
-    unpatrolled_changes_not_ns0 = query.query_unpatrolled_changes_outside_main_namespace()
-    translation_pages = query.query_translation_pages()
-
-    patrol_progress = query.compile_patrol_progress(unpatrolled_changes, top_patrollers)
-
-    #### debugging
-    if DEBUG is True:
-        dataframes = [unpatrolled_changes, change_tags, ores_scores, top_patrollers, block_history, current_user_blocks, highly_used_items_toplist, unpatrolled_changes_not_ns0, patrol_progress]
-        for dataframe in dataframes:
-            df_info(dataframe)
+    plot.start_plot_workers()
+    tasks = TaskGraph(TASK_WORKERS)
+    tasks.submit('unpatrolled_changes', query.get_unpatrolled_changes, actions)
+    tasks.submit('change_tag_counts', query.query_change_tag_counts)
+    tasks.submit('top_patrollers', query_top_patrollers_since_first_change, after=['unpatrolled_changes'])
+    tasks.submit('block_history', query.get_block_history)
+    tasks.submit('current_user_blocks', query.query_current_blocks)
+    tasks.submit('highly_used_items_toplist', query.retrieve_highly_used_item_list)
+    tasks.submit('rfd_links', query.retrieve_wdrfd_links)
+    tasks.submit('unpatrolled_changes_not_ns0', query.query_unpatrolled_changes_outside_main_namespace)
+    tasks.submit('translation_pages', query.query_translation_pages)
+
+    tasks.submit('patrol_progress', query.compile_patrol_progress, after=['unpatrolled_changes', 'top_patrollers'])
+    tasks.submit('dump_users_with_block_history', dump.dump_users_with_block_history, \
+                 after=['unpatrolled_changes', 'block_history', 'current_user_blocks'])
+    tasks.submit('dump_highly_used_items', dump.dump_highly_used_items, after=['unpatrolled_changes', 'highly_used_items_toplist'])
+    tasks.submit('dump_rfd_linked_items', dump.dump_rfd_linked_items, after=['unpatrolled_changes', 'rfd_links'])
+    tasks.submit('dump_top_patrollers', dump.dump_top_patrollers, after=['unpatrolled_changes', 'top_patrollers'])
+    tasks.submit('dump_change_tags_list', dump.dump_change_tags_list, after=['change_tag_counts'])
+    tasks.submit('patrol_delay_stats', query.compile_patrol_delay_stats, after=['patrol_progress'])
+    tasks.submit('dump_patrol_progress_stats', dump.make_all_patrol_progress_stats, after=['patrol_delay_stats'])
+    tasks.submit('make_not_ns0_stats', dump.make_not_ns0_stats, after=['unpatrolled_changes_not_ns0', 'translation_pages'])
+
+    unpatrolled_changes = tasks.result('unpatrolled_changes')
 
     #### plot variables
     LOG.info('Start plotting data')
@@ -59,27 +71,29 @@ def main() -> None:
     }
 
     #### Plotting
-    ymax = plot.plot_edits_by_date(unpatrolled_changes, plot_params)
-    plot.plot_edits_by_weekday(unpatrolled_changes, plot_params, ymax)
-    plot.plot_edits_by_hour(unpatrolled_changes, plot_params)
+    plot_cube = plot.compile_plot_cube(unpatrolled_changes, plot_params)
 
-    ymax = plot.plot_patrol_status_by_date(unpatrolled_changes, plot_params)
-    plot.plot_patrol_status_by_weekday(unpatrolled_changes, plot_params, ymax)
-    plot.plot_patrol_status_by_hour(unpatrolled_changes, plot_params)
+    ymax_job = plot.plot_edits_by_date(plot_cube, plot_params)
+    plot.plot_edits_by_weekday(plot_cube, after=ymax_job)
+    plot.plot_edits_by_hour(plot_cube)
 
-    ymax = plot.plot_editor_status_by_date(unpatrolled_changes, plot_params)
-    plot.plot_editor_status_by_weekday(unpatrolled_changes, plot_params, ymax)
-    plot.plot_editor_status_by_hour(unpatrolled_changes, plot_params)
+    ymax_job = plot.plot_patrol_status_by_date(plot_cube, plot_params)
+    plot.plot_patrol_status_by_weekday(plot_cube, after=ymax_job)
+    plot.plot_patrol_status_by_hour(plot_cube)
+
+    ymax_job = plot.plot_editor_status_by_date(plot_cube, plot_params)
+    plot.plot_editor_status_by_weekday(plot_cube, after=ymax_job)
+    plot.plot_editor_status_by_hour(plot_cube)
 
     # technical edit characteristics
-    plot.plot_unpatrolled_actions_by_date(unpatrolled_changes, plot_params)
-    plot.plot_reverted_by_date(unpatrolled_changes, change_tags, plot_params)
+    plot.plot_unpatrolled_actions_by_date(plot_cube, plot_params)
+    plot.plot_reverted_by_date(unpatrolled_changes, plot_params)
     plot.plot_qid_bin_by_revisions(unpatrolled_changes)
     plot.plot_qid_bin_by_item(unpatrolled_changes)
 
     # editorial edit characteristics
-    plot.plot_broad_action_by_date(unpatrolled_changes, plot_params)
-    plot.plot_broad_action_by_patrol_status(unpatrolled_changes, plot_params)
+    plot.plot_broad_action_by_date(plot_cube, plot_params)
+    plot.plot_broad_action_by_patrol_status(plot_cube)
     plot.plot_language_by_patrol_status(unpatrolled_changes, actions['terms'])
     plot.plot_property_by_patrol_status(unpatrolled_changes, actions['allclaims'])
     plot.plot_sitelink_by_patrol_status(unpatrolled_changes, actions['allsitelinks'])
@@ -97,30 +111,16 @@ def main() -> None:
     plot.plot_ores_heatmaps(unpatrolled_changes)
 
     # worklist
-    plot.plot_remaining_by_date(unpatrolled_changes, plot_params)
+    plot.plot_remaining_by_date(plot_cube, plot_params)
 
     #### Dump worklists
     LOG.info('Start dumping data')
-    filt_today = (unpatrolled_changes['time']>=pd.Timestamp.today().floor('D'))
-    filt_3d_rolling = (unpatrolled_changes['time']>=pd.Timestamp.today()-pd.to_timedelta('3 days'))
-    filt_7d_rolling = (unpatrolled_changes['time']>=pd.Timestamp.today()-pd.to_timedelta('7 days'))
-    filt_14d_rolling = (unpatrolled_changes['time']>=pd.Timestamp.today()-pd.to_timedelta('14 days'))
-    filt_all = (unpatrolled_changes['time']>=pd.Timestamp.today()-pd.to_timedelta('31 days'))
-    filt_suggested = unpatrolled_changes['suggested_edit'].notna()
-
-    dump.dump_worklist(unpatrolled_changes, filt_today, 'today')
-    dump.dump_worklist(unpatrolled_changes, filt_3d_rolling, '3d')
-    dump.dump_worklist(unpatrolled_changes, filt_7d_rolling, '7d')
-    dump.dump_worklist(unpatrolled_changes, filt_14d_rolling, '14d')
-    dump.dump_worklist(unpatrolled_changes, filt_all, 'all')
-    dump.dump_worklist(unpatrolled_changes, filt_suggested, 'suggested-edit')
+    dump.dump_worklists(unpatrolled_changes)
 
     dump.dump_ores_worklist_unregistered(unpatrolled_changes)
     dump.dump_ores_worklist_registered(unpatrolled_changes)
     dump.dump_items_with_many_revisions(unpatrolled_changes)
     dump.dump_users_with_many_creations(unpatrolled_changes)
-    dump.dump_users_with_block_history(unpatrolled_changes, block_history, current_user_blocks)
-    dump.dump_highly_used_items(unpatrolled_changes, highly_used_items_toplist)
     dump.term_dump_processor(unpatrolled_changes, actions['terms'])
     dump.term_in_editentity_dump_processor(unpatrolled_changes)
     dump.term_in_editentity_create_dump_processor(unpatrolled_changes)
@@ -129,22 +129,34 @@ def main() -> None:
     dump.project_pageremovals_dump_processor(unpatrolled_changes, actions['sitelinkmove'])
     dump.editentity_dump_processor(unpatrolled_changes, actions['editentity'])
     dump.dump_uncategorizable_editsummaries(unpatrolled_changes)
-    dump.dump_top_patrollers(unpatrolled_changes, top_patrollers)
-    dump.dump_change_tags_list(change_tags)
-    dump.dump_rfd_linked_items(unpatrolled_changes, rfd_links)
     dump.dump_actions(actions)
+    dump.dump_snapshot(unpatrolled_changes)
 
     #### Patrol progress statistics
-    dump.make_all_patrol_progress_stats(patrol_progress)
-    plot.make_all_patrol_progress_stats(patrol_progress)
-
-    #### Not ns0
-    dump.make_not_ns0_stats(unpatrolled_changes_not_ns0, translation_pages)
+    plot.make_all_patrol_progress_stats(tasks.result('patrol_progress'), tasks.result('patrol_delay_stats'))
 
     # this is relatively expensive:
     dump.property_dump_processor(unpatrolled_changes, actions['allclaims'])
 
+    #### Render all scheduled plots
+    plot.render_plots()
+
+    #### Wait for the remaining fetches and dumps
+    task_results = tasks.results()
+    query.close_replica_connections()
+
+    #### debugging
+    if DEBUG is True:
+        dataframes = [ result for result in task_results.values() if isinstance(result, pd.DataFrame) ]
+        for dataframe in dataframes:
+            df_info(dataframe)
+
     dump_update_timestamp(start_timestamp)
+    dump_run_metrics()
+
+    #### Remove outputs that have not been written in this run
+    remove_stale_outputs()
+    dump_output_manifest()
 
 
 if __name__ == '__main__':
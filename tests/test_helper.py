@@ -0,0 +1,94 @@
+import ipaddress
+from os import makedirs
+from os.path import dirname, isdir, isfile
+
+from numpy import array as np_array
+import pandas as pd
+
+from wdpd.helper import IpRangeIndex, OutputWriter, classify_user_names
+
+
+def _range_index(ranges:list[str]) -> IpRangeIndex:
+    classified_ranges = classify_user_names(pd.Series(ranges, dtype='object'))
+    return IpRangeIndex(
+        classified_ranges['ip_version'].to_numpy(),
+        classified_ranges['range_start'].to_numpy(dtype='object'),
+        classified_ranges['range_end'].to_numpy(dtype='object')
+    )
+
+
+def _count_containing(range_index:IpRangeIndex, user_names:list[str]) -> list[int]:
+    classified_user_names = classify_user_names(pd.Series(user_names, dtype='object'))
+    return range_index.count_containing(
+        classified_user_names['ip_version'].to_numpy(),
+        classified_user_names['range_start'].to_numpy()
+    ).tolist()
+
+
+def test_classify_user_names():
+    user_names = pd.Series([ 'Example', '192.0.2.1', '192.0.2.0/24', '2001:db8::1', '2001:db8::/32', 'Cafe', '1.2.3', None, 'Example' ])
+
+    classified_user_names = classify_user_names(user_names)
+
+    assert classified_user_names.index.equals(user_names.index)
+    assert classified_user_names['user_type'].tolist() == [ 'registered', 'ipv4', 'ipv4range', 'ipv6', 'ipv6range',
+                                                            'registered', 'registered', 'registered', 'registered' ]
+    assert classified_user_names['ip_version'].tolist() == [ 0, 4, 4, 6, 6, 0, 0, 0, 0 ]
+    assert classified_user_names['range_start'].tolist() == [ None, int(ipaddress.ip_address('192.0.2.1')),
+                                                              int(ipaddress.ip_address('192.0.2.0')), int(ipaddress.ip_address('2001:db8::1')),
+                                                              int(ipaddress.ip_address('2001:db8::')), None, None, None, None ]
+    assert classified_user_names.loc[4, 'range_end'] == int(ipaddress.ip_address('2001:db8:ffff:ffff:ffff:ffff:ffff:ffff'))
+
+
+def test_classify_user_names_of_non_strict_ranges():
+    # block targets with host bits set are normalized to their network
+    classified_user_names = classify_user_names(pd.Series([ '192.0.2.77/24' ]))
+
+    assert classified_user_names.loc[0, 'range_start'] == int(ipaddress.ip_address('192.0.2.0'))
+    assert classified_user_names.loc[0, 'range_end'] == int(ipaddress.ip_address('192.0.2.255'))
+
+
+def test_ip_range_index_boundaries():
+    range_index = _range_index([ '192.0.2.0/24', '192.0.2.128/25' ])
+
+    user_names = [ '192.0.1.255', '192.0.2.0', '192.0.2.127', '192.0.2.128', '192.0.2.255', '192.0.3.0' ]
+    assert _count_containing(range_index, user_names) == [ 0, 1, 1, 2, 2, 0 ]
+
+
+def test_ip_range_index_keeps_ip_versions_apart():
+    # ::c000:200 is the same integer as 192.0.2.0
+    range_index = _range_index([ '192.0.2.0/24', '2001:db8::/32' ])
+
+    user_names = [ '::c000:200', '192.0.2.0', '2001:db8::', '2001:db8:ffff:ffff:ffff:ffff:ffff:ffff', '2001:db9::', 'Example' ]
+    assert _count_containing(range_index, user_names) == [ 0, 1, 1, 1, 0, 0 ]
+
+
+def test_empty_ip_range_index():
+    range_index = _range_index([])
+
+    assert _count_containing(range_index, [ '192.0.2.1', '2001:db8::1', 'Example' ]) == [ 0, 0, 0 ]
+    assert range_index.count_containing(np_array([], dtype='int8'), np_array([], dtype='object')).tolist() == []
+
+
+def test_remove_stale_files_within_per_key_directories(tmp_path):
+    # previous run: a fixed-name output, a per-key output and a snapshot partition; this run only rewrote the per-key directory
+    per_key_directory, snapshot_directory = f'{tmp_path}/term/', f'{tmp_path}/snapshot/'
+    fixed_filename = f'{tmp_path}/worklist.tsv'
+    per_key_filenames = [ f'{per_key_directory}worklist-de-terms-head.tsv', f'{per_key_directory}worklist-en-terms-head.tsv' ]
+    partition_filename = f'{snapshot_directory}rc_patrolled=0/broad=label/part-0.parquet'
+
+    output_writer = OutputWriter(f'{tmp_path}/manifest.json')
+    makedirs(dirname(partition_filename))
+    makedirs(per_key_directory)
+    for filename in [ fixed_filename, *per_key_filenames, partition_filename ]:
+        output_writer.write_text(filename, filename)
+    output_writer.dump_manifest()
+
+    output_writer.write_text(per_key_filenames[0], 'changed')
+    output_writer.remove_stale_files([ per_key_directory, snapshot_directory ])
+
+    assert isfile(fixed_filename)
+    assert isfile(per_key_filenames[0])
+    assert not isfile(per_key_filenames[1])
+    assert not isdir(f'{snapshot_directory}rc_patrolled=0')
+    assert isdir(snapshot_directory)
@@ -0,0 +1,82 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip('mariadb')
+
+import wdpd.query as query
+
+
+def _changes(rc_ids:list[int]) -> pd.DataFrame:
+    return pd.DataFrame(data={ 'rc_id' : rc_ids, 'rc_patrolled' : [ 0 ] * len(rc_ids) })
+
+
+def _change_flags(rc_ids:list[int], reverted:list[str]) -> pd.DataFrame:
+    return pd.DataFrame(data={ 'rc_id' : rc_ids, 'reverted' : pd.Series(reverted, dtype='category') })
+
+
+def test_refresh_fetches_changes_committed_late_below_high_water_mark(monkeypatch):
+    # rc_id 3 became visible on the replica only after rc_id 4 had been cached
+    previous_changes = _changes([ 1, 2, 4 ])
+    replica_changes = _changes([ 2, 3, 4, 5 ])
+    requests = []
+
+    def query_unpatrolled_changes(min_rc_id=None, rc_ids=None):
+        requests.append((min_rc_id, rc_ids))
+        filt = (replica_changes['rc_id']>min_rc_id) | replica_changes['rc_id'].isin(rc_ids or [])
+        return replica_changes.loc[filt].reset_index(drop=True)
+
+    monkeypatch.setattr(query, 'query_patrol_status', lambda : replica_changes.copy())
+    monkeypatch.setattr(query, 'query_change_flags', lambda min_timestamp : _changes([])[[ 'rc_id' ]])
+    monkeypatch.setattr(query, 'query_unpatrolled_changes', query_unpatrolled_changes)
+    monkeypatch.setattr(query, '_amend_edit_summaries', lambda changes, actions : changes)
+
+    unpatrolled_changes = query._refresh_unpatrolled_changes(previous_changes, {})
+
+    assert requests == [ (4, [ 3 ]) ]
+    assert unpatrolled_changes['rc_id'].tolist() == [ 2, 3, 4, 5 ]
+
+
+def test_refresh_updates_change_flags_of_recent_changes_only(monkeypatch):
+    # rc_id 1 is older than the change flag refresh window, rc_id 2 has been reverted in the meantime
+    previous_changes = _changes([ 1, 2 ]).assign(reverted=pd.Series([ 'mw-reverted', None ], dtype='category'))
+
+    monkeypatch.setattr(query, 'query_patrol_status', lambda : _changes([ 1, 2 ]).assign(rc_patrolled=[ 1, 0 ]))
+    monkeypatch.setattr(query, 'query_change_flags', lambda min_timestamp : _change_flags([ 2 ], [ 'mw-reverted' ]))
+    monkeypatch.setattr(query, 'query_unpatrolled_changes', lambda min_rc_id=None, rc_ids=None : _changes([]))
+
+    unpatrolled_changes = query._refresh_unpatrolled_changes(previous_changes, {})
+
+    assert unpatrolled_changes['rc_patrolled'].tolist() == [ 1, 0 ]
+    assert unpatrolled_changes['reverted'].tolist() == [ 'mw-reverted', 'mw-reverted' ]
+
+
+def _block_history(log_ids:list[int], times:list[str]) -> pd.DataFrame:
+    return pd.DataFrame(data={ 'log_id' : log_ids, 'time' : pd.to_datetime(times), 'user_type' : [ 'registered' ] * len(log_ids) })
+
+
+def test_block_history_adds_entries_committed_late_below_high_water_mark(monkeypatch):
+    # log_id 3 became visible on the replica only after log_id 4 had been cached
+    previous_block_history = _block_history([ 1, 2, 4 ], [ '2024-01-01 00:00', '2024-01-05 10:00', '2024-01-05 12:00' ])
+    replica_block_history = _block_history([ 1, 2, 3, 4, 5 ], [ '2024-01-01 00:00', '2024-01-05 10:00', '2024-01-05 11:00',
+                                                                 '2024-01-05 12:00', '2024-01-05 13:00' ])
+    requests, dumps = [], []
+
+    def query_block_history(min_timestamp=None):
+        requests.append(min_timestamp)
+        return replica_block_history.loc[replica_block_history['time']>=pd.Timestamp(min_timestamp)].reset_index(drop=True)
+
+    monkeypatch.setattr(query, '_load_block_history_cache', lambda : previous_block_history.copy())
+    monkeypatch.setattr(query, '_dump_block_history_cache', dumps.append)
+    monkeypatch.setattr(query, 'query_block_history', query_block_history)
+
+    block_history = query.get_block_history()
+
+    assert requests == [ '20240104120000' ]
+    assert sorted(block_history['log_id'].tolist()) == [ 1, 2, 3, 4, 5 ]
+    assert len(dumps) == 1
+
+    # nothing new: the cache is not written again
+    monkeypatch.setattr(query, '_load_block_history_cache', lambda : block_history.copy())
+    query.get_block_history()
+
+    assert len(dumps) == 1
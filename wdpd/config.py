@@ -1,7 +1,30 @@
+from os import sched_getaffinity
 from os.path import expanduser
 from requests.utils import default_user_agent
 
 
+def _available_cpus() -> int:
+    # CPUs this process may run on, capped by the cgroup CPU quota (cgroup v2, else v1) as set
+    # by the CPU limit of the CronJob in k8s-backend.yaml
+    cpus = len(sched_getaffinity(0))
+    for quota_files in [ [ '/sys/fs/cgroup/cpu.max' ], [ '/sys/fs/cgroup/cpu/cpu.cfs_quota_us', '/sys/fs/cgroup/cpu/cpu.cfs_period_us' ] ]:
+        try:
+            values = []
+            for quota_file in quota_files:
+                with open(quota_file, mode='r', encoding='utf8') as file_handle:
+                    values.extend(file_handle.read().split())
+            quota, period = int(values[0]), int(values[1])
+        except (OSError, ValueError, IndexError):  # no such cgroup version; 'max' means no quota
+            continue
+        if quota > 0:
+            return max(1, min(cpus, quota // period))
+        break
+
+    return cpus
+
+
+AVAILABLE_CPUS:int = _available_cpus()
+
 USER_AGENT:str = f'{default_user_agent()} (Wikidata bot' \
               ' by User:MisterSynergy; mailto:mister.synergy@yahoo.com)'
 
@@ -12,20 +35,58 @@ HIGHLY_USED_ITEMS_URL:str = 'https://tools-static.wmflabs.org/kvasir1/entityusag
 DATAPATH:str = f'{expanduser("~")}/data/'
 PLOTPATH:str = f'{expanduser("~")}/plots/'
 DUMP_UPDATE_FILE:str = f'{expanduser("~")}/data/update.txt'
+RUN_METRICS_FILE:str = f'{expanduser("~")}/data/run-metrics.json'
+RUN_METRICS_HISTORY_FILE:str = f'{expanduser("~")}/data/run-metrics-history.json'
+SNAPSHOTPATH:str = f'{expanduser("~")}/data/snapshot/'  # hive-partitioned Parquet snapshot of the unpatrolled changes
+CACHEPATH:str = f'{expanduser("~")}/cache/'
+UNPATROLLED_CHANGES_CACHE_FILE:str = f'{expanduser("~")}/cache/unpatrolled_changes.pkl'
+BLOCK_HISTORY_CACHE_FILE:str = f'{expanduser("~")}/cache/block_history.pkl'
+OUTPUT_MANIFEST_FILE:str = f'{expanduser("~")}/cache/output_manifest.json'
+HIGHLY_USED_ITEMS_CACHE_FILE:str = f'{expanduser("~")}/cache/highly_used_items.npz'
+# directories with one output file per key, e.g. per language or project; files in there that have not been written
+# in a run are removed, whereas all other outputs are kept, as the web page links them under a fixed name
+PER_KEY_OUTPUT_DIRECTORIES:list[str] = [
+    *[ f'{DATAPATH}{directory}/' for directory in [ 'term', 'termee', 'termeec', 'page', 'pagemove', 'pageremoval', 'editentity',
+                                                    'property', 'progress_patrollers_by_lang', 'progress_by_lang', 'not_ns0' ] ],
+    f'{PLOTPATH}progress_by_lang/',
+    SNAPSHOTPATH
+]
 
 REPLICA_PARAMS:dict[str, str] = {
     'host' : 'wikidatawiki.analytics.db.svc.wikimedia.cloud',
     'database' : 'wikidatawiki_p',
     'default_file' : f'{expanduser("~")}/replica.my.cnf'
 }
+REPLICA_POOL_SIZE:int = 4  # max number of simultaneously open replica connections
+REPLICA_FETCH_SIZE:int = 10_000  # rows per batch when fetching query results into dataframes
+# simultaneous fetch and dump tasks; replica connections are still capped by REPLICA_POOL_SIZE; fetches mostly wait
+# for the replica and the web, hence twice the CPUs; memory budget: every running dump task builds temporary frames
+# of up to the size of the unpatrolled changes frame, which the main process holds in addition, plus one copy of the
+# main process per plot worker; all of that needs to fit into the 1Gi memory limit of the CronJob in k8s-backend.yaml
+TASK_WORKERS:int = 2 * AVAILABLE_CPUS
 
 DEBUG:bool = False  # True: adds some dataframe information to logfile
+RUN_METRICS_HISTORY_LENGTH:int = 336  # runs kept in the run metrics history; one week at a 30 min schedule
+WDQS_CHUNK_SIZE:int = 500  # max number of entities in the VALUES clause of a single WDQS query
+WDQS_WORKERS:int = 3  # simultaneous WDQS requests; WDQS permits 5 per client
+HTTP_TIMEOUT:int = 120  # sec; Wikidata API and tools-static requests
+WDQS_TIMEOUT:int = 65  # sec; WDQS itself aborts queries after 60 sec
+WDQS_MAX_RETRIES:int = 3  # retries after timeouts, connection errors, HTTP 429 and 5xx
+WDQS_BACKOFF:float = 5.  # sec before the first retry if no Retry-After header is given; doubled for every further retry
+WDQS_CACHE_TTL_PROPERTIES:str = '7 days'  # property labels and datatypes
+WDQS_CACHE_TTL_ITEMS:str = '6 hours'  # item statistics such as statement, sitelink and backlink counts
+WDQS_CACHE_TTL_NEGATIVE:str = '1 hour'  # entities for which WDQS did not return any result
+
+INCREMENTAL_REFRESH:bool = True  # False: re-query and re-parse all unpatrolled changes and the block history in every run
+CHANGE_FLAG_REFRESH_WINDOW:str = '2 days'  # incremental: change tags and ORES scores of older cached changes are not refreshed
+BLOCK_HISTORY_REFRESH_WINDOW:str = '1 day'  # incremental: period before the latest cached block log entry that is queried again for late entries
 
 PLOT_WINDOW_DAYS:int = 28
 FIGSIZE_STANDARD = (6, 4)
 FIGSIZE_TALL = (6, 8)
 FIGSIZE_WIDE = (9, 4)
 FIGSIZE_HEATMAP = (6, 4.4)
+PLOT_WORKERS:int = AVAILABLE_CPUS  # processes for rendering plots, forked from the main process; 1: render all plots sequentially in the main process
 QID_BIN_SIZE = 1_000_000
 QID_BIN_MAX = 150_000_000
 
@@ -1,18 +1,26 @@
-from glob import glob
-import ipaddress
+from io import BytesIO
 import logging
+from os import makedirs
 from typing import Optional, TypedDict
 
-from numpy import mean
+from numpy import array as np_array, mean, searchsorted as np_searchsorted, where as np_where
 import pandas as pd
 
-from .config import DATAPATH, ORES_TRIGGER_UNREGISTERED_SCORE, ORES_TRIGGER_UNREGISTERED_EDITS, \
-    ORES_TRIGGER_REGISTERED_SCORE, ORES_TRIGGER_REGISTERED_EDITS, MAX_QID_NUM, MIN_ENTITY_USAGE
-from .helper import delete_file, wdqs_query
+from .config import DATAPATH, SNAPSHOTPATH, ORES_TRIGGER_UNREGISTERED_SCORE, ORES_TRIGGER_UNREGISTERED_EDITS, \
+    ORES_TRIGGER_REGISTERED_SCORE, ORES_TRIGGER_REGISTERED_EDITS, MAX_QID_NUM, MIN_ENTITY_USAGE, \
+    WDQS_CACHE_TTL_ITEMS
+from .helper import OUTPUT_WRITER, IpRangeIndex, classify_user_names, timed_stage, wdqs_entity_query
+from .query import PatrolDelayStats, ores_scores_float64
 
 
 LOG = logging.getLogger(__name__)
 
+WORKLIST_FIELDS = ['rc_id', 'rc_timestamp', 'rc_title', 'rc_this_oldid', 'actor_name',
+                   'oresc_damaging', 'oresc_goodfaith', 'editsummary-magic-action']
+WORKLIST_WINDOWS = { '3d' : '3 days', '7d' : '7 days', '14d' : '14 days', 'all' : '31 days' }  # rolling, in addition to today
+SNAPSHOT_PARTITION_FIELDS = ['rc_patrolled', 'editsummary-magic-action-broad']
+SNAPSHOT_FIELDS = [*WORKLIST_FIELDS, 'editsummary-magic-param1', 'editsummary-magic-param2', 'editsummary-free-property']
+
 
 class BlockHistoryJob(TypedDict):
     filename : str
@@ -23,142 +31,29 @@ class BlockHistoryJob(TypedDict):
 
 #### functions not for export
 def dump_dataframe(dataframe:pd.DataFrame, filename:str, head_limit:int=50) -> None:
-    dataframe.to_csv(DATAPATH + filename.format(mode='full'), sep='\t')
-    dataframe.head(head_limit).to_csv(DATAPATH + filename.format(mode='head'), sep='\t')
+    OUTPUT_WRITER.write_dataframe(dataframe, DATAPATH + filename.format(mode='full'), sep='\t')
+    OUTPUT_WRITER.write_dataframe(dataframe.head(head_limit), DATAPATH + filename.format(mode='head'), sep='\t')
 
     LOG.info(f'Dumped DataFrame to "{filename.format(mode="full|head")}"')
 
 
-def dump_terms(unpatrolled_changes:pd.DataFrame, term_actions:list[str], language:str) -> None:
-    filt = (unpatrolled_changes['rc_patrolled']==0) \
-        & (unpatrolled_changes['editsummary-magic-action'].isin(term_actions)) \
-        & (unpatrolled_changes['editsummary-magic-param1'] == language)
-    fields = ['rc_id', 'rc_timestamp', 'rc_title', 'rc_this_oldid', 'actor_name',
-              'oresc_damaging', 'oresc_goodfaith', 'editsummary-magic-action']
-    filename = f'term/worklist-{language}-terms-{{mode}}.tsv'
-    dump_dataframe(unpatrolled_changes.loc[filt, fields].sort_values(by='actor_name'), filename)
-
-    LOG.info(f'Dumped terms for language "{language}"')
-
-
-def dump_terms_in_editentity(unpatrolled_changes:pd.DataFrame, language:str) -> None:
-    filt = (unpatrolled_changes['rc_patrolled']==0) \
-        & (unpatrolled_changes['editsummary-magic-action-broad']=='editentity') \
-        & (unpatrolled_changes['editsummary-magic-param2'].notna()) \
-        & (unpatrolled_changes['editsummary-magic-param2'].apply(
-            lambda x : (language in str(x).split(', '))
-        ))
-    fields = ['rc_id', 'rc_timestamp', 'rc_title', 'rc_this_oldid', 'actor_name',
-              'oresc_damaging', 'oresc_goodfaith', 'editsummary-magic-action']
-    filename = f'termee/worklist-{language}-terms-in-editentity-{{mode}}.tsv'
-    dump_dataframe(unpatrolled_changes.loc[filt, fields].sort_values(by='actor_name'), filename)
-
-    LOG.info(f'Dumped terms in editentity for language "{language}"')
-
-
-def dump_terms_in_editentity_create(unpatrolled_changes:pd.DataFrame, language:str) -> None:
-    filt = (unpatrolled_changes['rc_patrolled']==0) \
-        & (unpatrolled_changes['editsummary-magic-action']=='wbeditentity-create') \
-        & (unpatrolled_changes['editsummary-magic-param1'] == language)
-    fields = ['rc_id', 'rc_timestamp', 'rc_title', 'rc_this_oldid', 'actor_name',
-              'oresc_damaging', 'oresc_goodfaith', 'editsummary-magic-action']
-    filename = f'termeec/worklist-{language}-terms-in-editentity-create-{{mode}}.tsv'
-    dump_dataframe(unpatrolled_changes.loc[filt, fields].sort_values(by='actor_name'), filename)
-
-    LOG.info(f'Dumped terms in editentity creations for language "{language}"')
-
-
-def dump_project_sitelink_changes(unpatrolled_changes:pd.DataFrame, \
-                                  sitelink_actions:list[str], project:str) -> None:
-    filt = (unpatrolled_changes['rc_patrolled']==0) \
-        & (unpatrolled_changes['editsummary-magic-action'].isin(sitelink_actions)) \
-        & (unpatrolled_changes['editsummary-magic-param1'] == project)
-    fields = ['rc_id', 'rc_timestamp', 'rc_title', 'rc_this_oldid', 'actor_name',
-              'oresc_damaging', 'oresc_goodfaith', 'editsummary-magic-action']
-    filename = f'page/worklist-{project}-page-{{mode}}.tsv'
-    dump_dataframe(unpatrolled_changes.loc[filt, fields], filename)
-
-    LOG.info(f'Dumped sitelink changes for project "{project}"')
-
-
-def dump_project_pagemoves(unpatrolled_changes:pd.DataFrame, sitelink_actions:list[str], \
-                           project:str) -> None:
-    filt = (unpatrolled_changes['rc_patrolled']==0) \
-        & (unpatrolled_changes['editsummary-magic-action'].isin(sitelink_actions)) \
-        & (unpatrolled_changes['editsummary-magic-param1'] == project)
-    fields = ['rc_id', 'rc_timestamp', 'rc_title', 'rc_this_oldid', 'actor_name',
-              'oresc_damaging', 'oresc_goodfaith', 'editsummary-magic-action']
-    filename = f'pagemove/worklist-{project}-pagemove-{{mode}}.tsv'
-    dump_dataframe(unpatrolled_changes.loc[filt, fields], filename)
-
-    LOG.info(f'Dumped page moves changes for project "{project}"')
-
-
-def dump_project_pageremovals(unpatrolled_changes:pd.DataFrame, sitelink_actions:list[str], \
-                              project:str) -> None:
-    filt = (unpatrolled_changes['rc_patrolled']==0) \
-        & (unpatrolled_changes['editsummary-magic-action'].isin(sitelink_actions)) \
-        & (unpatrolled_changes['editsummary-magic-param1'].isna()) \
-        & (unpatrolled_changes['editsummary-magic-param2'] == project)
-    fields = ['rc_id', 'rc_timestamp', 'rc_title', 'rc_this_oldid', 'actor_name',
-              'oresc_damaging', 'oresc_goodfaith', 'editsummary-magic-action']
-    filename = f'pageremoval/worklist-{project}-pageremoval-{{mode}}.tsv'
-    dump_dataframe(unpatrolled_changes.loc[filt, fields], filename)
-
-    LOG.info(f'Dumped pagelink removals for project "{project}"')
-
-
-def dump_editentity_changes(unpatrolled_changes:pd.DataFrame, magic_action:str) -> None:
-    filt = (unpatrolled_changes['rc_patrolled']==0) \
-        & (unpatrolled_changes['editsummary-magic-action']==magic_action)
-    fields = ['rc_id', 'rc_timestamp', 'rc_title', 'rc_this_oldid', 'actor_name',
-              'oresc_damaging', 'oresc_goodfaith', 'editsummary-magic-action']
-    filename = f'editentity/worklist-{magic_action}-{{mode}}.tsv'
-    dump_dataframe(unpatrolled_changes.loc[filt, fields], filename)
-
-    LOG.info(f'Dumped editentity changes for action "{magic_action}"')
-
-
-def dump_property_changes(unpatrolled_changes:pd.DataFrame, claim_actions:list[str], prop:str) -> None:
-    filt = (unpatrolled_changes['rc_patrolled']==0) \
-        & (unpatrolled_changes['editsummary-magic-action'].isin(claim_actions)) \
-        & (unpatrolled_changes['editsummary-free-property']==prop)
-    fields = ['rc_id', 'rc_timestamp', 'rc_title', 'rc_this_oldid', 'actor_name',
-              'oresc_damaging', 'oresc_goodfaith', 'editsummary-magic-action']
-    filename = f'property/worklist-{prop}-{{mode}}.tsv'
-    dump_dataframe(unpatrolled_changes.loc[filt, fields], filename)
-
-    LOG.info(f'Dumped property changes for property "{prop}"')
+def dump_partitioned_dataframe(dataframe:pd.DataFrame, partition_column:str, filename:str, \
+                               sort_by:Optional[str]=None) -> None:
+    for partition, partition_dataframe in dataframe.groupby(by=partition_column, observed=True, sort=False):
+        if sort_by is not None:
+            partition_dataframe = partition_dataframe.sort_values(by=sort_by)
+        dump_dataframe(partition_dataframe[WORKLIST_FIELDS], filename.format(partition=partition, mode='{mode}'))
 
 
 #### functions for export
-def dump_worklist(unpatrolled_changes:pd.DataFrame, filt:pd.Series, name:str='') -> None:
-    fields_tmp = ['actor_name', 'rc_patrolled', 'reverted']
-    tmp = unpatrolled_changes.loc[filt, fields_tmp].groupby(
-        by=['actor_name', 'rc_patrolled']
-    ).size().reset_index(name='edits')
-
-    patrol_done = tmp.loc[tmp['rc_patrolled']==1, ['actor_name', 'edits']].sort_values(
+def _compile_worklist(edits:pd.DataFrame, reverted_cnt:pd.DataFrame, new_item_cnt:pd.DataFrame) -> pd.DataFrame:
+    patrol_done = edits.loc[edits['rc_patrolled']==1, ['actor_name', 'edits']].sort_values(
         by='edits', ascending=False
     )
-    patrol_missing = tmp.loc[tmp['rc_patrolled']==0, ['actor_name', 'edits']].sort_values(
+    patrol_missing = edits.loc[edits['rc_patrolled']==0, ['actor_name', 'edits']].sort_values(
         by='edits', ascending=False
     )
 
-    filt_reverted = (~unpatrolled_changes['reverted'].isna())
-    fields_reverted = ['actor_name', 'rc_id']
-    reverted_cnt = unpatrolled_changes.loc[filt_reverted, fields_reverted].groupby(
-        by='actor_name'
-    ).count()
-    reverted_cnt.rename(columns={'rc_id' : 'reverted'}, inplace=True)
-
-    filt_new_item = (unpatrolled_changes['rc_source']=='mw.new')
-    fields_new_item = ['actor_name', 'rc_id']
-    new_item_cnt = unpatrolled_changes.loc[filt_new_item, fields_new_item].groupby(
-        by='actor_name'
-    ).count()
-    new_item_cnt.rename(columns={'rc_id' : 'created'}, inplace=True)
-
     patrol_stats = patrol_done.merge(
         right=patrol_missing,
         on='actor_name',
@@ -172,27 +67,75 @@ def dump_worklist(unpatrolled_changes:pd.DataFrame, filt:pd.Series, name:str='')
         right=new_item_cnt,
         on='actor_name',
         how='left'
-    ).fillna(0).sort_values(by=['edits_unpatr', 'edits_patr'], ascending=False)
+    ).fillna(
+        value={ 'edits_patr' : 0, 'edits_unpatr' : 0, 'reverted' : 0, 'created' : 0 }
+    ).sort_values(by=['edits_unpatr', 'edits_patr'], ascending=False)
     patrol_stats['edits'] = patrol_stats['edits_patr'] + patrol_stats['edits_unpatr']
     patrol_stats['patrol_ratio'] = round(patrol_stats['edits_patr']/patrol_stats['edits']*100, 2)
     patrol_stats['reverted_ratio'] = round(patrol_stats['reverted']/patrol_stats['edits']*100, 2)
 
-    if name!='':
-        name = '-' + name
+    return patrol_stats
 
-    filename = f'worklist-{{mode}}{name}.tsv'
-    dump_dataframe(patrol_stats, filename)
 
-    LOG.info(f'Dumped worklist {name}')
+@timed_stage
+def dump_worklists(unpatrolled_changes:pd.DataFrame) -> None:
+    # windows are nested, thus each change is assigned to the narrowest window containing it (or to none);
+    # a window's edit counts are the cumulative sum over its own and all narrower age classes
+    now = pd.Timestamp.today()
+    window_starts = [ now.floor('D'), *[ now - pd.to_timedelta(age) for age in WORKLIST_WINDOWS.values() ] ]
+    window_names = [ 'today', *WORKLIST_WINDOWS.keys() ]
+    age_classes = len(window_starts) - np_searchsorted(
+        np_array(window_starts[::-1], dtype='datetime64[ns]'),
+        unpatrolled_changes['time'].to_numpy(),
+        side='right'
+    )
+
+    edit_counts = unpatrolled_changes[['actor_name', 'rc_patrolled']].assign(
+        suggested_edit=unpatrolled_changes['suggested_edit'].notna(),
+        age_class=age_classes
+    ).groupby(
+        by=['actor_name', 'rc_patrolled', 'suggested_edit', 'age_class'],
+        observed=True
+    ).size().unstack(level='age_class', fill_value=0).reindex(columns=range(len(window_starts)+1), fill_value=0)
 
+    window_edit_counts = edit_counts.cumsum(axis=1).groupby(level=['actor_name', 'rc_patrolled'], observed=True).sum()
+    window_edit_counts['suggested-edit'] = edit_counts.loc[edit_counts.index.get_level_values('suggested_edit')].sum(axis=1) \
+        .groupby(level=['actor_name', 'rc_patrolled'], observed=True).sum()
+    window_edit_counts = window_edit_counts.rename(columns=dict(enumerate(window_names))).fillna(0).astype('int64')
 
+    # not depending on the window
+    filt_reverted = (~unpatrolled_changes['reverted'].isna())
+    fields_reverted = ['actor_name', 'rc_id']
+    reverted_cnt = unpatrolled_changes.loc[filt_reverted, fields_reverted].groupby(
+        by='actor_name',
+        observed=True
+    ).count()
+    reverted_cnt.rename(columns={'rc_id' : 'reverted'}, inplace=True)
+
+    filt_new_item = (unpatrolled_changes['rc_source']=='mw.new')
+    fields_new_item = ['actor_name', 'rc_id']
+    new_item_cnt = unpatrolled_changes.loc[filt_new_item, fields_new_item].groupby(
+        by='actor_name',
+        observed=True
+    ).count()
+    new_item_cnt.rename(columns={'rc_id' : 'created'}, inplace=True)
+
+    for name in [ *window_names, 'suggested-edit' ]:
+        edits = window_edit_counts.loc[window_edit_counts[name]>0, name].reset_index(name='edits')
+        dump_dataframe(_compile_worklist(edits, reverted_cnt, new_item_cnt), f'worklist-{{mode}}-{name}.tsv')
+
+        LOG.info(f'Dumped worklist "{name}"')
+
+
+@timed_stage
 def dump_ores_worklist_unregistered(unpatrolled_changes:pd.DataFrame, min_ores_score:float=ORES_TRIGGER_UNREGISTERED_SCORE, \
                                     min_edits:int=ORES_TRIGGER_UNREGISTERED_EDITS) -> None:
-    filt = (unpatrolled_changes['rc_patrolled']==0) & (unpatrolled_changes['actor_user'].isna())
+    filt = (unpatrolled_changes['rc_patrolled']==0) & (unpatrolled_changes['is_anon'])
     fields = ['rc_id', 'actor_name', 'oresc_damaging']
 
-    damaging_highscores = unpatrolled_changes.loc[filt, fields].groupby(
-        by='actor_name'
+    damaging_highscores = ores_scores_float64(unpatrolled_changes.loc[filt, fields]).groupby(
+        by='actor_name',
+        observed=True
     ).agg(
         func={ 'rc_id' : len, 'oresc_damaging' : lambda x : x.sum() / x.size }
     ).sort_values(by='oresc_damaging', ascending=False)
@@ -206,13 +149,15 @@ def dump_ores_worklist_unregistered(unpatrolled_changes:pd.DataFrame, min_ores_s
     LOG.info('Dumped ORES worklist for unregistered users')
 
 
+@timed_stage
 def dump_ores_worklist_registered(unpatrolled_changes:pd.DataFrame, min_ores_score:float=ORES_TRIGGER_REGISTERED_SCORE, \
                                   min_edits:int=ORES_TRIGGER_REGISTERED_EDITS) -> None:
-    filt = (unpatrolled_changes['rc_patrolled']==0) & (unpatrolled_changes['actor_user'].notna())
+    filt = (unpatrolled_changes['rc_patrolled']==0) & (~unpatrolled_changes['is_anon'])
     fields = ['rc_id', 'actor_name', 'oresc_damaging']
 
-    damaging_highscores = unpatrolled_changes.loc[filt, fields].groupby(
-        by='actor_name'
+    damaging_highscores = ores_scores_float64(unpatrolled_changes.loc[filt, fields]).groupby(
+        by='actor_name',
+        observed=True
     ).agg(
         func={ 'rc_id' : len, 'oresc_damaging' : lambda x : x.sum() / x.size }
     ).sort_values(by='oresc_damaging', ascending=False)
@@ -226,6 +171,7 @@ def dump_ores_worklist_registered(unpatrolled_changes:pd.DataFrame, min_ores_sco
     LOG.info('Dumped ORES worklist for registered users')
 
 
+@timed_stage
 def dump_items_with_many_revisions(unpatrolled_changes:pd.DataFrame, \
                                    max_num_title:int=MAX_QID_NUM) -> None:
     if max_num_title is None:
@@ -235,7 +181,8 @@ def dump_items_with_many_revisions(unpatrolled_changes:pd.DataFrame, \
             & (unpatrolled_changes['num_title']<max_num_title)
     fields = ['rc_title', 'rc_patrolled', 'reverted']
     many_revisions = unpatrolled_changes.loc[filt, fields].groupby(
-        by=['rc_title']
+        by=['rc_title'],
+        observed=True
     ).size().reset_index(name='edits').sort_values(by='edits', ascending=False)
     filename = 'worklist-items-many-revisions-{mode}.tsv'
     dump_dataframe(many_revisions, filename)
@@ -243,11 +190,13 @@ def dump_items_with_many_revisions(unpatrolled_changes:pd.DataFrame, \
     LOG.info('Dumped items with many revisions')
 
 
+@timed_stage
 def dump_users_with_many_creations(unpatrolled_changes:pd.DataFrame) -> None:
     filt = (unpatrolled_changes['rc_patrolled']==0) & (unpatrolled_changes['rc_source']!='mw.edit')
     fields = ['actor_name', 'rc_id']
     many_creations = unpatrolled_changes.loc[filt, fields].groupby(
-        by=['actor_name']
+        by=['actor_name'],
+        observed=True
     ).count().sort_values(by='rc_id', ascending=False)
     filename = 'worklist-users-with-many-creations-{mode}.tsv'
     dump_dataframe(many_creations, filename)
@@ -280,7 +229,7 @@ def dump_registered_users_with_block_history(unpatrolled_changes:pd.DataFrame, b
 
     for job in jobs:
         filt = (unpatrolled_changes['rc_patrolled']==0) & (unpatrolled_changes['actor_name'].isin(block_history.loc[job['subfilt'], 'user_name'].to_list()))
-        df = unpatrolled_changes.loc[filt, ['actor_name', 'rc_id']].groupby(by=['actor_name']).count().reset_index().sort_values(by='rc_id', ascending=False).merge(right=block_stats, left_on='actor_name', right_on='user_name', how='inner')
+        df = unpatrolled_changes.loc[filt, ['actor_name', 'rc_id']].groupby(by=['actor_name'], observed=True).count().reset_index().sort_values(by='rc_id', ascending=False).merge(right=block_stats, left_on='actor_name', right_on='user_name', how='inner')
         df = df.merge(right=current_user_blocks[['user_name', 'is_blocked']], how='left', on='user_name')
         df = df.rename(columns={'rc_id' : 'edits', 'time' : 'block_cnt'})
         dump_dataframe(df[fields].sort_values(by=['edits', 'actor_name'], ascending=[False, True]), job['filename'])
@@ -290,44 +239,31 @@ def dump_registered_users_with_block_history(unpatrolled_changes:pd.DataFrame, b
 
 def dump_anon_users_with_block_history(unpatrolled_changes:pd.DataFrame, block_history:pd.DataFrame, current_user_blocks:pd.DataFrame) -> None:
 
-    def _get_range_df(block_history:pd.DataFrame) -> pd.DataFrame:
-        ranges = block_history.loc[block_history['user_type'].isin(['ipv4range', 'ipv6range']), ['user_name', 'time']]
-        ranges['ip_network'] = ranges['user_name'].apply(lambda x : str(ipaddress.ip_network(x, strict=False)))
-        ranges['range_start'] = ranges['ip_network'].apply(lambda x : int(ipaddress.ip_network(x).network_address))
-        ranges['range_end'] = ranges['ip_network'].apply(lambda x : int(ipaddress.ip_network(x).broadcast_address))
-
-        return ranges
-
-    def _cnt_blocked_range_memberships(user_name:str, ranges:pd.DataFrame) -> int:
-        ip_int = int(ipaddress.ip_address(user_name))
-        return ranges.loc[(ranges['range_start']<=ip_int) & (ranges['range_end']>=ip_int)].shape[0]
-
-    def _is_range_blocked(user_name:str, current_user_blocks:pd.DataFrame) -> Optional[str]:
-        ip = ipaddress.ip_address(user_name)
-        if ip.version == 4:
-            ip_formatted = f'{ip:X}'
-        elif ip.version == 6:
-            ip_formatted = f'v6-{ip:X}'
-        else:
-            raise RuntimeError(f'Unrecognized IP version {ip.version} detected')
-
-        relevant_blocks = current_user_blocks.loc[(current_user_blocks['range_start']<=ip_formatted) & (current_user_blocks['range_end']>=ip_formatted)]
-
-        if relevant_blocks.shape[0]==0:
-            return None
-
-        if 'infinity' in relevant_blocks['is_blocked'].unique():
-            return 'infinity'
+    def _get_range_index(ranges:pd.DataFrame) -> IpRangeIndex:
+        return IpRangeIndex(
+            ranges['ip_version'].to_numpy(),
+            ranges['range_start'].to_numpy(dtype='object'),
+            ranges['range_end'].to_numpy(dtype='object')
+        )
 
-        return 'temporary'
+    ranges = block_history.loc[block_history['user_type'].isin(['ipv4range', 'ipv6range']), ['time', 'ip_version', 'range_start', 'range_end']]
+    range_index_all = _get_range_index(ranges)
+    range_index_1y = _get_range_index(ranges.loc[pd.Timestamp.now() - ranges['time'] < pd.Timedelta('365 days')])
 
-    ranges = _get_range_df(block_history)
+    current_range_blocks = current_user_blocks.loc[current_user_blocks['range_start']<current_user_blocks['range_end']]
+    current_range_blocks = pd.concat(objs=[current_range_blocks['is_blocked'], classify_user_names(current_range_blocks['user_name'])], axis=1)
+    current_range_block_index = _get_range_index(current_range_blocks)
+    current_infinite_range_block_index = _get_range_index(current_range_blocks.loc[current_range_blocks['is_blocked']=='infinity'])
 
     block_stats = block_history.loc[block_history['user_type'].isin(['ipv4', 'ipv6']), ['user_name', 'time']].groupby(by=['user_name']).count().reset_index()
 
-    ips = unpatrolled_changes.loc[(unpatrolled_changes['rc_patrolled']==0) & (unpatrolled_changes['actor_user'].isna()), ['actor_name', 'rc_id']].groupby(by=['actor_name']).count().reset_index()
-    ips['range_blocks_all'] = ips['actor_name'].apply(_cnt_blocked_range_memberships, args=(ranges, ))
-    ips['range_blocks_1y'] = ips['actor_name'].apply(_cnt_blocked_range_memberships, args=(ranges.loc[pd.Timestamp.now() - ranges['time'] < pd.Timedelta('365 days')], ))
+    anon_changes = unpatrolled_changes.loc[unpatrolled_changes['is_anon'] & (unpatrolled_changes['rc_patrolled']==0), ['actor_name', 'rc_id']].astype({ 'actor_name' : 'object' })
+
+    ips = anon_changes.groupby(by=['actor_name']).count().reset_index()
+    classified_ips = classify_user_names(ips['actor_name'])
+    ip_versions, ip_ints = classified_ips['ip_version'].to_numpy(), classified_ips['range_start'].to_numpy()
+    ips['range_blocks_all'] = range_index_all.count_containing(ip_versions, ip_ints)
+    ips['range_blocks_1y'] = range_index_1y.count_containing(ip_versions, ip_ints)
 
     subfilt_anon = (block_history['user_type'].isin(['ipv4', 'ipv6']))
     subfilt_1y = (pd.Timestamp.now() - block_history['time'] < pd.Timedelta('365 days'))
@@ -348,8 +284,8 @@ def dump_anon_users_with_block_history(unpatrolled_changes:pd.DataFrame, block_h
     ]
 
     for job in jobs:
-        filt = (unpatrolled_changes['rc_patrolled']==0) & (unpatrolled_changes['actor_name'].isin(block_history.loc[job['subfilt'], 'user_name'].to_list()))
-        df = unpatrolled_changes.loc[filt, ['actor_name', 'rc_id']].groupby(by=['actor_name']).count().reset_index().sort_values(by='rc_id', ascending=False).merge(right=block_stats, left_on='actor_name', right_on='user_name', how='inner')
+        filt = anon_changes['actor_name'].isin(block_history.loc[job['subfilt'], 'user_name'].to_list())
+        df = anon_changes.loc[filt].groupby(by=['actor_name']).count().reset_index().sort_values(by='rc_id', ascending=False).merge(right=block_stats, left_on='actor_name', right_on='user_name', how='inner')
         df = df.rename(columns={'rc_id' : 'edits', 'time' : 'block_cnt'})
         df = df.merge(right=ips.loc[(ips['rc_id']>0) & (ips[job['range_column_name']]>0)], on='actor_name', how='outer')
         df = df.fillna(0)
@@ -359,9 +295,15 @@ def dump_anon_users_with_block_history(unpatrolled_changes:pd.DataFrame, block_h
         df = df.drop(columns=['rc_id'])
 
         df = df.merge(right=current_user_blocks.loc[current_user_blocks['range_start'].notna() & (current_user_blocks['range_start']==current_user_blocks['range_end']), ['user_name', 'is_blocked']], how='left', on='user_name')
-        df['is_range_blocked'] = df['actor_name'].apply(_is_range_blocked, args=(current_user_blocks.loc[current_user_blocks['range_start']<current_user_blocks['range_end']], ))
+        classified_ips = classify_user_names(df['actor_name'])
+        ip_versions, ip_ints = classified_ips['ip_version'].to_numpy(), classified_ips['range_start'].to_numpy()
+        df['is_range_blocked'] = np_where(
+            current_infinite_range_block_index.count_containing(ip_versions, ip_ints)>0,
+            'infinity',
+            np_where(current_range_block_index.count_containing(ip_versions, ip_ints)>0, 'temporary', None)
+        )
         df = df.astype({ 'is_range_blocked' : 'category' })
-        df['actor_name_int'] = df['actor_name'].apply(lambda x : int(ipaddress.ip_address(x)))
+        df['actor_name_int'] = ip_ints
         df = df.sort_values(by=['edits', 'actor_name_int'], ascending=[ False, True ])
         
         df_to_dump = df[job['fields']]
@@ -372,6 +314,7 @@ def dump_anon_users_with_block_history(unpatrolled_changes:pd.DataFrame, block_h
     LOG.info('Dumped anon users with block history')
 
 
+@timed_stage
 def dump_users_with_block_history(unpatrolled_changes:pd.DataFrame, block_history:pd.DataFrame, current_user_blocks:pd.DataFrame) -> None:
     dump_registered_users_with_block_history(unpatrolled_changes, block_history, current_user_blocks)
     dump_anon_users_with_block_history(unpatrolled_changes, block_history, current_user_blocks)
@@ -379,21 +322,26 @@ def dump_users_with_block_history(unpatrolled_changes:pd.DataFrame, block_histor
     LOG.info('Dumped all users with block history')
 
 
+@timed_stage
 def dump_highly_used_items(unpatrolled_changes:pd.DataFrame, highly_used_items_toplist:pd.DataFrame, \
                            min_entity_usage_count:int=MIN_ENTITY_USAGE) -> None:
     filt = (unpatrolled_changes['rc_patrolled']==0)
     toplist_unpatrolled_changes = unpatrolled_changes.loc[filt].merge(
         right=highly_used_items_toplist.loc[highly_used_items_toplist['entity_usage_count']>=min_entity_usage_count],
         how='inner',
-        left_on='rc_title',
-        right_on='qid'
-    ).value_counts(subset=['rc_title', 'entity_usage_count'], sort=True, ascending=False)
+        left_on='num_title',
+        right_on='qid_num'
+    ).groupby(
+        by=['rc_title', 'entity_usage_count'],
+        observed=True
+    ).size().rename('count').sort_values(ascending=False)
     filename = 'worklist-highly-used-items-{mode}.tsv'
     dump_dataframe(toplist_unpatrolled_changes.sort_index(level=1, ascending=False).to_frame(), filename)
 
     LOG.info('Dumped highly used items with edits')
 
 
+@timed_stage
 def dump_uncategorizable_editsummaries(unpatrolled_changes:pd.DataFrame) -> None:
     filt = (unpatrolled_changes['editsummary-magic-action-broad']=='NO_CAT')
     fields = ['rc_id', 'rc_timestamp', 'rc_title', 'rc_this_oldid', 'actor_name']
@@ -403,6 +351,7 @@ def dump_uncategorizable_editsummaries(unpatrolled_changes:pd.DataFrame) -> None
     LOG.info('Dumped edits with uncategorizable edit summaries')
 
 
+@timed_stage
 def dump_top_patrollers(unpatrolled_changes:pd.DataFrame, top_patrollers:pd.DataFrame) -> None:
     filt = (top_patrollers['rc_curid']>=unpatrolled_changes['rc_this_oldid'].min())
     patrolled_revisions = top_patrollers.loc[filt].shape[0]
@@ -416,17 +365,18 @@ def dump_top_patrollers(unpatrolled_changes:pd.DataFrame, top_patrollers:pd.Data
     progress = f'Currently {patrolled_revisions} out of {total_revisions} revisions are patrolled' \
                f' ({patrolled_revisions/total_revisions*100:.1f}%); {total_revisions-patrolled_revisions}' \
                 ' revisions are not yet patrolled'
-    open(DATAPATH + 'progress.txt', mode='w', encoding='utf8').write(progress)
-    open(DATAPATH + 'progressRaw.txt', mode='w', encoding='utf8').write(f'{patrolled_revisions}\t{total_revisions}')
+    OUTPUT_WRITER.write_text(DATAPATH + 'progress.txt', progress)
+    OUTPUT_WRITER.write_text(DATAPATH + 'progressRaw.txt', f'{patrolled_revisions}\t{total_revisions}')
 
     today_progress = f'Today {today_patrolled_revisions} out of {today_total_revisions} revisions' \
                      f' are patrolled ({today_patrolled_revisions/today_total_revisions*100:.1f}%);' \
                      f' {today_total_revisions-today_patrolled_revisions} revisions are not yet patrolled'
-    open(DATAPATH + 'todayProgress.txt', mode='w', encoding='utf8').write(today_progress)
-    open(DATAPATH + 'todayProgressRaw.txt', mode='w', encoding='utf8').write(f'{today_patrolled_revisions}\t{today_total_revisions}')
+    OUTPUT_WRITER.write_text(DATAPATH + 'todayProgress.txt', today_progress)
+    OUTPUT_WRITER.write_text(DATAPATH + 'todayProgressRaw.txt', f'{today_patrolled_revisions}\t{today_total_revisions}')
 
     top_patrollers_grouped = top_patrollers.loc[filt, ['log_id', 'actor_name']].groupby(
-        by='actor_name'
+        by='actor_name',
+        observed=True
     ).size().reset_index(name='patrols')
     top_patrollers_grouped['patrols_relative'] = round(
         top_patrollers_grouped['patrols'] / top_patrollers_grouped['patrols'].sum() * 100,
@@ -439,23 +389,26 @@ def dump_top_patrollers(unpatrolled_changes:pd.DataFrame, top_patrollers:pd.Data
     LOG.info('Dumped top patrollers')
 
 
-def dump_change_tags_list(change_tags:pd.DataFrame) -> None:
-    change_tags[['ctd_name']].value_counts().to_csv(DATAPATH + 'change-tags.tsv', sep='\t')
+@timed_stage
+def dump_change_tags_list(change_tag_counts:pd.DataFrame) -> None:
+    OUTPUT_WRITER.write_dataframe(change_tag_counts[['ctd_name', 'count']], DATAPATH + 'change-tags.tsv', sep='\t', index=False)
 
     LOG.info('Dumped change tag list')
 
 
-def dump_rfd_linked_items(unpatrolled_changes:pd.DataFrame, rfdlinks:list[str]) -> None:
-    filt = unpatrolled_changes['rc_title'].isin(rfdlinks)
+@timed_stage
+def dump_rfd_linked_items(unpatrolled_changes:pd.DataFrame, rfdlinks:list[int]) -> None:
+    filt = unpatrolled_changes['num_title'].isin(rfdlinks)
     rfd_linked = unpatrolled_changes.loc[filt, ['rc_title', 'rc_patrolled']].groupby(
-        by='rc_title'
+        by='rc_title',
+        observed=True
     ).agg(
         {'rc_patrolled': mean, 'rc_title' : len}
     )
     rfd_linked.rename(columns={ 'rc_title' : 'cnt' }, inplace=True)
 
     ### output to file
-    query = f"""SELECT
+    query_template = """SELECT
   ?wditem
   ?itemLabel
   ?statements
@@ -463,7 +416,7 @@ def dump_rfd_linked_items(unpatrolled_changes:pd.DataFrame, rfdlinks:list[str])
   ?sitelinks
   (COUNT(DISTINCT ?backlink) AS ?backlinks)
 WHERE {{
-  VALUES ?item {{ wd:{" wd:".join(rfd_linked.index.tolist())} }}
+  VALUES ?item {{ {entities} }}
   ?item wikibase:statements ?statements;
         wikibase:identifiers ?identifiers;
         wikibase:sitelinks ?sitelinks .
@@ -475,249 +428,209 @@ WHERE {{
   SERVICE wikibase:label {{ bd:serviceParam wikibase:language 'en' }}
 }} GROUP BY ?wditem ?itemLabel ?statements ?identifiers ?sitelinks"""
 
-    wdqs_data = wdqs_query(query)
+    wdqs_data = wdqs_entity_query(query_template, rfd_linked.index.tolist(), 'wditem', 'items', WDQS_CACHE_TTL_ITEMS)
 
     rfd_linked = rfd_linked.merge(right=wdqs_data, left_on='rc_title', right_on='wditem')
-    rfd_linked.to_csv(DATAPATH + 'wdrfd-linked-full.tsv', sep='\t')
+    OUTPUT_WRITER.write_dataframe(rfd_linked, DATAPATH + 'wdrfd-linked-full.tsv', sep='\t')
 
     LOG.info('Dumped items linked from WD:RfD')
 
 
+@timed_stage
+def dump_snapshot(unpatrolled_changes:pd.DataFrame) -> None:
+    # one Parquet file per hive-style partition directory; missing broad actions go to pyarrow's default partition
+    partitions = unpatrolled_changes.groupby(by=SNAPSHOT_PARTITION_FIELDS, observed=True, dropna=False, sort=False)
+    for partition_keys, partition in partitions:
+        partition_path = SNAPSHOTPATH + '/'.join([
+            f'{field}={"__HIVE_DEFAULT_PARTITION__" if pd.isna(key) else key}' for field, key in zip(SNAPSHOT_PARTITION_FIELDS, partition_keys)
+        ])
+        makedirs(partition_path, exist_ok=True)
+
+        # dictionaries of categorical columns would otherwise contain all values of the full frame
+        partition = partition[SNAPSHOT_FIELDS].apply(
+            lambda column : column.cat.remove_unused_categories() if isinstance(column.dtype, pd.CategoricalDtype) else column
+        )
+
+        buffer = BytesIO()
+        partition.to_parquet(buffer, engine='pyarrow', compression='zstd', index=False)
+        OUTPUT_WRITER.write_bytes(f'{partition_path}/part-0.parquet', buffer.getvalue())
+
+    LOG.info(f'Dumped snapshot of {unpatrolled_changes.shape[0]} changes in {partitions.ngroups} partitions')
+
+
+@timed_stage
 def dump_actions(actions:dict[str, list[str]]) -> None:
-    with open(DATAPATH + 'actions.txt', mode='w', encoding='utf8') as file_handle:
-        for key, value in actions.items():
-            file_handle.write(f'{key}\t{", ".join(value)}\n')
+    OUTPUT_WRITER.write_text(DATAPATH + 'actions.txt', ''.join([ f'{key}\t{", ".join(value)}\n' for key, value in actions.items() ]))
 
     LOG.info('Dumped actions')
 
 
 #### dump processors for export
+@timed_stage
 def term_dump_processor(unpatrolled_changes:pd.DataFrame, term_actions:list[str]) -> None:
-    existing_dumps = glob(DATAPATH + 'term/worklist-*-terms-head.tsv')
     filt = (unpatrolled_changes['rc_patrolled']==0) \
         & (unpatrolled_changes['editsummary-magic-action'].isin(term_actions))
-    languages = unpatrolled_changes.loc[filt, 'editsummary-magic-param1'].drop_duplicates().tolist()
-
-    for existing_dump in existing_dumps:
-        language_code = existing_dump[38:-15]
-        if language_code not in languages: # hacky
-            delete_file(existing_dump)
-            delete_file(existing_dump.replace('head.tsv', 'full.tsv'))
 
-    for language in languages:
-        dump_terms(unpatrolled_changes, term_actions, language)
+    dump_partitioned_dataframe(
+        unpatrolled_changes.loc[filt],
+        'editsummary-magic-param1',
+        'term/worklist-{partition}-terms-{mode}.tsv',
+        sort_by='actor_name'
+    )
 
     LOG.info('Dumped term edits')
 
 
+@timed_stage
 def term_in_editentity_dump_processor(unpatrolled_changes:pd.DataFrame) -> None:
-    existing_dumps = glob(DATAPATH + 'termee/worklist-*-terms-in-editentity-head.tsv')
     filt = (unpatrolled_changes['rc_patrolled']==0) \
-        & (unpatrolled_changes['editsummary-magic-action-broad']=='editentity')
-    fields = 'editsummary-magic-param2'
-    lang_combis = unpatrolled_changes.loc[filt, fields].drop_duplicates().tolist()
-
-    languages = []
-    for lang_combi in lang_combis:
-        languages.extend(str(lang_combi).split(', '))
-    languages = list(set(languages))
-
-    for existing_dump in existing_dumps:
-        language_code = existing_dump[40:-29]
-        if language_code not in languages: # hacky
-            delete_file(existing_dump)
-            delete_file(existing_dump.replace('head.tsv', 'full.tsv'))
-
-    for language in languages:
-        dump_terms_in_editentity(unpatrolled_changes, language)
+        & (unpatrolled_changes['editsummary-magic-action-broad']=='editentity') \
+        & (unpatrolled_changes['editsummary-magic-param2'].notna())
+    lang_combis = unpatrolled_changes.loc[filt, 'editsummary-magic-param2'].astype('category')
+    lang_combi_languages = pd.Series([ list(set(str(lang_combi).split(', '))) for lang_combi in lang_combis.cat.categories ], dtype='object')
+    language_changes = unpatrolled_changes.loc[filt].assign(
+        language=lang_combi_languages.iloc[lang_combis.cat.codes].to_numpy()
+    ).explode('language')
+
+    dump_partitioned_dataframe(
+        language_changes,
+        'language',
+        'termee/worklist-{partition}-terms-in-editentity-{mode}.tsv',
+        sort_by='actor_name'
+    )
 
     LOG.info('Dumped term in editentity edits')
 
 
+@timed_stage
 def term_in_editentity_create_dump_processor(unpatrolled_changes:pd.DataFrame) -> None:
-    existing_dumps = glob(DATAPATH + 'termeec/worklist-*-terms-in-editentity-create-head.tsv')
     filt = (unpatrolled_changes['rc_patrolled']==0) \
         & (unpatrolled_changes['editsummary-magic-action']=='wbeditentity-create')
-    languages = unpatrolled_changes.loc[filt, 'editsummary-magic-param1'].drop_duplicates().tolist()
-
-    for existing_dump in existing_dumps:
-        language_code = existing_dump[41:-36]
-        if language_code not in languages: # hacky
-            delete_file(existing_dump)
-            delete_file(existing_dump.replace('head.tsv', 'full.tsv'))
 
-    for language in languages:
-        dump_terms_in_editentity_create(unpatrolled_changes, language)
+    dump_partitioned_dataframe(
+        unpatrolled_changes.loc[filt],
+        'editsummary-magic-param1',
+        'termeec/worklist-{partition}-terms-in-editentity-create-{mode}.tsv',
+        sort_by='actor_name'
+    )
 
     LOG.info('Dumped term in editentity creations')
 
 
+@timed_stage
 def project_sitelinks_dump_processor(unpatrolled_changes:pd.DataFrame, \
                                      sitelink_actions:list[str]) -> None:
-    existing_dumps = glob(DATAPATH + 'page/worklist-*-page-head.tsv')
     filt = (unpatrolled_changes['rc_patrolled']==0) \
         & (unpatrolled_changes['editsummary-magic-action'].isin(sitelink_actions))
-    projects = unpatrolled_changes.loc[filt, 'editsummary-magic-param1'].drop_duplicates().tolist()
 
-    for existing_dump in existing_dumps:
-        project_code = existing_dump[38:-14]
-        if project_code not in projects: # hacky
-            delete_file(existing_dump)
-            delete_file(existing_dump.replace('head.tsv', 'full.tsv'))
-
-    for project in projects:
-        dump_project_sitelink_changes(unpatrolled_changes, sitelink_actions, project)
+    dump_partitioned_dataframe(
+        unpatrolled_changes.loc[filt],
+        'editsummary-magic-param1',
+        'page/worklist-{partition}-page-{mode}.tsv'
+    )
 
     LOG.info('Dumped sitelink edits')
 
 
+@timed_stage
 def project_pagemoves_dump_processor(unpatrolled_changes:pd.DataFrame, \
                                      sitelink_move_actions:list[str]) -> None:
-    existing_dumps = glob(DATAPATH + 'pagemove/worklist-*-pagemove-head.tsv')
     filt = (unpatrolled_changes['rc_patrolled']==0) \
         & (unpatrolled_changes['editsummary-magic-action'].isin(sitelink_move_actions)) \
         & (unpatrolled_changes['editsummary-magic-param1'].notna())
-    projects = unpatrolled_changes.loc[filt, 'editsummary-magic-param1'].drop_duplicates().tolist()
-
-    for existing_dump in existing_dumps:
-        project_code = existing_dump[42:-18]
-        if project_code not in projects: # hacky
-            delete_file(existing_dump)
-            delete_file(existing_dump.replace('head.tsv', 'full.tsv'))
 
-    for project in projects:
-        dump_project_pagemoves(unpatrolled_changes, sitelink_move_actions, project)
+    dump_partitioned_dataframe(
+        unpatrolled_changes.loc[filt],
+        'editsummary-magic-param1',
+        'pagemove/worklist-{partition}-pagemove-{mode}.tsv'
+    )
 
     LOG.info('Dumped pagemove edits')
 
 
+@timed_stage
 def project_pageremovals_dump_processor(unpatrolled_changes:pd.DataFrame, \
                                         sitelink_move_actions:list[str]) -> None:
-    existing_dumps = glob(DATAPATH + 'pageremoval/worklist-*-pageremoval-head.tsv')
     filt = (unpatrolled_changes['rc_patrolled']==0) \
         & (unpatrolled_changes['editsummary-magic-action'].isin(sitelink_move_actions)) \
         & (unpatrolled_changes['editsummary-magic-param1'].isna())
-    projects = unpatrolled_changes.loc[filt, 'editsummary-magic-param2'].drop_duplicates().tolist()
-
-    for existing_dump in existing_dumps:
-        project_code = existing_dump[45:-21]
-        if project_code not in projects: # hacky
-            delete_file(existing_dump)
-            delete_file(existing_dump.replace('head.tsv', 'full.tsv'))
 
-    for project in projects:
-        dump_project_pageremovals(unpatrolled_changes, sitelink_move_actions, project)
+    dump_partitioned_dataframe(
+        unpatrolled_changes.loc[filt],
+        'editsummary-magic-param2',
+        'pageremoval/worklist-{partition}-pageremoval-{mode}.tsv'
+    )
 
     LOG.info('Dumped page removal edits')
 
 
+@timed_stage
 def editentity_dump_processor(unpatrolled_changes:pd.DataFrame, editentity_actions:list[str]) -> None:
-    existing_dumps = glob(DATAPATH + 'editentity/worklist-*-head.tsv')
     filt = (unpatrolled_changes['rc_patrolled']==0) \
         & (unpatrolled_changes['editsummary-magic-action'].isin(editentity_actions))
-    actions = unpatrolled_changes.loc[filt, 'editsummary-magic-action'].drop_duplicates().tolist()
-
-    for existing_dump in existing_dumps:
-        magic_action = existing_dump[44:-9]
-        if magic_action not in actions: # hacky
-            delete_file(existing_dump)
-            delete_file(existing_dump.replace('head.tsv', 'full.tsv'))
 
-    for action in actions:
-        dump_editentity_changes(unpatrolled_changes, action)
+    dump_partitioned_dataframe(
+        unpatrolled_changes.loc[filt],
+        'editsummary-magic-action',
+        'editentity/worklist-{partition}-{mode}.tsv'
+    )
 
     LOG.info('Dumped editentity edits')
 
 
+@timed_stage
 def property_dump_processor(unpatrolled_changes:pd.DataFrame, claim_actions:list[str]) -> None:
-    existing_dumps = glob(DATAPATH + 'property/worklist-*-head.tsv')
     filt = (unpatrolled_changes['rc_patrolled']==0) \
         & (unpatrolled_changes['editsummary-magic-action'].isin(claim_actions))
-    properties = unpatrolled_changes.loc[filt, 'editsummary-free-property'].drop_duplicates().tolist()
-
-    for existing_dump in existing_dumps:
-        prop = existing_dump[44:-9]
-        if prop not in properties: # hacky
-            delete_file(existing_dump)
-            delete_file(existing_dump.replace('head.tsv', 'full.tsv'))
 
-    for prop in properties:
-        dump_property_changes(unpatrolled_changes, claim_actions, prop)
+    dump_partitioned_dataframe(
+        unpatrolled_changes.loc[filt],
+        'editsummary-free-property',
+        'property/worklist-{partition}-{mode}.tsv'
+    )
 
     LOG.info('Dumped property edits')
 
 
-def print_patrol_progress_patrollers(patrol_progress:pd.DataFrame) -> None:
-    languages = list(patrol_progress['editsummary-magic-param1'].unique())
+def print_patrol_progress_patrollers(patrol_delay_stats:PatrolDelayStats) -> None:
+    patrollers = patrol_delay_stats['patrollers']
 
-    existing_dumps = glob(DATAPATH + 'progress_patrollers_by_lang/patrollers-*-head.tsv')
-    for existing_dump in existing_dumps:
-        lang = existing_dump[65:-9]
-        if lang not in languages: # hacky
-            delete_file(existing_dump)
-            delete_file(existing_dump.replace('head.tsv', 'full.tsv'))
-
-    for language in languages:
-        filt = (patrol_progress['editsummary-magic-param1']==language)
+    for language in patrol_delay_stats['describe'].index:
+        filt = (patrollers.index.get_level_values(0)==language)
         filename = f'progress_patrollers_by_lang/patrollers-{language}-{{mode}}.tsv'
-        dump_dataframe(patrol_progress.loc[filt].value_counts(subset='actor_name_y'), filename)
+        dump_dataframe(patrollers.loc[filt].droplevel(0).rename('count').sort_values(ascending=False), filename)
 
     LOG.info('Dumped patrol progress patrollers')
 
 
-def print_patrol_progress_unpatrolled(patrol_progress:pd.DataFrame) -> None:
-    languages = list(patrol_progress['editsummary-magic-param1'].unique())
-
-    existing_dumps = glob(DATAPATH + 'progress_by_lang/unpatrolled-*.tsv')
-    for existing_dump in existing_dumps:
-        lang = existing_dump[55:-4]
-        if lang not in languages: # hacky
-            delete_file(existing_dump)
-
-    for language in languages:
-        filt = (patrol_progress['editsummary-magic-param1']==language)
+def print_patrol_progress_unpatrolled(patrol_delay_stats:PatrolDelayStats) -> None:
+    for language, unpatrolled in patrol_delay_stats['unpatrolled'].items():
         filename = f'progress_by_lang/unpatrolled-{language}.tsv'
-        with open(DATAPATH + filename, mode='w', encoding='utf8') as file_handle:
-            file_handle.write(str(patrol_progress.loc[filt & (patrol_progress['patrol_delay'].isna())].shape[0]))
+        OUTPUT_WRITER.write_text(DATAPATH + filename, str(unpatrolled))
 
     LOG.info('Dumped patrol progress unpatrolled edits')
 
 
-def print_patrol_progress_describe(patrol_progress:pd.DataFrame) -> None:
-    languages = list(patrol_progress['editsummary-magic-param1'].unique())
-
-    existing_dumps = glob(DATAPATH + 'progress_by_lang/describe-*.tsv')
-    for existing_dump in existing_dumps:
-        lang = existing_dump[52:-4]
-        if lang not in languages: # hacky
-            delete_file(existing_dump)
-
-    for language in languages:
-        filt:pd.Series = (patrol_progress['editsummary-magic-param1']==language)
+def print_patrol_progress_describe(patrol_delay_stats:PatrolDelayStats) -> None:
+    for language, describe in patrol_delay_stats['describe'].iterrows():
         filename = f'progress_by_lang/describe-{language}.tsv'
-        with open(DATAPATH + filename, mode='w', encoding='utf8') as file_handle:
-            file_handle.write(patrol_progress.loc[filt, 'patrol_delay_seconds'].describe().to_string())
+        OUTPUT_WRITER.write_text(DATAPATH + filename, describe.to_string())
 
     LOG.info('Dumped patrol progress describe')
 
 
-def make_all_patrol_progress_stats(patrol_progress:pd.DataFrame) -> None:
-    print_patrol_progress_patrollers(patrol_progress)
-    print_patrol_progress_unpatrolled(patrol_progress)
-    print_patrol_progress_describe(patrol_progress)
+@timed_stage
+def make_all_patrol_progress_stats(patrol_delay_stats:PatrolDelayStats) -> None:
+    print_patrol_progress_patrollers(patrol_delay_stats)
+    print_patrol_progress_unpatrolled(patrol_delay_stats)
+    print_patrol_progress_describe(patrol_delay_stats)
 
 
+@timed_stage
 def make_not_ns0_stats(unpatrolled_changes:pd.DataFrame, translation_pages:list) -> None:
     namespaces = list(unpatrolled_changes.loc[(unpatrolled_changes['rc_patrolled']==0) \
             & (unpatrolled_changes['rc_this_oldid']!=0), 'namespace'].unique())
 
-    existing_dumps = glob(DATAPATH + 'not_ns0/worklist-*-head.tsv')
-    for existing_dump in existing_dumps:
-        namespace = existing_dump[40:-9].replace('_', ' ')
-        if namespace not in namespaces: # hacky
-            delete_file(existing_dump)
-            delete_file(existing_dump.replace('head.tsv', 'full.tsv'))
-
     unpatrolled_changes['full_page_title'] = unpatrolled_changes[['namespace', 'rc_title']].apply(
         lambda x : f'{x.namespace}:{x.rc_title}',
         axis=1,
@@ -1,17 +1,344 @@
-from io import StringIO
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import wraps
+from hashlib import sha256
+from io import BytesIO, StringIO
+import ipaddress
+import json
 import logging
-from os import mkdir, remove
-from os.path import isdir
-from time import perf_counter
+from os import getpid, listdir, mkdir, remove, replace, rmdir
+from os.path import dirname, isdir, isfile
+from pickle import UnpicklingError
+from resource import RUSAGE_CHILDREN, RUSAGE_SELF, getrusage
+from threading import Lock, get_ident, local
+from time import perf_counter, sleep, thread_time, time
+from typing import Any, BinaryIO, Callable, Iterator, Optional, TypedDict
 
+from matplotlib.figure import Figure
+from numpy import full as np_full, ndarray, searchsorted, sort as np_sort, zeros as np_zeros
 import pandas as pd
 import requests
 
-from .config import WDQS_ENDPOINT, USER_AGENT, PLOTPATH, DATAPATH, DUMP_UPDATE_FILE
+from .config import WDQS_ENDPOINT, USER_AGENT, PLOTPATH, DATAPATH, CACHEPATH, DUMP_UPDATE_FILE, OUTPUT_MANIFEST_FILE, \
+    PER_KEY_OUTPUT_DIRECTORIES, RUN_METRICS_FILE, RUN_METRICS_HISTORY_FILE, RUN_METRICS_HISTORY_LENGTH, \
+    WDQS_CHUNK_SIZE, WDQS_WORKERS, WDQS_TIMEOUT, WDQS_MAX_RETRIES, WDQS_BACKOFF, WDQS_CACHE_TTL_NEGATIVE
 
 
 LOG = logging.getLogger(__name__)
 
+WDQS_RETRY_STATUS_CODES = [ 429, 500, 502, 503, 504 ]
+WDQS_SESSION = requests.Session()  # keep-alive connection for all WDQS requests
+WDQS_SESSION.headers.update({
+    'Accept' : 'text/csv',
+    'User-Agent' : USER_AGENT
+})
+
+# anything else cannot be parsed as an IP address or range, thus is a registered user name
+IP_CANDIDATE_PATTERN = r'[0-9A-Fa-f:.]+(?:/\d{1,3})?'
+
+
+class WdqsCacheDict(TypedDict):
+    rows : Optional[pd.DataFrame]
+    expiries : pd.Series  # expiry timestamp per entity id
+
+
+class OutputReport(TypedDict):
+    hashes : dict[str, str]  # content hash per output file written in this run, including unchanged ones
+    files_written : int
+    bytes_written : int
+    files_skipped : int
+    bytes_skipped : int
+
+
+class OutputWriter:
+    def __init__(self, manifest_file:str):
+        self.manifest_file = manifest_file
+        self.previous_hashes = self._load_manifest()
+        self.report = self._empty_report()
+        self.report_lock = Lock()  # output is written from concurrent tasks as well
+
+
+    @staticmethod
+    def _empty_report() -> OutputReport:
+        return { 'hashes' : {}, 'files_written' : 0, 'bytes_written' : 0, 'files_skipped' : 0, 'bytes_skipped' : 0 }
+
+
+    def _load_manifest(self) -> dict[str, str]:
+        if not isfile(self.manifest_file):
+            return {}
+
+        try:
+            with open(self.manifest_file, mode='r', encoding='utf8') as file_handle:
+                return json.load(file_handle)
+        except (OSError, ValueError) as exception:
+            LOG.warning(f'Cannot read output manifest; all output files will be rewritten: {exception}')
+            return {}
+
+
+    @staticmethod
+    def _replace_file(filename:str, content:bytes) -> None:
+        with write_atomically(filename) as file_handle:
+            file_handle.write(content)
+
+
+    def write_bytes(self, filename:str, content:bytes) -> None:
+        content_hash = sha256(content).hexdigest()
+
+        if self.previous_hashes.get(filename) == content_hash and isfile(filename):
+            with self.report_lock:
+                self.report['hashes'][filename] = content_hash
+                self.report['files_skipped'] += 1
+                self.report['bytes_skipped'] += len(content)
+            return
+
+        self._replace_file(filename, content)
+        with self.report_lock:
+            self.report['hashes'][filename] = content_hash
+            self.report['files_written'] += 1
+            self.report['bytes_written'] += len(content)
+
+
+    def write_text(self, filename:str, text:str) -> None:
+        self.write_bytes(filename, text.encode('utf8'))
+
+
+    def write_dataframe(self, dataframe:pd.DataFrame, filename:str, **to_csv_kwargs) -> None:
+        self.write_text(filename, dataframe.to_csv(**to_csv_kwargs))
+
+
+    def write_figure(self, figure:Figure, filename:str) -> None:
+        buffer = BytesIO()
+        if filename.endswith('.svg'):  # no creation date, so that unchanged plots remain byte-identical
+            figure.savefig(buffer, format='svg', metadata={ 'Date' : None })
+        else:
+            figure.savefig(buffer, format=filename.rsplit('.', maxsplit=1)[-1])
+        self.write_bytes(filename, buffer.getvalue())
+
+
+    def pop_report(self) -> OutputReport:
+        with self.report_lock:
+            report, self.report = self.report, self._empty_report()
+        return report
+
+
+    def merge_report(self, report:OutputReport) -> None:  # for output written in worker processes
+        with self.report_lock:
+            self.report['hashes'].update(report['hashes'])
+            for key in [ 'files_written', 'bytes_written', 'files_skipped', 'bytes_skipped' ]:
+                self.report[key] += report[key]  # type: ignore
+
+
+    def remove_stale_files(self, directories:list[str]) -> None:
+        # files within directories listed in the previous manifest, but not written in this run
+        stale_filenames = [ filename for filename in set(self.previous_hashes).difference(self.report['hashes']) \
+                            if filename.startswith(tuple(directories)) ]
+        for filename in sorted(stale_filenames):
+            delete_file(filename)
+
+        # subdirectories left empty, such as partitions of the snapshot; the given directories themselves are kept
+        removed_directories = 0
+        for directory in sorted({ dirname(filename) for filename in stale_filenames }, reverse=True):
+            while f'{directory}/' not in directories and isdir(directory) and len(listdir(directory)) == 0:
+                rmdir(directory)
+                removed_directories += 1
+                directory = dirname(directory)
+
+        LOG.info(f'Removed {len(stale_filenames)} stale output files and {removed_directories} empty directories')
+
+
+    def dump_manifest(self) -> None:
+        report = self.pop_report()
+        self._replace_file(self.manifest_file, json.dumps(report['hashes'], indent=0, sort_keys=True).encode('utf8'))
+        self.previous_hashes = report['hashes']
+
+        LOG.info(f'Wrote {report["bytes_written"]/1024**2:.1f} MiB to {report["files_written"]} output files; ' \
+                 f'skipped {report["bytes_skipped"]/1024**2:.1f} MiB in {report["files_skipped"]} unchanged output files')
+
+
+OUTPUT_WRITER = OutputWriter(OUTPUT_MANIFEST_FILE)
+
+
+# times of nested stages, e.g. of queries within get_* stages, are included in the outer stage as well
+class StageMetrics(TypedDict):
+    stage : str
+    wall_time : float  # sec
+    cpu_time : float  # sec; of the thread running the stage, plus the rendering of plots submitted by the stage
+    peak_rss : float  # MiB; process-wide peak resident set size at the end of the stage, including concurrent tasks
+    rows : Optional[int]  # rows of the returned or else of the first passed dataframe
+
+
+class RunMetrics:
+    def __init__(self):
+        self.start_timestamp = time()
+        self.start_cpu_time = self._cpu_time()
+        self.stages:list[StageMetrics] = []
+        self.current = local()  # stage running in the current thread
+
+
+    @staticmethod
+    def _cpu_time() -> float:
+        own, children = getrusage(RUSAGE_SELF), getrusage(RUSAGE_CHILDREN)
+        return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+    @staticmethod
+    def _peak_rss() -> float:
+        return getrusage(RUSAGE_SELF).ru_maxrss / 1024  # ru_maxrss is in KiB on Linux
+
+
+    def start_run(self) -> None:
+        self.start_timestamp = time()
+        self.start_cpu_time = self._cpu_time()
+        self.stages = []
+
+
+    def current_stage(self) -> Optional[StageMetrics]:
+        return getattr(self.current, 'metrics', None)
+
+
+    @contextmanager
+    def stage(self, name:str) -> Iterator[StageMetrics]:
+        # other tasks and plot workers run concurrently, thus cpu time is measured per thread
+        metrics:StageMetrics = { 'stage' : name, 'wall_time' : 0., 'cpu_time' : 0., 'peak_rss' : 0., 'rows' : None }
+        t_start, cpu_start = perf_counter(), thread_time()
+        outer_metrics, self.current.metrics = self.current_stage(), metrics
+
+        try:
+            yield metrics
+        finally:
+            self.current.metrics = outer_metrics
+
+        metrics['wall_time'] = round(perf_counter() - t_start, 3)
+        metrics['cpu_time'] = round(metrics['cpu_time'] + thread_time() - cpu_start, 3)
+        metrics['peak_rss'] = round(self._peak_rss(), 1)
+        self.stages.append(metrics)
+
+
+    @staticmethod
+    def add_cpu_time(metrics:Optional[StageMetrics], cpu_time:float) -> None:  # for work done in worker processes
+        if metrics is not None:
+            metrics['cpu_time'] = round(metrics['cpu_time'] + cpu_time, 3)
+
+
+    def dump(self) -> None:
+        run_metrics = {
+            'start_timestamp' : round(self.start_timestamp),
+            'wall_time' : round(time() - self.start_timestamp, 3),
+            'cpu_time' : round(self._cpu_time() - self.start_cpu_time, 3),
+            'peak_rss' : round(self._peak_rss(), 1),
+            'stages' : self.stages
+        }
+        OUTPUT_WRITER.write_text(RUN_METRICS_FILE, json.dumps(run_metrics, indent=2))
+
+        history = []
+        if isfile(RUN_METRICS_HISTORY_FILE):
+            try:
+                with open(RUN_METRICS_HISTORY_FILE, mode='r', encoding='utf8') as file_handle:
+                    history = json.load(file_handle)
+            except (OSError, ValueError) as exception:
+                LOG.warning(f'Cannot read run metrics history; starting a new one: {exception}')
+        history = [ *history, run_metrics ][-RUN_METRICS_HISTORY_LENGTH:]
+        OUTPUT_WRITER.write_text(RUN_METRICS_HISTORY_FILE, json.dumps(history))
+
+        slowest_stages = sorted(self.stages, key=lambda stage_metrics : stage_metrics['wall_time'], reverse=True)[:5]
+        LOG.info(f'Dumped run metrics of {len(self.stages)} stages; slowest: ' \
+                 + ', '.join([ f'{stage_metrics["stage"]} {stage_metrics["wall_time"]:.1f} sec' for stage_metrics in slowest_stages ]))
+
+
+RUN_METRICS = RunMetrics()
+
+
+def timed_stage(func:Callable[..., Any]) -> Callable[..., Any]:
+    stage_name = f'{func.__module__.rsplit(".", maxsplit=1)[-1]}.{func.__name__}'
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with RUN_METRICS.stage(stage_name) as metrics:
+            result = func(*args, **kwargs)
+            dataframes = [ result, *args ]
+            for dataframe in dataframes:
+                if isinstance(dataframe, pd.DataFrame):
+                    metrics['rows'] = dataframe.shape[0]
+                    break
+
+        return result
+
+    return wrapper
+
+
+class TaskGraph:
+    def __init__(self, workers:int):
+        self.workers = workers
+        self.executor:Optional[ThreadPoolExecutor] = None
+        self.futures:dict[str, Future] = {}
+        self.timestamp = time()
+
+
+    def submit(self, name:str, func:Callable[..., Any], *args, after:Optional[list[str]]=None) -> Future:
+        # dependencies need to be submitted first; their results are passed ahead of args in the given order
+        dependencies = [ self.futures[dependency] for dependency in (after or []) ]
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='task')
+            self.timestamp = time()
+
+        # tasks start in submission order, thus a task only ever waits for dependencies that are already running
+        self.futures[name] = self.executor.submit(_run_task, func, args, dependencies)
+        return self.futures[name]
+
+
+    def result(self, name:str) -> Any:
+        return self.futures[name].result()
+
+
+    def results(self) -> dict[str, Any]:
+        results = { name : future.result() for name, future in self.futures.items() }
+        if self.executor is not None:
+            self.executor.shutdown()
+        self.executor, self.futures = None, {}
+
+        LOG.info(f'Completed {len(results)} tasks with {self.workers} worker(s) in {time()-self.timestamp:.1f} sec')
+        return results
+
+
+def _run_task(func:Callable[..., Any], args:tuple, dependencies:list[Future]) -> Any:
+    return func(*[ dependency.result() for dependency in dependencies ], *args)
+
+
+class IpRangeIndex:
+    def __init__(self, versions:ndarray, range_starts:ndarray, range_ends:ndarray):
+        # int bounds of IPv6 ranges exceed int64, thus keep them in sorted object arrays per IP version
+        self.bounds:dict[int, tuple[ndarray, ndarray]] = {}
+        for version in [ 4, 6 ]:
+            filt = (versions==version)
+            self.bounds[version] = (np_sort(range_starts[filt]), np_sort(range_ends[filt]))
+
+
+    def count_containing(self, versions:ndarray, ips:ndarray) -> ndarray:
+        # ranges containing ip: (ranges starting at or before ip) - (ranges ending before ip)
+        counts = np_zeros(ips.shape[0], dtype=int)
+        for version, (range_starts, range_ends) in self.bounds.items():
+            filt = (versions==version)
+            counts[filt] = searchsorted(range_starts, ips[filt], side='right') - searchsorted(range_ends, ips[filt], side='left')
+
+        return counts
+
+
+@contextmanager
+def write_atomically(filename:str) -> Iterator[BinaryIO]:
+    # written to a temporary file first, so that readers and later runs see either the previous or the new file,
+    # never a partially written one if the run is aborted
+    tmp_filename = f'{filename}.{getpid()}.{get_ident()}.tmp'
+    try:
+        with open(tmp_filename, mode='wb') as file_handle:
+            yield file_handle
+        replace(tmp_filename, filename)
+    except BaseException:
+        if isfile(tmp_filename):
+            remove(tmp_filename)
+        raise
+
 
 def delete_file(filename:str) -> None:
     try:
@@ -22,40 +349,158 @@ def delete_file(filename:str) -> None:
     LOG.info(f'Tried to delete file {filename}')
 
 
+def _wdqs_retry_delay(response:requests.Response, attempt:int) -> float:
+    retry_after = response.headers.get('Retry-After')
+    if retry_after is None:
+        return WDQS_BACKOFF * 2**attempt
+
+    try:
+        return float(retry_after)
+    except ValueError:  # Retry-After can also be an HTTP date
+        return max(0., (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds())
+
+
+def _wdqs_post(query:str) -> requests.Response:
+    attempt = 0
+    while True:
+        try:
+            response = WDQS_SESSION.post(
+                url=WDQS_ENDPOINT,
+                data={
+                    'query' : query
+                },
+                timeout=WDQS_TIMEOUT,
+                stream=True
+            )
+        except (requests.ConnectionError, requests.Timeout) as exception:
+            if attempt >= WDQS_MAX_RETRIES:
+                raise
+            delay = WDQS_BACKOFF * 2**attempt
+            LOG.warning(f'WDQS request failed; retry in {delay:.0f} sec: {exception}')
+        else:
+            if response.status_code not in WDQS_RETRY_STATUS_CODES or attempt >= WDQS_MAX_RETRIES:
+                response.raise_for_status()
+                return response
+            delay = _wdqs_retry_delay(response, attempt)
+            response.close()
+            LOG.warning(f'WDQS responded with HTTP status {response.status_code}; retry in {delay:.0f} sec')
+
+        sleep(delay)
+        attempt += 1
+
+
 def wdqs_query(query:str) -> pd.DataFrame:
     t_query_start = perf_counter()
 
-    response = requests.post(
-        url=WDQS_ENDPOINT,
-        data={
-            'query' : query
-        },
-        headers={
-            'Accept' : 'text/csv',
-            'User-Agent' : USER_AGENT
-        }
-    )
+    with _wdqs_post(query) as response:
+        response.raw.decode_content = True  # let urllib3 undo a gzip transfer encoding while streaming
+        df = pd.read_csv(response.raw)
 
-    t_query_end = perf_counter()
+    LOG.info(f'Queried WDQS to dataframe; {df.shape[0]} rows, query time {perf_counter() - t_query_start:.1f} sec')
 
-    df = pd.read_csv(
-        StringIO(
-            response.text
-        )
-    )
+    return df
 
-    LOG.info(f'Queried WDQS to dataframe; query time {t_query_end - t_query_start:.1f} sec')
+
+def wdqs_chunked_query(query_template:str, entities:list[str]) -> pd.DataFrame:
+    # query_template needs an {entities} placeholder for the VALUES clause; all results
+    # need to be grouped by entity, so that chunks do not affect them
+    chunks = [ entities[i:i+WDQS_CHUNK_SIZE] for i in range(0, max(len(entities), 1), WDQS_CHUNK_SIZE) ]
+    queries = [ query_template.format(entities=' '.join([ f'wd:{entity}' for entity in chunk ])) for chunk in chunks ]
+
+    with ThreadPoolExecutor(max_workers=WDQS_WORKERS) as executor:
+        results = list(executor.map(wdqs_query, queries))
+
+    # empty chunk results would turn all columns into object dtype
+    non_empty_results = [ result for result in results if result.shape[0] > 0 ]
+    df = pd.concat(objs=non_empty_results or results[:1], ignore_index=True)
+
+    LOG.info(f'Queried {len(entities)} entities from WDQS in {len(chunks)} chunk(s)')
 
     return df
 
 
+def _load_wdqs_cache(cache_file:str) -> WdqsCacheDict:
+    empty_cache:WdqsCacheDict = {
+        'rows' : None,
+        'expiries' : pd.Series(dtype='datetime64[ns]')
+    }
+
+    if not isfile(cache_file):
+        return empty_cache
+
+    try:
+        cache = pd.read_pickle(cache_file)
+    except (OSError, EOFError, UnpicklingError, AttributeError) as exception:
+        LOG.warning(f'Cannot read WDQS cache {cache_file}: {exception}')
+        return empty_cache
+
+    return cache
+
+
+def wdqs_entity_query(query_template:str, entities:list[str], key_column:str, cache_name:str, ttl:str) -> pd.DataFrame:
+    # key_column holds the entity id in the result; entities without result are cached as well, but with the shorter negative TTL
+    cache_file = f'{CACHEPATH}wdqs-{cache_name}.pkl'
+    cache = _load_wdqs_cache(cache_file)
+
+    now = pd.Timestamp.now()
+    requested_entities = pd.Index(entities).unique()
+    expiries = cache['expiries'].loc[cache['expiries']>now]
+    rows = cache['rows']
+    if rows is not None:
+        rows = rows.loc[rows[key_column].isin(expiries.index)]
+
+    missing_entities = requested_entities.difference(expiries.index, sort=False)
+    if missing_entities.shape[0] > 0 or rows is None:  # without any cached rows, the columns are unknown
+        queried_rows = wdqs_chunked_query(query_template, missing_entities.tolist())
+
+        new_expiries = pd.Series(
+            data=now + pd.Timedelta(WDQS_CACHE_TTL_NEGATIVE),
+            index=missing_entities,
+            dtype='datetime64[ns]'
+        )
+        new_expiries.loc[missing_entities.isin(queried_rows[key_column])] = now + pd.Timedelta(ttl)
+
+        expiries = pd.concat(objs=[expiries.drop(index=missing_entities, errors='ignore'), new_expiries])
+        if rows is None:
+            rows = queried_rows
+        else:
+            rows = pd.concat(objs=[rows.loc[~rows[key_column].isin(missing_entities)], queried_rows], ignore_index=True)
+
+        cache = {
+            'rows' : rows,
+            'expiries' : expiries
+        }
+        with write_atomically(cache_file) as file_handle:
+            pd.to_pickle(cache, file_handle)
+
+    LOG.info(f'Looked up {requested_entities.shape[0]} entities in WDQS cache {cache_name}; ' \
+             f'queried {missing_entities.shape[0]} missing or expired entities')
+
+    return rows.loc[rows[key_column].isin(requested_entities)].reset_index(drop=True)
+
+
 def dump_update_timestamp(timestmp:float) -> None:
-    with open(DUMP_UPDATE_FILE, mode='w', encoding='utf8') as file_handle:
-        file_handle.write(f'{timestmp:.0f}')
+    OUTPUT_WRITER.write_text(DUMP_UPDATE_FILE, f'{timestmp:.0f}')
 
     LOG.info(f'dumped update timestamp {timestmp:.0f}')
 
 
+def start_run_metrics() -> None:
+    RUN_METRICS.start_run()
+
+
+def dump_run_metrics() -> None:
+    RUN_METRICS.dump()
+
+
+def remove_stale_outputs() -> None:
+    OUTPUT_WRITER.remove_stale_files(PER_KEY_OUTPUT_DIRECTORIES)
+
+
+def dump_output_manifest() -> None:
+    OUTPUT_WRITER.dump_manifest()
+
+
 def get_actions() -> dict[str, list[str]]:
     actions = {
         'claim' : ['wbsetclaim', 'wbsetclaim-create', 'wbsetclaim-update', 'wbsetclaimvalue',
@@ -96,7 +541,8 @@ def get_actions() -> dict[str, list[str]]:
 def init_directories() -> None:
     required_directories = [
         DATAPATH,
-        PLOTPATH
+        PLOTPATH,
+        CACHEPATH
     ]
 
     for required_directory in required_directories:
@@ -107,6 +553,54 @@ def init_directories() -> None:
     LOG.info('Initialized directories')
 
 
+def classify_user_names(user_names:pd.Series) -> pd.DataFrame:
+    # every distinct user name is parsed at most once; range bounds are Python ints,
+    # as IPv6 addresses exceed int64; bounds of registered users are None
+    codes, unique_names = pd.factorize(user_names)
+    unique_names = pd.Series(unique_names, dtype='object')
+    unique_cnt = unique_names.shape[0]
+
+    # last position is a sentinel for missing user names (code -1)
+    user_types = np_full(unique_cnt+1, 'registered', dtype='object')
+    ip_versions = np_zeros(unique_cnt+1, dtype='int8')
+    range_starts = np_full(unique_cnt+1, None, dtype='object')
+    range_ends = np_full(unique_cnt+1, None, dtype='object')
+
+    candidates = unique_names.loc[unique_names.str.fullmatch(IP_CANDIDATE_PATTERN)]
+    for position, user_name in candidates.items():
+        try:
+            ip_network = ipaddress.ip_network(user_name, strict=False)
+        except ValueError:
+            continue
+
+        user_types[position] = f'ipv{ip_network.version}{"range" if ip_network.num_addresses > 1 else ""}'
+        ip_versions[position] = ip_network.version
+        range_starts[position] = int(ip_network.network_address)
+        range_ends[position] = int(ip_network.broadcast_address)
+
+    classified_user_names = pd.DataFrame(
+        data={
+            'user_type' : pd.Categorical(user_types[codes]),
+            'ip_version' : ip_versions[codes],
+            'range_start' : range_starts[codes],
+            'range_end' : range_ends[codes],
+        },
+        index=user_names.index
+    )
+
+    LOG.info(f'Classified {user_names.shape[0]} user names; parsed {candidates.shape[0]} IP candidates')
+
+    return classified_user_names
+
+
+def parse_qid_nums(titles:pd.Series) -> pd.Series:
+    # every distinct title is converted at most once; raises ValueError for titles other than Q<num>
+    codes, unique_titles = pd.factorize(titles)
+    unique_qid_nums = pd.Series(unique_titles, dtype='object').str.slice(1).astype('int32').to_numpy()
+
+    return pd.Series(unique_qid_nums[codes], index=titles.index, dtype='int32')
+
+
 def df_info(dataframe:pd.DataFrame) -> None:
     LOG.info(dataframe.shape)
 
@@ -1,7 +1,8 @@
-from glob import glob
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
 import logging
 from math import ceil as m_ceil
-from typing import Optional, TypedDict
+from time import thread_time, time
+from typing import Any, Callable, Optional, TypedDict
 
 from matplotlib import cm
 from matplotlib.colors import LogNorm
@@ -9,16 +10,19 @@ import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from matplotlib.axes import Axes
 from matplotlib.figure import Figure
-from numpy import array as np_array, amax
+from numpy import array as np_array, amax, ndarray, zeros as np_zeros
 import pandas as pd
 
 from .config import PLOT_WINDOW_DAYS, PLOTPATH, FIGSIZE_STANDARD, FIGSIZE_TALL, FIGSIZE_WIDE, FIGSIZE_HEATMAP, \
-    QID_BIN_SIZE, QID_BIN_MAX, ORES_MODELS
-from .helper import delete_file, wdqs_query
+    QID_BIN_SIZE, QID_BIN_MAX, ORES_MODELS, PLOT_WORKERS, WDQS_CACHE_TTL_PROPERTIES
+from .helper import OUTPUT_WRITER, RUN_METRICS, OutputReport, StageMetrics, timed_stage, wdqs_entity_query
+from .query import PATROL_DELAY_PERCENTILES, PatrolDelayStats, ores_scores_float64
 
 
 LOG = logging.getLogger(__name__)
 
+plt.rcParams['svg.hashsalt'] = 'wdpd'  # stable svg element ids, so that unchanged plots remain byte-identical
+
 
 class PlotParamsDict(TypedDict):
     filter_window : pd.Series
@@ -26,6 +30,18 @@ class PlotParamsDict(TypedDict):
     xticklabels_window : list[str]
 
 
+class PlotCube(TypedDict):
+    counts : pd.DataFrame  # changes per (date, weekday, hour, rc_patrolled, is_anon, rc_source, action_broad)
+    editors : pd.DataFrame  # distinct (date, weekday, hour, is_anon, actor_name) combinations
+
+
+class PlotJob(TypedDict):
+    render : Callable[..., Any]
+    args : tuple
+    followups : list['PlotJob']  # rendered once this job is done, with its return value as ymax
+    stage_metrics : Optional[StageMetrics]  # of the stage that submitted the job; rendering cpu time is added
+
+
 class Plot:
     def __init__(self, filename:Optional[str]=None, figsize:Optional[tuple[float, float]]=None, svg:bool=True):
         self.filename = filename
@@ -42,23 +58,159 @@ class Plot:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.fig.tight_layout()
         if self.filename is not None:
-            self.fig.savefig(f'{self.filename}.png')
+            OUTPUT_WRITER.write_figure(self.fig, f'{self.filename}.png')
             if self.svg is True:
-                self.fig.savefig(f'{self.filename}.svg')
+                OUTPUT_WRITER.write_figure(self.fig, f'{self.filename}.svg')
         plt.close(self.fig)
 
 
-def plot_edits_by_date(unpatrolled_changes:pd.DataFrame, plot_params:PlotParamsDict) -> int:
+class PlotScheduler:
+    def __init__(self, workers:int):
+        self.workers = workers
+        self.jobs:list[PlotJob] = []
+        self.executor:Optional[ProcessPoolExecutor] = None
+        self.pending:dict[Future, PlotJob] = {}
+        self.timestamp = time()
+
+
+    def start(self) -> None:
+        # all workers are forked with the first submission; do so before any concurrent task thread is started
+        self.timestamp = time()
+        if self.workers > 1 and self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            self.executor.submit(int).result()
+
+
+    def submit(self, render:Callable[..., Any], *args, after:Optional[PlotJob]=None) -> PlotJob:
+        job:PlotJob = { 'render' : render, 'args' : args, 'followups' : [], 'stage_metrics' : RUN_METRICS.current_stage() }
+        if after is not None:
+            after['followups'].append(job)
+        elif self.executor is not None:  # render right away while the main process compiles further plots and dumps
+            self.pending[self.executor.submit(_render_in_worker, job['render'], *job['args'])] = job
+        else:
+            self.jobs.append(job)
+
+        return job
+
+
+    def run(self) -> None:
+        jobs, self.jobs = self.jobs, []
+
+        if self.workers <= 1:
+            self.timestamp = time()
+            while len(jobs) > 0:
+                job = jobs.pop(0)
+                cpu_start = thread_time()
+                result = job['render'](*job['args'])
+                RUN_METRICS.add_cpu_time(job['stage_metrics'], thread_time() - cpu_start)
+                jobs.extend([ { **followup, 'args' : (*followup['args'], result) } for followup in job['followups'] ])
+        else:
+            self.start()
+            executor, pending = self.executor, self.pending
+            for job in jobs:
+                pending[executor.submit(_render_in_worker, job['render'], *job['args'])] = job
+
+            while len(pending) > 0:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = pending.pop(future)
+                    result, output_report, cpu_time = future.result()
+                    OUTPUT_WRITER.merge_report(output_report)
+                    RUN_METRICS.add_cpu_time(job['stage_metrics'], cpu_time)
+                    for followup in job['followups']:
+                        pending[executor.submit(_render_in_worker, followup['render'], *followup['args'], result)] = followup
+
+            executor.shutdown()
+            self.executor = None
+
+        LOG.info(f'Rendered plots with {self.workers} worker(s) in {time()-self.timestamp:.1f} sec')
+
+
+PLOT_SCHEDULER = PlotScheduler(PLOT_WORKERS)
+
+
+def _render_in_worker(render:Callable[..., Any], *args) -> tuple[Any, OutputReport, float]:
+    OUTPUT_WRITER.pop_report()  # discard the report inherited from the parent process
+    cpu_start = thread_time()
+    result = render(*args)
+
+    return result, OUTPUT_WRITER.pop_report(), thread_time() - cpu_start
+
+
+#### plot cube
+@timed_stage
+def compile_plot_cube(unpatrolled_changes:pd.DataFrame, plot_params:PlotParamsDict) -> PlotCube:
+    window = unpatrolled_changes.loc[plot_params['filter_window']]
+
+    keys = pd.DataFrame(
+        data={
+            'date' : window['time'].dt.floor('D'),
+            'hour' : window['time'].dt.hour,
+            'rc_patrolled' : window['rc_patrolled'],
+            'is_anon' : window['is_anon'],
+            'rc_source' : window['rc_source'],
+            'action_broad' : window['editsummary-magic-action-broad'],
+            'actor_name' : window['actor_name'],
+        }
+    )
+
+    counts = keys.groupby(
+        by=['date', 'hour', 'rc_patrolled', 'is_anon', 'rc_source', 'action_broad'],
+        observed=True,
+        dropna=False
+    ).size().reset_index(name='count')
+
+    editors = keys.groupby(
+        by=['date', 'hour', 'is_anon', 'actor_name'],
+        observed=True
+    ).size().reset_index().drop(columns=[0])
+
+    for frame in [ counts, editors ]:
+        frame.insert(1, 'weekday', frame['date'].dt.weekday)
+        frame['date'] = frame['date'].dt.date
+
+    LOG.info(f'Compiled plot cube with {counts.shape[0]} count cells and {editors.shape[0]} editor cells from {keys.shape[0]} changes')
+
+    return { 'counts' : counts, 'editors' : editors }
+
+
+def _cube_counts(plot_cube:PlotCube, by:list[str], filt:Optional[pd.Series]=None) -> pd.DataFrame:
+    counts = plot_cube['counts']
+    if filt is not None:
+        counts = counts.loc[filt]
+
+    return counts.groupby(by=by, observed=True)[['count']].sum()
+
+
+def _cube_editors(plot_cube:PlotCube, by:str) -> pd.Series:
+    editors = plot_cube['editors']
+
+    return editors.groupby(by=[ editors[by], ~editors['is_anon'] ])['actor_name'].nunique()
+
+
+#### export functions
+@timed_stage
+def start_plot_workers() -> None:
+    PLOT_SCHEDULER.start()
+
+
+def render_plots() -> None:
+    PLOT_SCHEDULER.run()
+
+
+#### plots
+@timed_stage
+def plot_edits_by_date(plot_cube:PlotCube, plot_params:PlotParamsDict) -> PlotJob:
+    tmp = _cube_counts(plot_cube, ['date', 'is_anon'])
+
+    return PLOT_SCHEDULER.submit(_render_edits_by_date, tmp, plot_params['xticks_window'], plot_params['xticklabels_window'])
+
+
+def _render_edits_by_date(tmp:pd.DataFrame, xticks_window:list[pd.Timestamp], xticklabels_window:list[str]) -> int:
     filename = f'{PLOTPATH}editsByDate'
 
     with Plot(filename=filename, figsize=FIGSIZE_STANDARD) as (_, ax):
-        tmp = unpatrolled_changes.loc[plot_params['filter_window'], ['rc_id']].groupby(
-            by=[
-                unpatrolled_changes['time'].dt.date,
-                unpatrolled_changes['actor_user'].isna()
-            ]
-        ).count()
-        tmp.groupby(level=0).sum().plot(kind='line', grid=True, ax=ax)
+        tmp.groupby(level=0, observed=True).sum().plot(kind='line', grid=True, ax=ax)
         tmp.unstack(level=1).plot(kind='line', grid=True, ax=ax)
 
         ax.legend(['total unpatrolled changes', 'by registered users', 'by IP users'])
@@ -67,28 +219,29 @@ def plot_edits_by_date(unpatrolled_changes:pd.DataFrame, plot_params:PlotParamsD
         _, _, _, ymax = ax.axis()
         ymax = int(ymax)
         ax.set(ylim=(0, ymax))
-        ax.set_xticks([ mdates.date2num(ts.to_pydatetime()) for ts in plot_params['xticks_window'] ])
-        ax.set_xticklabels(plot_params['xticklabels_window'])
+        ax.set_xticks([ mdates.date2num(ts.to_pydatetime()) for ts in xticks_window ])
+        ax.set_xticklabels(xticklabels_window)
 
     LOG.info('Plotted edits by date')
 
     return ymax
 
 
-def plot_edits_by_weekday(unpatrolled_changes:pd.DataFrame, plot_params:PlotParamsDict, ymax:Optional[int]=None) -> None:
+@timed_stage
+def plot_edits_by_weekday(plot_cube:PlotCube, after:Optional[PlotJob]=None) -> None:
+    tmp = _cube_counts(plot_cube, ['weekday', 'is_anon']).div(
+        other=PLOT_WINDOW_DAYS / 7,
+        axis=0
+    )
+
+    PLOT_SCHEDULER.submit(_render_edits_by_weekday, tmp, after=after)
+
+
+def _render_edits_by_weekday(tmp:pd.DataFrame, ymax:Optional[int]=None) -> None:
     filename = f'{PLOTPATH}editsByWeekday'
 
     with Plot(filename=filename, figsize=FIGSIZE_STANDARD) as (_, ax):
-        tmp = unpatrolled_changes.loc[plot_params['filter_window'], ['rc_id']].groupby(
-            by=[
-                unpatrolled_changes['time'].dt.weekday,
-                unpatrolled_changes['actor_user'].isna()
-            ]
-        ).count().div(
-            other=PLOT_WINDOW_DAYS / 7,
-            axis=0
-        )
-        tmp.groupby(level=0).sum().plot(kind='line', grid=True, ax=ax)
+        tmp.groupby(level=0, observed=True).sum().plot(kind='line', grid=True, ax=ax)
         tmp.unstack(level=1).plot(kind='line', grid=True, ax=ax)
 
         ax.legend(['total unpatrolled changes', 'by registered users', 'by IP users'])
@@ -102,20 +255,21 @@ def plot_edits_by_weekday(unpatrolled_changes:pd.DataFrame, plot_params:PlotPara
     LOG.info('Plotted edits by weekday')
 
 
-def plot_edits_by_hour(unpatrolled_changes:pd.DataFrame, plot_params:PlotParamsDict) -> None:
+@timed_stage
+def plot_edits_by_hour(plot_cube:PlotCube) -> None:
+    tmp = _cube_counts(plot_cube, ['hour', 'is_anon']).div(
+        other=PLOT_WINDOW_DAYS,
+        axis=0
+    )
+
+    PLOT_SCHEDULER.submit(_render_edits_by_hour, tmp)
+
+
+def _render_edits_by_hour(tmp:pd.DataFrame) -> None:
     filename = f'{PLOTPATH}editsByHour'
 
     with Plot(filename=filename, figsize=FIGSIZE_STANDARD) as (_, ax):
-        tmp = unpatrolled_changes.loc[plot_params['filter_window'], ['rc_id']].groupby(
-            by=[
-                unpatrolled_changes['time'].dt.hour,
-                unpatrolled_changes['actor_user'].isna()
-            ]
-        ).count().div(
-            other=PLOT_WINDOW_DAYS,
-            axis=0
-        )
-        tmp.groupby(level=0).sum().plot(kind='line', grid=True, ax=ax)
+        tmp.groupby(level=0, observed=True).sum().plot(kind='line', grid=True, ax=ax)
         tmp.unstack(level=1).plot(kind='line', grid=True, ax=ax)
 
         ax.legend(['total unpatrolled changes', 'by registered users', 'by IP users'])
@@ -128,16 +282,17 @@ def plot_edits_by_hour(unpatrolled_changes:pd.DataFrame, plot_params:PlotParamsD
     LOG.info('Plotted edits by hour')
 
 
-def plot_patrol_status_by_date(unpatrolled_changes:pd.DataFrame, plot_params:PlotParamsDict) -> int:
+@timed_stage
+def plot_patrol_status_by_date(plot_cube:PlotCube, plot_params:PlotParamsDict) -> PlotJob:
+    tmp = _cube_counts(plot_cube, ['date', 'rc_patrolled'])
+
+    return PLOT_SCHEDULER.submit(_render_patrol_status_by_date, tmp, plot_params['xticks_window'], plot_params['xticklabels_window'])
+
+
+def _render_patrol_status_by_date(tmp:pd.DataFrame, xticks_window:list[pd.Timestamp], xticklabels_window:list[str]) -> int:
     filename = f'{PLOTPATH}patrolstatusByDate'
 
     with Plot(filename=filename, figsize=FIGSIZE_STANDARD) as (_, ax):
-        tmp = unpatrolled_changes.loc[plot_params['filter_window'], ['rc_id']].groupby(
-            by=[
-                unpatrolled_changes['time'].dt.date,
-                unpatrolled_changes['rc_patrolled']
-            ]
-        ).count()
         tmp.unstack(level=1).plot(kind='line', grid=True, ax=ax)
 
         ax.legend(['still unpatrolled', 'manually patrolled'])
@@ -146,27 +301,28 @@ def plot_patrol_status_by_date(unpatrolled_changes:pd.DataFrame, plot_params:Plo
         _, _, _, ymax = ax.axis()
         ymax = int(ymax)
         ax.set(ylim=(0, ymax))
-        ax.set_xticks([ mdates.date2num(ts.to_pydatetime()) for ts in plot_params['xticks_window'] ])
-        ax.set_xticklabels(plot_params['xticklabels_window'])
+        ax.set_xticks([ mdates.date2num(ts.to_pydatetime()) for ts in xticks_window ])
+        ax.set_xticklabels(xticklabels_window)
 
     LOG.info('Plotted patrol status by date')
 
     return ymax
 
 
-def plot_patrol_status_by_weekday(unpatrolled_changes:pd.DataFrame, plot_params:PlotParamsDict, ymax:Optional[int]=None) -> None:
+@timed_stage
+def plot_patrol_status_by_weekday(plot_cube:PlotCube, after:Optional[PlotJob]=None) -> None:
+    tmp = _cube_counts(plot_cube, ['weekday', 'rc_patrolled']).div(
+        other=PLOT_WINDOW_DAYS / 7,
+        axis=1
+    )
+
+    PLOT_SCHEDULER.submit(_render_patrol_status_by_weekday, tmp, after=after)
+
+
+def _render_patrol_status_by_weekday(tmp:pd.DataFrame, ymax:Optional[int]=None) -> None:
     filename = f'{PLOTPATH}patrolstatusByWeekday'
 
     with Plot(filename=filename, figsize=FIGSIZE_STANDARD) as (_, ax):
-        tmp = unpatrolled_changes.loc[plot_params['filter_window'], ['rc_id']].groupby(
-            by=[
-                unpatrolled_changes['time'].dt.weekday,
-                unpatrolled_changes['rc_patrolled']
-            ]
-        ).count().div(
-            other=PLOT_WINDOW_DAYS / 7,
-            axis=1
-        )
         tmp.unstack(level=1).plot(kind='line', grid=True, ax=ax)
 
         ax.legend(['still unpatrolled', 'manually patrolled'])
@@ -180,19 +336,20 @@ def plot_patrol_status_by_weekday(unpatrolled_changes:pd.DataFrame, plot_params:
     LOG.info('Plotted patrol status by weekday')
 
 
-def plot_patrol_status_by_hour(unpatrolled_changes:pd.DataFrame, plot_params:PlotParamsDict) -> None:
+@timed_stage
+def plot_patrol_status_by_hour(plot_cube:PlotCube) -> None:
+    tmp = _cube_counts(plot_cube, ['hour', 'rc_patrolled']).div(
+        other=PLOT_WINDOW_DAYS,
+        axis=1
+    )
+
+    PLOT_SCHEDULER.submit(_render_patrol_status_by_hour, tmp)
+
+
+def _render_patrol_status_by_hour(tmp:pd.DataFrame) -> None:
     filename = f'{PLOTPATH}patrolstatusByHour'
 
     with Plot(filename=filename, figsize=FIGSIZE_STANDARD) as (_, ax):
-        tmp = unpatrolled_changes.loc[plot_params['filter_window'], ['rc_id']].groupby(
-            by=[
-                unpatrolled_changes['time'].dt.hour,
-                unpatrolled_changes['rc_patrolled']
-            ]
-        ).count().div(
-            other=PLOT_WINDOW_DAYS,
-            axis=1
-        )
         tmp.unstack(level=1).plot(kind='line', grid=True, ax=ax)
 
         ax.legend(['still unpatrolled', 'manually patrolled'])
@@ -205,17 +362,18 @@ def plot_patrol_status_by_hour(unpatrolled_changes:pd.DataFrame, plot_params:Plo
     LOG.info('Plotted patrol status by hour')
 
 
-def plot_editor_status_by_date(unpatrolled_changes:pd.DataFrame, plot_params:PlotParamsDict) -> int:
+@timed_stage
+def plot_editor_status_by_date(plot_cube:PlotCube, plot_params:PlotParamsDict) -> PlotJob:
+    tmp = _cube_editors(plot_cube, 'date')
+
+    return PLOT_SCHEDULER.submit(_render_editor_status_by_date, tmp, plot_params['xticks_window'], plot_params['xticklabels_window'])
+
+
+def _render_editor_status_by_date(tmp:pd.Series, xticks_window:list[pd.Timestamp], xticklabels_window:list[str]) -> int:
     filename = f'{PLOTPATH}editorstatusByDate'
 
     with Plot(filename=filename, figsize=FIGSIZE_STANDARD) as (_, ax):
-        tmp = unpatrolled_changes.loc[plot_params['filter_window'], ['rc_id', 'actor_name']].groupby(
-            by=[
-                unpatrolled_changes['time'].dt.date,
-                unpatrolled_changes['actor_user'].notna()
-            ]
-        )['actor_name'].nunique()
-        tmp.groupby(level=0).sum().plot(kind='line', grid=True, ax=ax)
+        tmp.groupby(level=0, observed=True).sum().plot(kind='line', grid=True, ax=ax)
         tmp.unstack(level=1).plot(kind='line', grid=True, ax=ax)
 
         ax.legend(['all types', '# of IPs', '# of registered users'])
@@ -224,28 +382,29 @@ def plot_editor_status_by_date(unpatrolled_changes:pd.DataFrame, plot_params:Plo
         _, _, _, ymax = ax.axis()
         ymax = int(ymax)
         ax.set(ylim=(0, ymax))
-        ax.set_xticks([ mdates.date2num(ts.to_pydatetime()) for ts in plot_params['xticks_window'] ])
-        ax.set_xticklabels(plot_params['xticklabels_window'])
+        ax.set_xticks([ mdates.date2num(ts.to_pydatetime()) for ts in xticks_window ])
+        ax.set_xticklabels(xticklabels_window)
 
     LOG.info('Plotted editor status by date')
 
     return ymax
 
 
-def plot_editor_status_by_weekday(unpatrolled_changes:pd.DataFrame, plot_params:PlotParamsDict, ymax:Optional[int]=None) -> None:
+@timed_stage
+def plot_editor_status_by_weekday(plot_cube:PlotCube, after:Optional[PlotJob]=None) -> None:
+    tmp = _cube_editors(plot_cube, 'weekday').div(
+        other=PLOT_WINDOW_DAYS / 7,
+        axis=0
+    )
+
+    PLOT_SCHEDULER.submit(_render_editor_status_by_weekday, tmp, after=after)
+
+
+def _render_editor_status_by_weekday(tmp:pd.Series, ymax:Optional[int]=None) -> None:
     filename = f'{PLOTPATH}editorstatusByWeekday'
 
     with Plot(filename=filename, figsize=FIGSIZE_STANDARD) as (_, ax):
-        tmp = unpatrolled_changes.loc[plot_params['filter_window'], ['rc_id', 'actor_name']].groupby(
-            by=[
-                unpatrolled_changes['time'].dt.weekday,
-                unpatrolled_changes['actor_user'].notna()
-            ]
-        )['actor_name'].nunique().div(
-            other=PLOT_WINDOW_DAYS / 7,
-            axis=0
-        )
-        tmp.groupby(level=0).sum().plot(kind='line', grid=True, ax=ax)
+        tmp.groupby(level=0, observed=True).sum().plot(kind='line', grid=True, ax=ax)
         tmp.unstack(level=1).plot(kind='line', grid=True, ax=ax)
 
         ax.legend(['all types', '# of IPs', '# of registered users'])
@@ -259,20 +418,21 @@ def plot_editor_status_by_weekday(unpatrolled_changes:pd.DataFrame, plot_params:
     LOG.info('Plotted editor status by weekday')
 
 
-def plot_editor_status_by_hour(unpatrolled_changes:pd.DataFrame, plot_params:PlotParamsDict) -> None:
+@timed_stage
+def plot_editor_status_by_hour(plot_cube:PlotCube) -> None:
+    tmp = _cube_editors(plot_cube, 'hour').div(
+        other=PLOT_WINDOW_DAYS,
+        axis=0
+    )
+
+    PLOT_SCHEDULER.submit(_render_editor_status_by_hour, tmp)
+
+
+def _render_editor_status_by_hour(tmp:pd.Series) -> None:
     filename = f'{PLOTPATH}editorstatusByHour'
 
     with Plot(filename=filename, figsize=FIGSIZE_STANDARD) as (_, ax):
-        tmp = unpatrolled_changes.loc[plot_params['filter_window'], ['rc_id', 'actor_name']].groupby(
-            by=[
-                unpatrolled_changes['time'].dt.hour,
-                unpatrolled_changes['actor_user'].notna()
-            ]
-        )['actor_name'].nunique().div(
-            other=PLOT_WINDOW_DAYS,
-            axis=0
-        )
-        tmp.groupby(level=0).sum().plot(kind='line', grid=True, ax=ax)
+        tmp.groupby(level=0, observed=True).sum().plot(kind='line', grid=True, ax=ax)
         tmp.unstack(level=1).plot(kind='line', grid=True, ax=ax)
 
         ax.legend(['all types', '# of IPs', '# of registered users'])
@@ -285,17 +445,18 @@ def plot_editor_status_by_hour(unpatrolled_changes:pd.DataFrame, plot_params:Plo
     LOG.info('Plotted editor status by hour')
 
 
-def plot_unpatrolled_actions_by_date(unpatrolled_changes:pd.DataFrame, plot_params:PlotParamsDict) -> None:
+@timed_stage
+def plot_unpatrolled_actions_by_date(plot_cube:PlotCube, plot_params:PlotParamsDict) -> None:
+    tmp = _cube_counts(plot_cube, ['date', 'rc_source'])
+
+    PLOT_SCHEDULER.submit(_render_unpatrolled_actions_by_date, tmp, plot_params['xticks_window'], plot_params['xticklabels_window'])
+
+
+def _render_unpatrolled_actions_by_date(tmp:pd.DataFrame, xticks_window:list[pd.Timestamp], xticklabels_window:list[str]) -> None:
     filename = f'{PLOTPATH}actionsByDate'
 
     with Plot(filename=filename, figsize=FIGSIZE_STANDARD) as (_, ax):
-        tmp = unpatrolled_changes.loc[plot_params['filter_window'], ['rc_id']].groupby(
-            by=[
-                unpatrolled_changes['time'].dt.date,
-                unpatrolled_changes['rc_source']
-            ]
-        ).count()
-        tmp.groupby(level=0).sum().plot(kind='line', grid=True, ax=ax)
+        tmp.groupby(level=0, observed=True).sum().plot(kind='line', grid=True, ax=ax)
         tmp.unstack(level=1).plot(kind='line', grid=True, ax=ax)
 
         ax.legend(['total changes', 'unpatrolled edit item', 'unpatrolled create item'])
@@ -303,52 +464,57 @@ def plot_unpatrolled_actions_by_date(unpatrolled_changes:pd.DataFrame, plot_para
         ax.set_ylabel('number of changes')
         _, _, _, ymax = ax.axis()
         ax.set(ylim=(0, ymax))
-        ax.set_xticks([ mdates.date2num(ts.to_pydatetime()) for ts in plot_params['xticks_window'] ])
-        ax.set_xticklabels(plot_params['xticklabels_window'])
+        ax.set_xticks([ mdates.date2num(ts.to_pydatetime()) for ts in xticks_window ])
+        ax.set_xticklabels(xticklabels_window)
 
     LOG.info('Plotted unpatrolled actions by date')
 
 
-def plot_reverted_by_date(unpatrolled_changes:pd.DataFrame, change_tags:pd.DataFrame, plot_params:PlotParamsDict) -> None:
-    filename = f'{PLOTPATH}revertedByDate'
+@timed_stage
+def plot_reverted_by_date(unpatrolled_changes:pd.DataFrame, plot_params:PlotParamsDict) -> None:
+    tmp_rev_1 = unpatrolled_changes.loc[plot_params['filter_window'] & unpatrolled_changes['reverted'].notna(), ['rc_id', 'time', 'reverted']]
+    tmp_rev_1a = tmp_rev_1.groupby(by=tmp_rev_1['time'].dt.date).count()
+    tmp_rev_2 = unpatrolled_changes.groupby(by=unpatrolled_changes['time'].dt.date).count()
+    tmp_rev_full = tmp_rev_1a[['reverted']].join(other=tmp_rev_2[['rc_id']])
+    del tmp_rev_1, tmp_rev_1a, tmp_rev_2
 
-    undone = ['mw-reverted']
+    PLOT_SCHEDULER.submit(_render_reverted_by_date, tmp_rev_full, plot_params['xticks_window'], plot_params['xticklabels_window'])
 
-    with Plot(filename=filename, figsize=FIGSIZE_STANDARD) as (_, ax):
-        tmp_rev_1 = unpatrolled_changes.loc[plot_params['filter_window'], ['rc_id', 'time']].merge(
-            right=change_tags.loc[(change_tags['ctd_name'].isin(undone)), ['rc_id', 'ctd_name']],
-            on='rc_id'
-        )
-        tmp_rev_1a = tmp_rev_1.groupby(by=tmp_rev_1['time'].dt.date).count()
-        tmp_rev_2 = unpatrolled_changes.groupby(by=unpatrolled_changes['time'].dt.date).count()
-        tmp_rev_full = tmp_rev_1a[['ctd_name']].join(other=tmp_rev_2[['rc_id']])
-        del tmp_rev_1, tmp_rev_1a, tmp_rev_2
 
-        tmp_rev_full.plot(y=['ctd_name', 'rc_id'], kind='line', grid=True, ax=ax)
+def _render_reverted_by_date(tmp_rev_full:pd.DataFrame, xticks_window:list[pd.Timestamp], xticklabels_window:list[str]) -> None:
+    filename = f'{PLOTPATH}revertedByDate'
+
+    with Plot(filename=filename, figsize=FIGSIZE_STANDARD) as (_, ax):
+        tmp_rev_full.plot(y=['reverted', 'rc_id'], kind='line', grid=True, ax=ax)
 
         ax.legend(['reverted (lower bound)', 'not reverted (upper bound)'])
         ax.set_xlabel('date')
         ax.set_ylabel('number of changes')
         _, _, _, ymax = ax.axis()
         ax.set(ylim=(0, ymax))
-        ax.set_xticks([ mdates.date2num(ts.to_pydatetime()) for ts in plot_params['xticks_window'] ])
-        ax.set_xticklabels(plot_params['xticklabels_window'])
+        ax.set_xticks([ mdates.date2num(ts.to_pydatetime()) for ts in xticks_window ])
+        ax.set_xticklabels(xticklabels_window)
 
     LOG.info('Plotted reverted edits by date')
 
 
+@timed_stage
 def plot_qid_bin_by_revisions(unpatrolled_changes:pd.DataFrame) -> None:
+    tmp_unpatrolled = unpatrolled_changes.loc[(unpatrolled_changes['rc_patrolled']==0 & unpatrolled_changes['reverted'].isna()), ['num_title']].groupby(by=unpatrolled_changes['num_title'].floordiv(other=QID_BIN_SIZE)).count()
+    tmp_patrolled = unpatrolled_changes.loc[(unpatrolled_changes['rc_patrolled']==1 & unpatrolled_changes['reverted'].isna()), ['num_title']].groupby(by=unpatrolled_changes['num_title'].floordiv(other=QID_BIN_SIZE)).count()
+    tmp_reverted =  unpatrolled_changes.loc[~unpatrolled_changes['reverted'].isna(), ['num_title']].groupby(by=unpatrolled_changes['num_title'].floordiv(other=QID_BIN_SIZE)).count()
+    tmp_unpatrolled.rename(columns={'num_title' : 'cnt_unpatrolled'}, inplace=True)
+    tmp_patrolled.rename(columns={'num_title' : 'cnt_patrolled'}, inplace=True)
+    tmp_reverted.rename(columns={'num_title' : 'cnt_reverted'}, inplace=True)
+    tmp = tmp_unpatrolled.merge(right=tmp_patrolled, on='num_title', how='left').merge(right=tmp_reverted, on='num_title', how='left')
+
+    PLOT_SCHEDULER.submit(_render_qid_bin_by_revisions, tmp)
+
+
+def _render_qid_bin_by_revisions(tmp:pd.DataFrame) -> None:
     filename = f'{PLOTPATH}qidBinRev'
 
     with Plot(filename=filename, figsize=FIGSIZE_STANDARD) as (_, ax):
-        tmp_unpatrolled = unpatrolled_changes.loc[(unpatrolled_changes['rc_patrolled']==0 & unpatrolled_changes['reverted'].isna()), ['num_title']].groupby(by=unpatrolled_changes['num_title'].floordiv(other=QID_BIN_SIZE)).count()
-        tmp_patrolled = unpatrolled_changes.loc[(unpatrolled_changes['rc_patrolled']==1 & unpatrolled_changes['reverted'].isna()), ['num_title']].groupby(by=unpatrolled_changes['num_title'].floordiv(other=QID_BIN_SIZE)).count()
-        tmp_reverted =  unpatrolled_changes.loc[~unpatrolled_changes['reverted'].isna(), ['num_title']].groupby(by=unpatrolled_changes['num_title'].floordiv(other=QID_BIN_SIZE)).count()
-        tmp_unpatrolled.rename(columns={'num_title' : 'cnt_unpatrolled'}, inplace=True)
-        tmp_patrolled.rename(columns={'num_title' : 'cnt_patrolled'}, inplace=True)
-        tmp_reverted.rename(columns={'num_title' : 'cnt_reverted'}, inplace=True)
-        tmp = tmp_unpatrolled.merge(right=tmp_patrolled, on='num_title', how='left').merge(right=tmp_reverted, on='num_title', how='left')
-
         tmp.plot.bar(stacked=True,grid=True, ax=ax, width=1)
         ax.legend(['still unpatrolled', 'manually patrolled', 'reverted'])
         ax.set_xlabel('Q-ID bin (1M item bins)')
@@ -361,13 +527,19 @@ def plot_qid_bin_by_revisions(unpatrolled_changes:pd.DataFrame) -> None:
     LOG.info('Plotted QID bins by revisions')
 
 
+@timed_stage
 def plot_qid_bin_by_item(unpatrolled_changes:pd.DataFrame) -> None:
+    tmp =  unpatrolled_changes[['num_title']].drop_duplicates().groupby(
+        by=unpatrolled_changes['num_title'].floordiv(other=QID_BIN_SIZE)
+    ).count()
+
+    PLOT_SCHEDULER.submit(_render_qid_bin_by_item, tmp)
+
+
+def _render_qid_bin_by_item(tmp:pd.DataFrame) -> None:
     filename = f'{PLOTPATH}qidBinQid'
 
     with Plot(filename=filename, figsize=FIGSIZE_STANDARD) as (_, ax):
-        tmp =  unpatrolled_changes[['num_title']].drop_duplicates().groupby(
-            by=unpatrolled_changes['num_title'].floordiv(other=QID_BIN_SIZE)
-        ).count()
         tmp.plot.bar(stacked=True, grid=True, ax=ax, width=1)
 
         ax.legend(['items with unpatrolled changes'])
@@ -380,75 +552,72 @@ def plot_qid_bin_by_item(unpatrolled_changes:pd.DataFrame) -> None:
     LOG.info('Plotted QID bins by items')
 
 
-def plot_broad_action_by_date(unpatrolled_changes:pd.DataFrame, plot_params:PlotParamsDict) -> None:
+@timed_stage
+def plot_broad_action_by_date(plot_cube:PlotCube, plot_params:PlotParamsDict) -> None:
+    tmp = _cube_counts(plot_cube, ['date', 'action_broad'])
+
+    PLOT_SCHEDULER.submit(_render_broad_action_by_date, tmp, plot_params['xticklabels_window'])
+
+
+def _render_broad_action_by_date(tmp:pd.DataFrame, xticklabels_window:list[str]) -> None:
     filename = f'{PLOTPATH}broadActionByDate'
 
     with Plot(filename=filename, figsize=FIGSIZE_WIDE) as (_, ax):
-        tmp = unpatrolled_changes.loc[plot_params['filter_window'], ['rc_id']].groupby(
-            by=[
-                unpatrolled_changes['time'].dt.date,
-                unpatrolled_changes['editsummary-magic-action-broad']
-            ]
-        ).count()
         tmp.unstack(level=1).plot.bar(stacked=True, grid=True, ax=ax)
 
         ax.legend(tmp.index.get_level_values(1).drop_duplicates().sort_values(ascending=True).tolist(), loc='best', bbox_to_anchor=(1.05, 1)) # messy, but hey ...
         ax.set_xlabel('date')
         ax.set_ylabel('number of changes')
         ax.set_xticks(range(0, 29, 7)) # also messy
-        ax.set_xticklabels(plot_params['xticklabels_window'], rotation=0, ha='center')
+        ax.set_xticklabels(xticklabels_window, rotation=0, ha='center')
 
     LOG.info('Plotted broad action by date')
 
 
-def plot_broad_action_by_patrol_status(unpatrolled_changes:pd.DataFrame, plot_params:PlotParamsDict) -> None:
-    filename = f'{PLOTPATH}broadActionByPatrolStatus'
+def _render_by_patrol_status(tmp:pd.DataFrame, column:Optional[str], filenamepart:str, figsize:tuple[float, float], ylabel:str) -> None:
+    filename = f'{PLOTPATH}{filenamepart}ByPatrolStatus'
 
-    with Plot(filename=filename, figsize=FIGSIZE_STANDARD) as (_, ax):
-        tmp = unpatrolled_changes.loc[plot_params['filter_window'], ['rc_id']].groupby(
-            by=[
-                unpatrolled_changes['editsummary-magic-action-broad'],
-                unpatrolled_changes['rc_patrolled']
-            ]
-        ).count()
-        tmp = tmp.merge(
-            right=tmp.groupby(level=0).sum(),
-            left_index=True,
-            right_index=True
-        )
-        tmp.sort_values(by='rc_id_y', ascending=False, inplace=True)
-        tmp.loc[tmp['rc_id_y']>10].unstack(level=1).plot.barh(y='rc_id_x', stacked=True, grid=True, ax=ax)
+    with Plot(filename=filename, figsize=figsize) as (_, ax):
+        tmp.plot.barh(y=column, stacked=True, grid=True, ax=ax)
 
         ax.legend(['not patrolled', 'patrolled'])
         ax.invert_yaxis()
         ax.set_xlabel('number of changes')
-        ax.set_ylabel('type of action')
+        ax.set_ylabel(ylabel)
 
-    LOG.info('Plotted broad action by patrol status')
+    LOG.info(f'Plotted {filenamepart} by patrol status')
 
 
+@timed_stage
+def plot_broad_action_by_patrol_status(plot_cube:PlotCube) -> None:
+    tmp = _cube_counts(plot_cube, ['action_broad', 'rc_patrolled'])
+    tmp = tmp.merge(
+        right=tmp.groupby(level=0, observed=True).sum(),
+        left_index=True,
+        right_index=True
+    )
+    tmp.sort_values(by='count_y', ascending=False, inplace=True)
+
+    PLOT_SCHEDULER.submit(_render_by_patrol_status, tmp.loc[tmp['count_y']>10].unstack(level=1), 'count_x', 'broadAction', FIGSIZE_STANDARD, 'type of action')
+
+
+@timed_stage
 def plot_language_by_patrol_status(unpatrolled_changes:pd.DataFrame, termactions:list[str]) -> None: # termactions=actions['terms']
-    filename = f'{PLOTPATH}languageByPatrolStatus'
-
-    with Plot(filename=filename, figsize=FIGSIZE_TALL) as (_, ax):
-        tmp = unpatrolled_changes.loc[unpatrolled_changes['editsummary-magic-action'].isin(termactions), ['rc_id']].groupby(
-            by=[
-                unpatrolled_changes['editsummary-magic-param1'],
-                unpatrolled_changes['rc_patrolled']
-            ]
-        ).count()
-        tmp = tmp.merge(
-            right=tmp.groupby(level=0).sum(),
-            left_index=True,
-            right_index=True
-        )
-        tmp.sort_values(by='rc_id_y', ascending=False, inplace=True)
-        tmp.loc[tmp['rc_id_y']>300].unstack(level=1).plot.barh(y='rc_id_x', stacked=True, grid=True, ax=ax)
+    tmp = unpatrolled_changes.loc[unpatrolled_changes['editsummary-magic-action'].isin(termactions), ['rc_id']].groupby(
+        by=[
+            unpatrolled_changes['editsummary-magic-param1'],
+            unpatrolled_changes['rc_patrolled']
+        ],
+        observed=True
+    ).count()
+    tmp = tmp.merge(
+        right=tmp.groupby(level=0, observed=True).sum(),
+        left_index=True,
+        right_index=True
+    )
+    tmp.sort_values(by='rc_id_y', ascending=False, inplace=True)
 
-        ax.legend(['not patrolled', 'patrolled'])
-        ax.invert_yaxis()
-        ax.set_xlabel('number of changes')
-        ax.set_ylabel('language code')
+    PLOT_SCHEDULER.submit(_render_by_patrol_status, tmp.loc[tmp['rc_id_y']>300].unstack(level=1), 'rc_id_x', 'language', FIGSIZE_TALL, 'language code')
 
     ### output to file
     tmp2 = tmp.drop(labels='rc_id_y', axis=1).unstack(fill_value=0)
@@ -459,33 +628,28 @@ def plot_language_by_patrol_status(unpatrolled_changes:pd.DataFrame, termactions
 
     tmp2.sort_values(by=['total', 'unpatrolled'], ascending=[False, False], inplace=True)
 
-    tmp2.to_csv('/data/project/wdpd/data/plot-language-full.tsv', sep='\t')
+    OUTPUT_WRITER.write_dataframe(tmp2, '/data/project/wdpd/data/plot-language-full.tsv', sep='\t')
 
-    LOG.info('Plotted languages by patrol status')
+    LOG.info('Dumped languages by patrol status')
 
 
+@timed_stage
 def plot_property_by_patrol_status(unpatrolled_changes:pd.DataFrame, claimactions:list[str]) -> None: # claimactions=actions['allclaims']
-    filename = f'{PLOTPATH}propertyByPatrolStatus'
-
-    with Plot(filename=filename, figsize=FIGSIZE_TALL) as (_, ax):
-        tmp = unpatrolled_changes.loc[unpatrolled_changes['editsummary-magic-action'].isin(claimactions), ['rc_id']].groupby(
-            by=[
-                unpatrolled_changes['editsummary-free-property'],
-                unpatrolled_changes['rc_patrolled']
-            ]
-        ).count()
-        tmp = tmp.merge(
-            right=tmp.groupby(level=0).sum(),
-            left_index=True,
-            right_index=True
-        )
-        tmp.sort_values(by='rc_id_y', ascending=False, inplace=True)
-        tmp.loc[tmp['rc_id_y']>500].unstack(level=1).plot.barh(y='rc_id_x', stacked=True, grid=True, ax=ax)
+    tmp = unpatrolled_changes.loc[unpatrolled_changes['editsummary-magic-action'].isin(claimactions), ['rc_id']].groupby(
+        by=[
+            unpatrolled_changes['editsummary-free-property'],
+            unpatrolled_changes['rc_patrolled']
+        ],
+        observed=True
+    ).count()
+    tmp = tmp.merge(
+        right=tmp.groupby(level=0, observed=True).sum(),
+        left_index=True,
+        right_index=True
+    )
+    tmp.sort_values(by='rc_id_y', ascending=False, inplace=True)
 
-        ax.legend(['not patrolled', 'patrolled'])
-        ax.invert_yaxis()
-        ax.set_xlabel('number of changes')
-        ax.set_ylabel('property')
+    PLOT_SCHEDULER.submit(_render_by_patrol_status, tmp.loc[tmp['rc_id_y']>500].unstack(level=1), 'rc_id_x', 'property', FIGSIZE_TALL, 'property')
 
     ### output to file
     tmp2 = tmp.drop(labels='rc_id_y', axis=1).unstack(fill_value=0)
@@ -494,46 +658,41 @@ def plot_property_by_patrol_status(unpatrolled_changes:pd.DataFrame, claimaction
     tmp2.columns = pd.Index([ 'unpatrolled', 'patrolled' ])
     tmp2['total'] = tmp2['unpatrolled'] + tmp2['patrolled']
 
-    query = f"""SELECT ?prop ?propertyLabel ?dtype WHERE {{
-      VALUES ?property {{ wd:{" wd:".join(tmp2.index.tolist())} }}
+    query_template = """SELECT ?prop ?propertyLabel ?dtype WHERE {{
+      VALUES ?property {{ {entities} }}
       ?property wikibase:propertyType ?datatype .
       BIND(STRAFTER(STR(?property), 'entity/') AS ?prop) .
       BIND(STRAFTER(STR(?datatype), 'ontology#') AS ?dtype) .
       SERVICE wikibase:label {{ bd:serviceParam wikibase:language 'en' }}
     }}"""
 
-    wdqs_data = wdqs_query(query)
+    wdqs_data = wdqs_entity_query(query_template, tmp2.index.tolist(), 'prop', 'properties', WDQS_CACHE_TTL_PROPERTIES)
 
     tmp2 = tmp2.merge(right=wdqs_data, left_on='editsummary-free-property', right_on='prop')
     tmp2.sort_values(by=['total', 'unpatrolled', 'propertyLabel'], ascending=[False, False, True], inplace=True)
 
-    tmp2.to_csv('/data/project/wdpd/data/plot-property-full.tsv', sep='\t')
+    OUTPUT_WRITER.write_dataframe(tmp2, '/data/project/wdpd/data/plot-property-full.tsv', sep='\t')
 
-    LOG.info('Plotted properties by patrol status')
+    LOG.info('Dumped properties by patrol status')
 
 
+@timed_stage
 def plot_sitelink_by_patrol_status(unpatrolled_changes:pd.DataFrame, sitelinkactions:list[str]) -> None: # sitelinkactions=actions['sitelink'] or actions['allsitelinks']
-    filename = f'{PLOTPATH}sitelinkByPatrolStatus'
-
-    with Plot(filename=filename, figsize=FIGSIZE_TALL) as (_, ax):
-        tmp = unpatrolled_changes.loc[unpatrolled_changes['editsummary-magic-action'].isin(sitelinkactions), ['rc_id']].groupby(
-            by=[
-                unpatrolled_changes['editsummary-magic-param1'],
-                unpatrolled_changes['rc_patrolled']
-            ]
-        ).count()
-        tmp = tmp.merge(
-            right=tmp.groupby(level=0).sum(),
-            left_index=True,
-            right_index=True
-        )
-        tmp.sort_values(by='rc_id_y', ascending=False, inplace=True)
-        tmp.loc[tmp['rc_id_y']>300].unstack(level=1).plot.barh(y='rc_id_x', stacked=True, grid=True, ax=ax)
+    tmp = unpatrolled_changes.loc[unpatrolled_changes['editsummary-magic-action'].isin(sitelinkactions), ['rc_id']].groupby(
+        by=[
+            unpatrolled_changes['editsummary-magic-param1'],
+            unpatrolled_changes['rc_patrolled']
+        ],
+        observed=True
+    ).count()
+    tmp = tmp.merge(
+        right=tmp.groupby(level=0, observed=True).sum(),
+        left_index=True,
+        right_index=True
+    )
+    tmp.sort_values(by='rc_id_y', ascending=False, inplace=True)
 
-        ax.legend(['not patrolled', 'patrolled'])
-        ax.invert_yaxis()
-        ax.set_xlabel('number of changes')
-        ax.set_ylabel('project')
+    PLOT_SCHEDULER.submit(_render_by_patrol_status, tmp.loc[tmp['rc_id_y']>300].unstack(level=1), 'rc_id_x', 'sitelink', FIGSIZE_TALL, 'project')
 
     ### output to file
     tmp2 = tmp.drop(labels='rc_id_y', axis=1).unstack(fill_value=0)
@@ -544,40 +703,40 @@ def plot_sitelink_by_patrol_status(unpatrolled_changes:pd.DataFrame, sitelinkact
 
     tmp2.sort_values(by=['total', 'unpatrolled'], ascending=[False, False], inplace=True)
 
-    tmp2.to_csv('/data/project/wdpd/data/plot-sitelink-full.tsv', sep='\t')
+    OUTPUT_WRITER.write_dataframe(tmp2, '/data/project/wdpd/data/plot-sitelink-full.tsv', sep='\t')
 
-    LOG.info('Plotted sitelinks by patrol status')
+    LOG.info('Dumped sitelinks by patrol status')
 
 
+@timed_stage
 def plot_other_actions_by_patrol_status(unpatrolled_changes:pd.DataFrame, otheractions:list[str]) -> None: # otheractions=actions['editentity'] + actions['linktitles'] + actions['merge'] + actions['revert'] + actions['none']
-    filename = f'{PLOTPATH}otherActionsByPatrolStatus'
+    tmp = unpatrolled_changes.loc[unpatrolled_changes['editsummary-magic-action'].isin(otheractions), ['rc_id']].groupby(
+        by=[
+            unpatrolled_changes['editsummary-magic-action-broad'],
+            unpatrolled_changes['rc_patrolled']
+        ],
+        observed=True
+    ).count()
 
-    with Plot(filename=filename, figsize=FIGSIZE_STANDARD) as (_, ax):
-        tmp = unpatrolled_changes.loc[unpatrolled_changes['editsummary-magic-action'].isin(otheractions), ['rc_id']].groupby(
-            by=[
-                unpatrolled_changes['editsummary-magic-action-broad'],
-                unpatrolled_changes['rc_patrolled']
-            ]
-        ).count()
-        tmp.unstack(level=1).plot.barh(stacked=True, grid=True, ax=ax)
+    PLOT_SCHEDULER.submit(_render_by_patrol_status, tmp.unstack(level=1), None, 'otherActions', FIGSIZE_STANDARD, 'type of action')
 
-        ax.legend(['not patrolled', 'patrolled'])
-        ax.invert_yaxis()
-        ax.set_xlabel('number of changes')
-        ax.set_ylabel('type of action')
 
-    LOG.info('Plotted other actions by patrol status')
+@timed_stage
+def plot_remaining_by_date(plot_cube:PlotCube, plot_params:PlotParamsDict) -> None:
+    tmp = _cube_counts(plot_cube, ['date', 'is_anon'], filt=(plot_cube['counts']['rc_patrolled']==0))['count'].unstack(
+        level=1,
+        fill_value=0
+    ).reindex(columns=[False, True], fill_value=0)
+    tmp.columns = pd.Index([ 'actor_user', 'actor_anon' ])
+    tmp['rc_id'] = tmp['actor_user'] + tmp['actor_anon']
 
+    PLOT_SCHEDULER.submit(_render_remaining_by_date, tmp, plot_params['xticks_window'], plot_params['xticklabels_window'])
 
-def plot_remaining_by_date(unpatrolled_changes:pd.DataFrame, plot_params:PlotParamsDict) -> None:
+
+def _render_remaining_by_date(tmp:pd.DataFrame, xticks_window:list[pd.Timestamp], xticklabels_window:list[str]) -> None:
     filename = f'{PLOTPATH}remainingByDate'
 
     with Plot(filename=filename, figsize=FIGSIZE_STANDARD) as (_, ax):
-        tmp = unpatrolled_changes.loc[plot_params['filter_window'] & (unpatrolled_changes['rc_patrolled']==0), ['rc_id', 'actor_user', 'rc_patrolled']].groupby(
-            by=unpatrolled_changes['time'].dt.date
-        ).count()
-        tmp['actor_anon'] = tmp['rc_id'] - tmp['actor_user']
-
         tmp.plot(y='rc_id', kind='line', grid=True, ax=ax)
         tmp.plot(y='actor_anon', kind='line', grid=True, ax=ax)
         tmp.plot(y='actor_user', kind='line', grid=True, ax=ax)
@@ -587,23 +746,32 @@ def plot_remaining_by_date(unpatrolled_changes:pd.DataFrame, plot_params:PlotPar
         ax.set_ylabel('unpatrolled changes')
         _, _, _, ymax = ax.axis()
         ax.set(ylim=(0, ymax))
-        ax.set_xticks([ mdates.date2num(ts.to_pydatetime()) for ts in plot_params['xticks_window'] ])
-        ax.set_xticklabels(plot_params['xticklabels_window'])
+        ax.set_xticks([ mdates.date2num(ts.to_pydatetime()) for ts in xticks_window ])
+        ax.set_xticklabels(xticklabels_window)
 
     LOG.info('Plotted remaining workload by date')
 
 
 def plot_ores_hist(unpatrolled_changes:pd.DataFrame, filt:pd.Series|None, grouper:pd.Series|str, ores_model:str, filenamepart:str, legend:Optional[list[str]]=None, titleprefix:str='') -> None:
+    ores_notna_filter = (unpatrolled_changes['oresc_damaging'].notna()) & (unpatrolled_changes['oresc_goodfaith'].notna())
+    if filt is not None:
+        ores_notna_filter = ores_notna_filter & filt
+
+    if isinstance(grouper, str):
+        hist_data = unpatrolled_changes.loc[ores_notna_filter, [grouper, ores_model]]
+    else:
+        hist_data = unpatrolled_changes.loc[ores_notna_filter, [ores_model]]
+        hist_data.insert(0, 'grouper', grouper.loc[ores_notna_filter])
+
+    PLOT_SCHEDULER.submit(_render_ores_hist, ores_scores_float64(hist_data), ores_model, filenamepart, legend, titleprefix)
+
+
+def _render_ores_hist(hist_data:pd.DataFrame, ores_model:str, filenamepart:str, legend:Optional[list[str]], titleprefix:str) -> None:
     filename = f'{PLOTPATH}ORES-hist-{filenamepart}'
 
     with Plot(filename=filename, figsize=FIGSIZE_STANDARD) as (_, ax):
-        ores_notna_filter = (unpatrolled_changes['oresc_damaging'].notna()) & (unpatrolled_changes['oresc_goodfaith'].notna())
-        if filt is None:
-            hist_base = unpatrolled_changes.loc[ores_notna_filter].groupby(by=grouper)
-            cnt = len(unpatrolled_changes.loc[ores_notna_filter, ores_model].index)
-        else:
-            hist_base = unpatrolled_changes.loc[ores_notna_filter & filt].groupby(by=grouper)
-            cnt = len(unpatrolled_changes.loc[ores_notna_filter & filt, ores_model].index)
+        hist_base = hist_data.groupby(by=hist_data.columns[0], observed=True)
+        cnt = len(hist_data.index)
 
         hist_base[ores_model].hist(bins=101, ax=ax, legend=True, alpha=0.5)
 
@@ -619,12 +787,13 @@ def plot_ores_hist(unpatrolled_changes:pd.DataFrame, filt:pd.Series|None, groupe
     LOG.info('Plotted ORES histogram')
 
 
+@timed_stage
 def plot_ores_hist_by_editor_type(unpatrolled_changes:pd.DataFrame) -> None:
     for ores_model in ORES_MODELS:
         plot_ores_hist(
             unpatrolled_changes,
             None,
-            unpatrolled_changes['actor_user'].notna(),
+            ~unpatrolled_changes['is_anon'],
             ores_model,
             f'{ores_model[6:]}AndEditorType',
             legend=['IP users', 'new registered users']
@@ -633,11 +802,12 @@ def plot_ores_hist_by_editor_type(unpatrolled_changes:pd.DataFrame) -> None:
         LOG.info(f'Plotted ORES histogram by editor type for model {ores_model}')
 
 
+@timed_stage
 def plot_ores_hist_by_action(unpatrolled_changes:pd.DataFrame) -> None:
     for ores_model in ORES_MODELS:
         plot_ores_hist(
             unpatrolled_changes,
-            unpatrolled_changes['actor_user'].notna(),
+            ~unpatrolled_changes['is_anon'],
             'editsummary-magic-action-broad',
             ores_model,
             f'{ores_model[6:]}AndActionRegistered',
@@ -649,7 +819,7 @@ def plot_ores_hist_by_action(unpatrolled_changes:pd.DataFrame) -> None:
     for ores_model in ORES_MODELS:
         plot_ores_hist(
             unpatrolled_changes,
-            unpatrolled_changes['actor_user'].isna(),
+            unpatrolled_changes['is_anon'],
             'editsummary-magic-action-broad',
             ores_model,
             f'{ores_model[6:]}AndActionAnonymous',
@@ -659,11 +829,12 @@ def plot_ores_hist_by_action(unpatrolled_changes:pd.DataFrame) -> None:
         LOG.info(f'Plotted ORES histogram by action for model {ores_model} and unregistered users')
 
 
+@timed_stage
 def plot_ores_hist_by_reverted(unpatrolled_changes:pd.DataFrame) -> None:
     for ores_model in ORES_MODELS:
         plot_ores_hist(
             unpatrolled_changes,
-            unpatrolled_changes['actor_user'].notna(),
+            ~unpatrolled_changes['is_anon'],
             unpatrolled_changes['reverted'].notna(),
             ores_model,
             f'{ores_model[6:]}AndRevertedRegistered',
@@ -676,7 +847,7 @@ def plot_ores_hist_by_reverted(unpatrolled_changes:pd.DataFrame) -> None:
     for ores_model in ORES_MODELS:
         plot_ores_hist(
             unpatrolled_changes,
-            unpatrolled_changes['actor_user'].isna(),
+            unpatrolled_changes['is_anon'],
             unpatrolled_changes['reverted'].notna(),
             ores_model,
             f'{ores_model[6:]}AndRevertedAnonymous',
@@ -687,13 +858,14 @@ def plot_ores_hist_by_reverted(unpatrolled_changes:pd.DataFrame) -> None:
         LOG.info(f'Plotted ORES histogram by revert status for model {ores_model} and unregistered users')
 
 
+@timed_stage
 def plot_ores_hist_by_language(unpatrolled_changes:pd.DataFrame, termactions:list[str]) -> None:
-    top_languages = unpatrolled_changes.loc[unpatrolled_changes['editsummary-magic-action'].isin(termactions), 'editsummary-magic-param1'].value_counts().head(10).index.to_list()
+    top_languages = unpatrolled_changes.loc[unpatrolled_changes['editsummary-magic-action'].isin(termactions), 'editsummary-magic-param1'].astype('object').value_counts().head(10).index.to_list()
 
     for ores_model in ORES_MODELS:
         plot_ores_hist(
             unpatrolled_changes,
-            (unpatrolled_changes['actor_user'].notna()) & (unpatrolled_changes['editsummary-magic-action'].isin(termactions)) & (unpatrolled_changes['editsummary-magic-param1'].isin(top_languages)),
+            (~unpatrolled_changes['is_anon']) & (unpatrolled_changes['editsummary-magic-action'].isin(termactions)) & (unpatrolled_changes['editsummary-magic-param1'].isin(top_languages)),
             'editsummary-magic-param1',
             ores_model,
             f'{ores_model[6:]}AndLanguageRegistered',
@@ -705,7 +877,7 @@ def plot_ores_hist_by_language(unpatrolled_changes:pd.DataFrame, termactions:lis
     for ores_model in ORES_MODELS:
         plot_ores_hist(
             unpatrolled_changes,
-            (unpatrolled_changes['actor_user'].isna()) & (unpatrolled_changes['editsummary-magic-action'].isin(termactions)) & (unpatrolled_changes['editsummary-magic-param1'].isin(top_languages)),
+            unpatrolled_changes['is_anon'] & (unpatrolled_changes['editsummary-magic-action'].isin(termactions)) & (unpatrolled_changes['editsummary-magic-param1'].isin(top_languages)),
             'editsummary-magic-param1',
             ores_model,
             f'{ores_model[6:]}AndLanguageAnonymous',
@@ -715,11 +887,12 @@ def plot_ores_hist_by_language(unpatrolled_changes:pd.DataFrame, termactions:lis
         LOG.info(f'Plotted ORES histogram by language for model {ores_model} and unregistered users')
 
 
+@timed_stage
 def plot_ores_hist_by_term_type(unpatrolled_changes:pd.DataFrame) -> None:
     for ores_model in ORES_MODELS:
         plot_ores_hist(
             unpatrolled_changes,
-            (unpatrolled_changes['actor_user'].notna()) & (unpatrolled_changes['editsummary-magic-action-broad'].isin(['label', 'description', 'alias', 'anyterms'])),
+            (~unpatrolled_changes['is_anon']) & (unpatrolled_changes['editsummary-magic-action-broad'].isin(['label', 'description', 'alias', 'anyterms'])),
             'editsummary-magic-action-broad',
             ores_model,
             f'{ores_model[6:]}AndTermtypeRegistered',
@@ -731,7 +904,7 @@ def plot_ores_hist_by_term_type(unpatrolled_changes:pd.DataFrame) -> None:
     for ores_model in ORES_MODELS:
         plot_ores_hist(
             unpatrolled_changes,
-            (unpatrolled_changes['actor_user'].isna()) & (unpatrolled_changes['editsummary-magic-action-broad'].isin(['label', 'description', 'alias', 'anyterms'])),
+            unpatrolled_changes['is_anon'] & (unpatrolled_changes['editsummary-magic-action-broad'].isin(['label', 'description', 'alias', 'anyterms'])),
             'editsummary-magic-action-broad',
             ores_model,
             f'{ores_model[6:]}AndTermtypeAnonymous',
@@ -742,15 +915,20 @@ def plot_ores_hist_by_term_type(unpatrolled_changes:pd.DataFrame) -> None:
 
 
 def plot_ores_heatmap(unpatrolled_changes:pd.DataFrame, filenamepart:str, filt:pd.Series, titleprefix:str='') -> None:
-    filename = f'{PLOTPATH}ORES-heatmap-{filenamepart}'
-
     cnt = len(unpatrolled_changes.loc[filt & (unpatrolled_changes['oresc_damaging'].notna()) & (unpatrolled_changes['oresc_goodfaith'].notna())].index)
 
     if cnt == 0:  # quick fix to prevent script from crashing due to unavailability of anon data after introduction of temporary accounts
         return
 
-    damaging = np_array(unpatrolled_changes.loc[filt & (unpatrolled_changes['oresc_damaging'].notna()) & (unpatrolled_changes['oresc_goodfaith'].notna()), 'oresc_damaging'])
-    goodfaith = np_array(unpatrolled_changes.loc[filt & (unpatrolled_changes['oresc_damaging'].notna()) & (unpatrolled_changes['oresc_goodfaith'].notna()), 'oresc_goodfaith'])
+    ores_scores = ores_scores_float64(unpatrolled_changes.loc[filt & (unpatrolled_changes['oresc_damaging'].notna()) & (unpatrolled_changes['oresc_goodfaith'].notna()), ['oresc_damaging', 'oresc_goodfaith']])
+    damaging = np_array(ores_scores['oresc_damaging'])
+    goodfaith = np_array(ores_scores['oresc_goodfaith'])
+
+    PLOT_SCHEDULER.submit(_render_ores_heatmap, damaging, goodfaith, filenamepart, titleprefix)
+
+
+def _render_ores_heatmap(damaging:ndarray, goodfaith:ndarray, filenamepart:str, titleprefix:str) -> None:
+    filename = f'{PLOTPATH}ORES-heatmap-{filenamepart}'
 
     with Plot(filename=filename, figsize=FIGSIZE_HEATMAP) as (fig, ax):
         counts, _, _, img = ax.hist2d(
@@ -760,7 +938,7 @@ def plot_ores_heatmap(unpatrolled_changes:pd.DataFrame, filenamepart:str, filt:p
             bins=101,
             cmap=cm.get_cmap('coolwarm') # RdYlGn RdYlBu Spectral https://matplotlib.org/3.1.0/tutorials/colors/colormaps.html
         )
-        ax.set_title(f'{titleprefix}n={cnt} revisions')
+        ax.set_title(f'{titleprefix}n={damaging.shape[0]} revisions')
         ax.set_xlabel('ORES score for model "damaging"')
         ax.set_ylabel('ORES score for model "goodfaith"')
         ax.set(xlim=(0, 1), ylim=(0, 1))
@@ -773,11 +951,12 @@ def plot_ores_heatmap(unpatrolled_changes:pd.DataFrame, filenamepart:str, filt:p
     LOG.info('Plotted ORES heatmap')
 
 
+@timed_stage
 def plot_ores_heatmaps(unpatrolled_changes:pd.DataFrame) -> None:
     plot_ores_heatmap(
         unpatrolled_changes,
         'Registered',
-        filt=(unpatrolled_changes['actor_user'].notna()),
+        filt=(~unpatrolled_changes['is_anon']),
         titleprefix='new registered users; '
     )
     LOG.info('Plotted ORES heatmap for registered users')
@@ -785,7 +964,7 @@ def plot_ores_heatmaps(unpatrolled_changes:pd.DataFrame) -> None:
     plot_ores_heatmap(
         unpatrolled_changes,
         'Anonymous',
-        filt=(unpatrolled_changes['actor_user'].isna()),
+        filt=(unpatrolled_changes['is_anon']),
         titleprefix='IP users; '
     )
     LOG.info('Plotted ORES heatmap for unregistered users')
@@ -825,23 +1004,41 @@ def get_xticks(maximum:int) -> int:
         return 48
 
 
-def make_patrol_progress_plot(patrol_progress:pd.DataFrame, language:str) -> None:
-    filename = f'{PLOTPATH}progress_by_lang/patrol-progress_{language}'
+def _patrol_delay_histograms(patrol_progress:pd.DataFrame, max_hours:pd.Series) -> dict[str, ndarray]:
+    # one grouped count over all languages, with language-specific bins; like in numpy.histogram,
+    # the right-most bin includes its right edge and values beyond it are not counted
+    bins = { language : get_bins(max_patrol_time) for language, max_patrol_time in max_hours.items() }
+
+    patrolled = patrol_progress['patrol_delay_seconds'].notna() & patrol_progress['editsummary-magic-param1'].isin(max_hours.index)
+    languages = patrol_progress.loc[patrolled, 'editsummary-magic-param1'].astype('object')
+    seconds = patrol_progress.loc[patrolled, 'patrol_delay_seconds'].dt.total_seconds().astype('int64')
+    bin_widths = languages.map({ language : language_bins.step * 3600 for language, language_bins in bins.items() })
+    right_edges = languages.map({ language : language_bins[-1] * 3600 for language, language_bins in bins.items() })
 
-    filt = (patrol_progress['editsummary-magic-param1']==language)
+    bin_indices = seconds // bin_widths - (seconds==right_edges)
+    filt = (bin_indices>=0) & (seconds<=right_edges)
+    counts = bin_indices.loc[filt].groupby(by=[ languages.loc[filt], bin_indices.loc[filt] ]).size()
+
+    histograms = { language : np_zeros(len(language_bins)-1, dtype='int64') for language, language_bins in bins.items() }
+    for (language, bin_index), count in counts.items():
+        histograms[language][bin_index] = count
+
+    return histograms
+
+
+def _render_patrol_progress_plot(histogram:ndarray, max_patrol_time:int, language:str) -> None:
+    filename = f'{PLOTPATH}progress_by_lang/patrol-progress_{language}'
 
-    max_patrol_time = m_ceil(patrol_progress.loc[filt, 'patrol_delay_seconds'].max().total_seconds() / 3600)
     ticks = get_xticks(max_patrol_time)
     bins = get_bins(max_patrol_time)
 
-    hours = patrol_progress.loc[filt, 'patrol_delay_seconds'].dt.total_seconds() / 3600
-
     with Plot(filename=filename, figsize=FIGSIZE_STANDARD, svg=False) as (_, ax):
         try:
-            hours.hist(bins=bins, ax=ax)
+            ax.hist(bins[:-1], bins=bins, weights=histogram)
         except ValueError:
             pass
         else:
+            ax.grid(True)
             ax.legend([ language ])
             ax.set_xlabel('patrol delay (hours)')
             ax.set_ylabel('number of revisions')
@@ -852,18 +1049,9 @@ def make_patrol_progress_plot(patrol_progress:pd.DataFrame, language:str) -> Non
     LOG.info(f'Plotted patrol progress plot for language "{language}"')
 
 
-def make_patrol_progress_percentiles(patrol_progress:pd.DataFrame, language:str) -> None:
+def _render_patrol_progress_percentiles(values:list[float], percentiles:range, max_patrol_time:int, language:str) -> None:
     filename = f'{PLOTPATH}progress_by_lang/patrol-progress-percentiles_{language}'
 
-    filt = patrol_progress['editsummary-magic-param1']==language
-
-    tmp = patrol_progress.loc[filt, 'patrol_delay_seconds'].dt.total_seconds() / 3600
-    percentiles = range(0, 101)
-    values = []
-    for i in percentiles:
-        values.append(tmp.quantile(i/100))
-
-    max_patrol_time = m_ceil(patrol_progress.loc[filt, 'patrol_delay_seconds'].max().total_seconds() / 3600)
     ticks = get_xticks(max_patrol_time)
 
     with Plot(filename=filename, figsize=FIGSIZE_STANDARD, svg=False) as (_, ax):
@@ -879,17 +1067,11 @@ def make_patrol_progress_percentiles(patrol_progress:pd.DataFrame, language:str)
     LOG.info(f'Plotted patrol progress percentiles plot for language "{language}"')
 
 
-def make_all_patrol_progress_stats(patrol_progress:pd.DataFrame) -> None:
-#   languages = list(patrol_progress['editsummary-magic-param1'].unique())
-    languages = [ 'de', 'en', 'fr', 'es', 'it', 'ru' ]
-
-    existing_plots = glob(f'{PLOTPATH}progress_by_lang/patrol-progress_*.png')
-    for existing_plot in existing_plots:
-        lang = existing_plot[58:-4].replace('_', ' ')
-        if lang not in languages: # hacky
-            delete_file(existing_plot)
-            delete_file(existing_plot.replace('/patrol-progress_', '/patrol-progress-percentiles_'))
+@timed_stage
+def make_all_patrol_progress_stats(patrol_progress:pd.DataFrame, patrol_delay_stats:PatrolDelayStats) -> None:
+    histograms = _patrol_delay_histograms(patrol_progress, patrol_delay_stats['max_hours'])
 
-    for language in languages:
-        make_patrol_progress_plot(patrol_progress, language)
-        make_patrol_progress_percentiles(patrol_progress, language)
+    for language, max_patrol_time in patrol_delay_stats['max_hours'].items():
+        values = patrol_delay_stats['percentiles'].loc[language].tolist()
+        PLOT_SCHEDULER.submit(_render_patrol_progress_plot, histograms[language], int(max_patrol_time), language)
+        PLOT_SCHEDULER.submit(_render_patrol_progress_percentiles, values, PATROL_DELAY_PERCENTILES, int(max_patrol_time), language)
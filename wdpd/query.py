@@ -1,23 +1,182 @@
-import ipaddress
+from io import BytesIO
 from json import JSONDecodeError
 import logging
-from typing import Any, Optional
+from math import ceil as m_ceil
+from os.path import isfile
+from pickle import UnpicklingError
+from threading import BoundedSemaphore, Lock
+from time import perf_counter
+from typing import Any, Optional, TypedDict
+from zipfile import BadZipFile
 
 import mariadb  # type: ignore
+from numpy import array as np_array, load as np_load, ndarray, savez as np_savez
 import pandas as pd
 import requests
 
-from .config import WIKIDATA_API_ENDPOINT, USER_AGENT, HIGHLY_USED_ITEMS_URL, REPLICA_PARAMS
+from .config import WIKIDATA_API_ENDPOINT, USER_AGENT, HIGHLY_USED_ITEMS_URL, REPLICA_PARAMS, \
+    REPLICA_POOL_SIZE, REPLICA_FETCH_SIZE, UNPATROLLED_CHANGES_CACHE_FILE, BLOCK_HISTORY_CACHE_FILE, \
+    HIGHLY_USED_ITEMS_CACHE_FILE, MIN_ENTITY_USAGE, INCREMENTAL_REFRESH, CHANGE_FLAG_REFRESH_WINDOW, \
+    BLOCK_HISTORY_REFRESH_WINDOW, HTTP_TIMEOUT
+from .helper import classify_user_names, parse_qid_nums, timed_stage, write_atomically
 
 
 LOG = logging.getLogger(__name__)
 
+PATROL_DELAY_PERCENTILES = range(0, 101)
+
+# change tags and ORES scores per change, aggregated conditionally on the replica;
+# queries using these fragments need to be grouped by rc_id
+SQL_CHANGE_FLAG_COLUMNS = """MAX(IF(ctd_name='mw-reverted', 'mw-reverted', NULL)) AS reverted,
+      MAX(IF(ctd_name='apps-suggested-edits', 'apps-suggested-edits', NULL)) AS suggested_edit,
+      MAX(IF(oresm_name='damaging', oresc_probability, NULL)) AS oresc_damaging,
+      MAX(IF(oresm_name='goodfaith', oresc_probability, NULL)) AS oresc_goodfaith"""
+SQL_CHANGE_FLAG_JOINS = """LEFT JOIN (change_tag
+          JOIN change_tag_def ON ct_tag_id=ctd_id AND ctd_name IN ('mw-reverted', 'apps-suggested-edits')
+        ) ON ct_rc_id=rc_id
+        LEFT JOIN (ores_classification
+          JOIN ores_model ON oresc_model=oresm_id AND oresm_is_current=1 AND oresm_name IN ('damaging', 'goodfaith')
+        ) ON oresc_rev=rc_this_oldid"""
+CHANGE_FLAG_DTYPES = {
+    'reverted' : 'category',
+    'suggested_edit' : 'category',
+    'oresc_damaging' : 'float32',
+    'oresc_goodfaith' : 'float32',
+}
+ORES_SCORE_DECIMALS = 3  # ORES scores are DECIMAL(3,3) on the replica
+
+# single pass over "/* magic-action:param0|param1|param2|param3 */ free text" edit summaries;
+# tokens within the magic part must not run past its closing " */"; like all free text, the value ends at a line break
+_EDIT_SUMMARY_MAGIC_TOKEN = r'(?:(?! \*/)[^|\n])+'
+EDIT_SUMMARY_PATTERN = r'^/\* (?P<magic>' \
+    r'(?P<action>[a-z\-]+):(?P<rest>(?:(?P<param0>\d+)\|' \
+    rf'(?P<param1>{_EDIT_SUMMARY_MAGIC_TOKEN})?\|?(?P<param2>{_EDIT_SUMMARY_MAGIC_TOKEN})?\|?(?P<param3>{_EDIT_SUMMARY_MAGIC_TOKEN})?' \
+    r')?.*?)|.+?) \*/ ?(?P<free>(?:\[\[Property:(?P<property>P\d+)]]: (?P<value>.*))?.*)?'
+EDIT_SUMMARY_COLUMNS = {
+    'magic' : 'editsummary-magic',
+    'free' : 'editsummary-free',
+    'action' : 'editsummary-magic-action',
+    'rest' : 'editsummary-magic-rest',
+    'param0' : 'editsummary-magic-param0',
+    'param1' : 'editsummary-magic-param1',
+    'param2' : 'editsummary-magic-param2',
+    'param3' : 'editsummary-magic-param3',
+    'property' : 'editsummary-free-property',
+    'value' : 'editsummary-free-value',
+    'action_broad' : 'editsummary-magic-action-broad',
+}
+
+# dtypes of the unpatrolled changes frame as returned by get_unpatrolled_changes
+UNPATROLLED_CHANGES_SCHEMA = {
+    'rc_id' : 'int64',
+    'rc_timestamp' : 'object',
+    'rc_title' : 'category',
+    'rc_source' : 'category',
+    'rc_patrolled' : 'uint8',
+    'rc_new_len' : 'Int32',
+    'rc_old_len' : 'Int32',
+    'rc_this_oldid' : 'int64',
+    'actor_user' : 'Int32',
+    'actor_name' : 'category',
+    'comment_text' : 'object',
+    **CHANGE_FLAG_DTYPES,
+    'time' : 'datetime64[ns]',
+    'len_diff' : 'Int32',
+    'num_title' : 'int32',
+    'is_anon' : 'bool',
+    **{ column : 'category' for column in EDIT_SUMMARY_COLUMNS.values() },
+}
+
+# columns of the block history frame; range bounds are Python ints, as IPv6 addresses exceed int64
+BLOCK_HISTORY_COLUMNS = ['log_id', 'user_name', 'time', 'user_type', 'ip_version', 'range_start', 'range_end']
+
 
 #### internal functions
+class PatrolDelayStats(TypedDict):
+    describe : pd.DataFrame  # describe() of the patrol delay per language
+    unpatrolled : pd.Series  # unpatrolled revisions per language
+    patrollers : pd.Series  # patrolled revisions per (language, patroller)
+    percentiles : pd.DataFrame  # patrol delay in hours per (language, percentile); languages with patrolled revisions only
+    max_hours : pd.Series  # max patrol delay in full hours per language; languages with patrolled revisions only
+
+
+class ReplicaPool:
+    def __init__(self, pool_size:int) -> None:
+        self.slots = BoundedSemaphore(pool_size)
+        self.lock = Lock()
+        self.idle_connections:list[Any] = []
+
+
+    def _connect(self) -> Any:
+        t_connect_start = perf_counter()
+        connection = mariadb.connect(**REPLICA_PARAMS)
+        LOG.info(f'Connected to replica; connection time {perf_counter() - t_connect_start:.1f} sec')
+
+        return connection
+
+
+    def acquire(self) -> Any:
+        self.slots.acquire()
+
+        with self.lock:
+            connection = self.idle_connections.pop() if len(self.idle_connections) > 0 else None
+
+        try:
+            if connection is None:
+                return self._connect()
+
+            try:
+                connection.ping()
+            except mariadb.Error:
+                LOG.info('Replica connection has been dropped by the server; reconnecting')
+                self._close(connection)
+                connection = self._connect()
+        except BaseException:
+            self.slots.release()
+            raise
+
+        return connection
+
+
+    def release(self, connection:Any) -> None:
+        with self.lock:
+            self.idle_connections.append(connection)
+        self.slots.release()
+
+
+    def discard(self, connection:Any) -> None:  # for connections in an unknown state, e.g. after a failed query
+        try:
+            self._close(connection)
+        finally:
+            self.slots.release()
+
+
+    def close(self) -> None:
+        with self.lock:
+            for connection in self.idle_connections:
+                self._close(connection)
+            self.idle_connections.clear()
+
+
+    @staticmethod
+    def _close(connection:Any) -> None:
+        try:
+            connection.close()
+        except mariadb.Error:
+            pass
+
+
+REPLICA_POOL = ReplicaPool(REPLICA_POOL_SIZE)
+
+
 class Replica:
     def __init__(self) -> None:
-        self.replica = mariadb.connect(**REPLICA_PARAMS)
-        self.cursor = self.replica.cursor(dictionary=True)
+        self.replica = REPLICA_POOL.acquire()
+        try:
+            self.cursor = self.replica.cursor()
+        except BaseException:
+            REPLICA_POOL.discard(self.replica)
+            raise
 
 
     def __enter__(self):
@@ -25,86 +184,357 @@ class Replica:
 
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.cursor.close()
-        self.replica.close()
-
+        # a failed query can leave an unconsumed result set behind, thus the connection is not reused
+        reusable = False
+        try:
+            self.cursor.close()
+            reusable = exc_type is None
+        finally:
+            if reusable is True:
+                REPLICA_POOL.release(self.replica)
+            else:
+                REPLICA_POOL.discard(self.replica)
+
+
+def _query_mediawiki_to_dataframe(query:str, params:Optional[tuple[Any]]=None, \
+                                  dtypes:Optional[dict[str, str]]=None) -> pd.DataFrame:
+    # rows are fetched as tuples in batches and converted to typed columns right away;
+    # columns without declared dtype are collected as plain lists and inferred at the end
+    if dtypes is None:
+        dtypes = {}
+
+    t_query_start = perf_counter()
 
-def _query_mediawiki(query:str, params:Optional[tuple[Any]]=None) -> list[dict[str, Any]]:
     with Replica() as cursor:
         if params is None:
             cursor.execute(query)
         else:
             cursor.execute(query, params)
-        result = cursor.fetchall()
 
-    return result
+        columns = [ description[0] for description in cursor.description ]
+        chunks:dict[str, list[pd.Series]] = { column : [] for column in columns if column in dtypes }
+        values:dict[str, list[Any]] = { column : [] for column in columns if column not in dtypes }
+
+        while True:
+            rows = cursor.fetchmany(REPLICA_FETCH_SIZE)
+            if len(rows) == 0:
+                break
+
+            for column, column_values in zip(columns, zip(*rows)):
+                if column in chunks:
+                    chunks[column].append(_column_chunk(column_values, dtypes[column]))
+                else:
+                    values[column].extend(column_values)
+
+            del rows
+
+    data = {}
+    for column in columns:
+        if column in values:
+            data[column] = pd.Series(values.pop(column))
+        elif len(chunks[column]) == 0:
+            data[column] = _column_chunk((), dtypes[column])
+        else:
+            data[column] = pd.concat(objs=chunks.pop(column), ignore_index=True)
 
+        if dtypes.get(column) == 'category':
+            data[column] = data[column].astype('category')
 
-def _query_mediawiki_to_dataframe(query:str, params:Optional[tuple[Any]]=None) -> pd.DataFrame:
-    df = pd.DataFrame(
-        data=_query_mediawiki(query, params),
-    )
+    df = pd.DataFrame(data=data)
+
+    LOG.info(f'Queried replica to dataframe; {df.shape[0]} rows, query time {perf_counter() - t_query_start:.1f} sec')
 
     return df
 
 
-def _edit_summary_broad_category(magic_action:str, actions:dict[str, list[str]]) -> str:
+def _column_chunk(column_values:tuple[Any, ...], dtype:str) -> pd.Series:
+    if dtype == 'category':  # categories are unified after all chunks have been fetched
+        dtype = 'object'
+
+    return pd.Series(data=column_values, dtype=dtype)
+
+
+def _apply_schema(dataframe:pd.DataFrame, schema:dict[str, str]) -> pd.DataFrame:
+    # categories are rebuilt after concatenation, so that they only contain present values
+    dtypes = {}
+    for column, dtype in schema.items():
+        if column not in dataframe.columns:
+            continue
+        if dtype == 'category' and isinstance(dataframe[column].dtype, pd.CategoricalDtype):
+            dataframe[column] = dataframe[column].cat.remove_unused_categories()
+            continue
+        if dataframe[column].dtype != dtype:
+            dtypes[column] = dtype
+
+    dataframe = dataframe.astype(dtypes)
+
+    LOG.info(f'Applied schema; memory usage {dataframe.memory_usage(deep=True).sum() / 1024**2:.0f} MiB')
+
+    return dataframe
+
+
+def _edit_summary_broad_categories(actions:dict[str, list[str]]) -> dict[str, str]:
     generic_actions = ['allclaims', 'terms', 'allsitelinks']
-    for key in actions:
-        if magic_action in actions[key] and magic_action not in generic_actions:
-            return key
-    return 'NO_CAT'
+    broad_categories:dict[str, str] = {}
+    for key, magic_actions in actions.items():
+        if key in generic_actions:
+            continue
+        for magic_action in magic_actions:
+            broad_categories.setdefault(magic_action, key)
+
+    return broad_categories
 
 
-def _user_type(user_name:str) -> str:
+def _load_unpatrolled_changes_cache(actions:dict[str, list[str]]) -> Optional[pd.DataFrame]:
+    if not isfile(UNPATROLLED_CHANGES_CACHE_FILE):
+        LOG.info('No unpatrolled changes cache found; full refresh required')
+        return None
+
     try:
-        ip_network = ipaddress.ip_network(user_name, strict=False)
-    except ValueError:
-        return 'registered'
+        cache = pd.read_pickle(UNPATROLLED_CHANGES_CACHE_FILE)
+    except (OSError, EOFError, UnpicklingError, AttributeError) as exception:
+        LOG.warning(f'Cannot read unpatrolled changes cache; full refresh required: {exception}')
+        return None
 
-    if ip_network.version == 4:
-        if ip_network.num_addresses > 1:
-            return 'ipv4range'
-        return 'ipv4'
+    if cache.get('actions') != actions:  # edit summary categorization changed
+        LOG.info('Unpatrolled changes cache is outdated; full refresh required')
+        return None
 
-    if ip_network.version == 6:
-        if ip_network.num_addresses > 1:
-            return 'ipv6range'
-        return 'ipv6'
+    unpatrolled_changes = cache.get('unpatrolled_changes')
+    if not set(UNPATROLLED_CHANGES_SCHEMA).issubset(unpatrolled_changes.columns):  # schema changed
+        LOG.info('Unpatrolled changes cache has outdated columns; full refresh required')
+        return None
 
-    raise RuntimeError(f'Cannot determine user type for user {user_name}')
+    return unpatrolled_changes
 
 
-def _query_ores_model_ids(ores_model_name:str) -> list[int]:
-    sql = f"""SELECT
-  oresm_id
-FROM
-  ores_model
-WHERE
-  oresm_name=?
-  AND oresm_is_current=1"""
-    params = ( ores_model_name, )
+def _dump_unpatrolled_changes_cache(unpatrolled_changes:pd.DataFrame, actions:dict[str, list[str]]) -> None:
+    cache = {
+        'actions' : actions,
+        'unpatrolled_changes' : unpatrolled_changes
+    }
+    with write_atomically(UNPATROLLED_CHANGES_CACHE_FILE) as file_handle:
+        pd.to_pickle(cache, file_handle)
+
+    LOG.info(f'Dumped {unpatrolled_changes.shape[0]} unpatrolled changes to cache')
+
+
+def _refresh_unpatrolled_changes(previous_changes:pd.DataFrame, actions:dict[str, list[str]]) -> pd.DataFrame:
+    high_water_mark = int(previous_changes['rc_id'].max())
+
+    # the patrol status is a full scan of the recentchanges window, yet of rc_id and rc_patrolled only;
+    # query it before new changes, so that no change in between gets lost
+    patrol_status = query_patrol_status().set_index('rc_id')['rc_patrolled']
+
+    # changes below the high water mark that were not yet visible on the replica when it was taken,
+    # due to out-of-order commits or replication lag
+    late_rc_ids = patrol_status.index.difference(previous_changes['rc_id'])
+    late_rc_ids = late_rc_ids[late_rc_ids<=high_water_mark].tolist()
+    new_changes = query_unpatrolled_changes(min_rc_id=high_water_mark, rc_ids=late_rc_ids)
+
+    # changes missing in the patrol status have fallen out of the recentchanges window
+    filt_remaining = previous_changes['rc_id'].isin(patrol_status.index)
+    previous_changes = previous_changes.loc[filt_remaining].copy()
+    previous_changes['rc_patrolled'] = previous_changes['rc_id'].map(patrol_status)
+
+    # change tags and ORES scores are mostly added shortly after the edit, thus only refreshed for recent changes
+    min_timestamp = (pd.Timestamp.now(tz='UTC') - pd.Timedelta(CHANGE_FLAG_REFRESH_WINDOW)).strftime('%Y%m%d%H%M%S')
+    change_flags = query_change_flags(min_timestamp).set_index('rc_id')
+    filt_recent = previous_changes['rc_id'].isin(change_flags.index)
+    for column in change_flags.columns:
+        previous_changes[column] = previous_changes['rc_id'].map(change_flags[column].astype('object')).where(
+            filt_recent,
+            previous_changes[column].astype('object')
+        )
+
+    LOG.info(f'Refreshed patrol status of {previous_changes.shape[0]} cached changes and change flags of ' \
+             f'{filt_recent.sum()} recent ones; dropped {(~filt_remaining).sum()} expired changes')
+
+    if new_changes.shape[0] == 0:
+        return previous_changes.reset_index(drop=True)
+
+    new_changes = _amend_edit_summaries(new_changes, actions)
+
+    unpatrolled_changes = pd.concat(
+        objs=[previous_changes, new_changes],
+        ignore_index=True
+    ).sort_values(by='rc_id', kind='stable', ignore_index=True)  # late changes are interleaved
+
+    LOG.info(f'Added {new_changes.shape[0]} new changes; {len(late_rc_ids)} of them below rc_id {high_water_mark}')
+
+    return unpatrolled_changes
+
 
-    query_result = _query_mediawiki(sql, params)
-    ores_model_ids = [ row.get('oresm_id', 0) for row in query_result ]
+def _load_block_history_cache() -> Optional[pd.DataFrame]:
+    if not isfile(BLOCK_HISTORY_CACHE_FILE):
+        LOG.info('No block history cache found; full refresh required')
+        return None
 
-    return ores_model_ids
+    try:
+        block_history = pd.read_pickle(BLOCK_HISTORY_CACHE_FILE)
+    except (OSError, EOFError, UnpicklingError, AttributeError) as exception:
+        LOG.warning(f'Cannot read block history cache; full refresh required: {exception}')
+        return None
+
+    if not set(BLOCK_HISTORY_COLUMNS).issubset(block_history.columns):  # schema changed
+        LOG.info('Block history cache has outdated columns; full refresh required')
+        return None
+
+    return block_history
+
+
+def _dump_block_history_cache(block_history:pd.DataFrame) -> None:
+    with write_atomically(BLOCK_HISTORY_CACHE_FILE) as file_handle:
+        pd.to_pickle(block_history, file_handle)
+
+    LOG.info(f'Dumped {block_history.shape[0]} block log entries to cache')
+
+
+def _load_highly_used_items_cache() -> Optional[dict[str, Any]]:
+    if not isfile(HIGHLY_USED_ITEMS_CACHE_FILE):
+        return None
+
+    try:
+        with np_load(HIGHLY_USED_ITEMS_CACHE_FILE) as cache:
+            min_entity_usage = int(cache['min_entity_usage'])
+            cached_list = {
+                'qid_nums' : cache['qid_nums'],
+                'entity_usage_counts' : cache['entity_usage_counts'],
+                'etag' : str(cache['etag']),
+                'last_modified' : str(cache['last_modified'])
+            }
+    except (OSError, ValueError, KeyError, BadZipFile) as exception:
+        LOG.warning(f'Cannot read highly used items cache: {exception}')
+        return None
+
+    if min_entity_usage != MIN_ENTITY_USAGE:  # cached list is filtered with another threshold
+        LOG.info('Highly used items cache is outdated; download required')
+        return None
+
+    return cached_list
+
+
+def _dump_highly_used_items_cache(qid_nums:ndarray, entity_usage_counts:ndarray, etag:str, last_modified:str) -> None:
+    with write_atomically(HIGHLY_USED_ITEMS_CACHE_FILE) as file_handle:
+        np_savez(
+            file_handle,
+            qid_nums=qid_nums,
+            entity_usage_counts=entity_usage_counts,
+            min_entity_usage=np_array(MIN_ENTITY_USAGE),
+            etag=np_array(etag),
+            last_modified=np_array(last_modified)
+        )
+
+
+def _parse_highly_used_item_list(content:bytes) -> tuple[ndarray, ndarray]:
+    highly_used_items_toplist = pd.read_csv(
+        BytesIO(content),
+        sep='\t',
+        header=0,
+        names=[
+            'qid',
+            'entity_usage_count'
+        ],
+        dtype={
+            'qid' : 'str',
+            'entity_usage_count' : 'float'
+        },
+        compression='gzip',
+    )
+
+    filt = highly_used_items_toplist['qid'].str.fullmatch(r'Q\d+', na=False) \
+        & (highly_used_items_toplist['entity_usage_count']>=MIN_ENTITY_USAGE)
+    highly_used_items_toplist = highly_used_items_toplist.loc[filt]
+
+    qid_nums = highly_used_items_toplist['qid'].str.slice(1).astype('int32').to_numpy()
+    entity_usage_counts = highly_used_items_toplist['entity_usage_count'].astype('int64').to_numpy()
+
+    return qid_nums, entity_usage_counts
 
 
 #### export functions
-def get_unpatrolled_changes(change_tags:pd.DataFrame, ores_scores:pd.DataFrame, \
-                                actions:dict[str, list[str]]) -> pd.DataFrame:
-    unpatrolled_changes = query_unpatrolled_changes()
+def ores_scores_float64(dataframe:pd.DataFrame) -> pd.DataFrame:
+    # ORES scores are kept as float32; restore the exact float64 values before aggregating or binning them,
+    # so that means are not summed in float32 precision and scores at bin edges or trigger scores compare as before
+    columns = [ column for column in [ 'oresc_damaging', 'oresc_goodfaith' ] if column in dataframe.columns ]
+
+    return dataframe.astype({ column : 'float64' for column in columns }).round({ column : ORES_SCORE_DECIMALS for column in columns })
+
+
+@timed_stage
+def close_replica_connections() -> None:
+    REPLICA_POOL.close()
+
+    LOG.info('Closed replica connections')
+
 
-    unpatrolled_changes = _amend_change_tags(unpatrolled_changes, change_tags)
-    unpatrolled_changes = _amend_edit_summaries(unpatrolled_changes, actions)
-    unpatrolled_changes = _amend_ores_scores(unpatrolled_changes, ores_scores)
+@timed_stage
+def get_unpatrolled_changes(actions:dict[str, list[str]]) -> pd.DataFrame:
+    previous_changes = None
+    if INCREMENTAL_REFRESH is True:
+        previous_changes = _load_unpatrolled_changes_cache(actions)
+
+    if previous_changes is None:
+        unpatrolled_changes = query_unpatrolled_changes()
+        unpatrolled_changes = _amend_edit_summaries(unpatrolled_changes, actions)
+    else:
+        unpatrolled_changes = _refresh_unpatrolled_changes(previous_changes, actions)
+
+    unpatrolled_changes = _apply_schema(unpatrolled_changes, UNPATROLLED_CHANGES_SCHEMA)
+
+    _dump_unpatrolled_changes_cache(unpatrolled_changes, actions)
 
     return unpatrolled_changes
 
 
-def query_unpatrolled_changes() -> pd.DataFrame:
-    sql = """SELECT
+@timed_stage
+def get_block_history() -> pd.DataFrame:
+    previous_block_history = None
+    if INCREMENTAL_REFRESH is True:
+        previous_block_history = _load_block_history_cache()
+
+    if previous_block_history is None:
+        block_history = query_block_history()
+        _dump_block_history_cache(block_history)
+        return block_history
+
+    # block log entries committed out of order or replicated late can appear below the latest cached one,
+    # thus a trailing band is queried again and only entries with unknown log_id are added
+    min_time = previous_block_history['time'].max() - pd.Timedelta(BLOCK_HISTORY_REFRESH_WINDOW)
+    recent_block_history = query_block_history(min_timestamp=min_time.strftime('%Y%m%d%H%M%S'))
+    new_block_history = recent_block_history.loc[~recent_block_history['log_id'].isin(previous_block_history['log_id'])]
+
+    LOG.info(f'Added {new_block_history.shape[0]} new block log entries since {min_time}')
+
+    if new_block_history.shape[0] == 0:
+        return previous_block_history
+
+    block_history = pd.concat(
+        objs=[previous_block_history, new_block_history],
+        ignore_index=True
+    )
+    block_history['user_type'] = block_history['user_type'].astype('category')
+
+    _dump_block_history_cache(block_history)
+
+    return block_history
+
+
+@timed_stage
+def query_unpatrolled_changes(min_rc_id:Optional[int]=None, rc_ids:Optional[list[int]]=None) -> pd.DataFrame:
+    # incremental: changes above min_rc_id, plus the explicitly requested rc_ids below it
+    min_rc_id_condition = ''
+    params = None
+    if min_rc_id is not None:
+        rc_ids = rc_ids or []
+        rc_ids_condition = ''
+        if len(rc_ids) > 0:
+            rc_ids_condition = f' OR rc_id IN ({", ".join(["?"]*len(rc_ids))})'
+        min_rc_id_condition = f"""
+      AND (rc_id>?{rc_ids_condition})"""
+        params = ( min_rc_id, *rc_ids )
+
+    sql = f"""SELECT
       rc_id,
       CONVERT(rc_timestamp USING utf8) AS rc_timestamp,
       CONVERT(rc_title USING utf8) AS rc_title,
@@ -115,16 +545,38 @@ def query_unpatrolled_changes() -> pd.DataFrame:
       rc_this_oldid,
       actor_user,
       CONVERT(actor_name USING utf8) AS actor_name,
-      CONVERT(comment_text USING utf8) AS comment_text
+      CONVERT(comment_text USING utf8) AS comment_text,
+      {SQL_CHANGE_FLAG_COLUMNS}
     FROM
       recentchanges
         JOIN actor_recentchanges ON rc_actor=actor_id
         JOIN comment_recentchanges ON rc_comment_id=comment_id
+        {SQL_CHANGE_FLAG_JOINS}
     WHERE
       rc_patrolled IN (0, 1)
-      AND rc_namespace=0"""
-
-    unpatrolled_changes = _query_mediawiki_to_dataframe(sql)
+      AND rc_namespace=0{min_rc_id_condition}
+    GROUP BY
+      rc_id"""
+    dtypes = {
+        'rc_id' : 'int64',
+        'rc_timestamp' : 'object',
+        'rc_title' : 'category',
+        'rc_source' : 'category',
+        'rc_patrolled' : 'uint8',
+        'rc_new_len' : 'Int32',
+        'rc_old_len' : 'Int32',
+        'rc_this_oldid' : 'int64',
+        'actor_user' : 'Int32',
+        'actor_name' : 'category',
+        'comment_text' : 'object',
+        **CHANGE_FLAG_DTYPES,
+    }
+
+    unpatrolled_changes = _query_mediawiki_to_dataframe(sql, params, dtypes)
+
+    if unpatrolled_changes.shape[0] == 0:
+        LOG.info('Queried unpatrolled changes; no changes found')
+        return unpatrolled_changes
 
     try:
         unpatrolled_changes['time'] = pd.to_datetime(
@@ -141,42 +593,105 @@ def query_unpatrolled_changes() -> pd.DataFrame:
         LOG.warning('ValueError', exception)
 
     try:
-        unpatrolled_changes['num_title'] = pd.to_numeric(
-            unpatrolled_changes['rc_title'].str.slice(1)
-        )
+        unpatrolled_changes['num_title'] = parse_qid_nums(unpatrolled_changes['rc_title'])
     except ValueError as exception:
         LOG.warning('ValueError', exception)
 
+    unpatrolled_changes['is_anon'] = unpatrolled_changes['actor_user'].isna()
+
     LOG.info('Queried unpatrolled changes')
 
     return unpatrolled_changes
 
 
-def query_change_tags() -> pd.DataFrame:
+@timed_stage
+def query_patrol_status() -> pd.DataFrame:
+    # same actor and comment views as query_unpatrolled_changes, so that changes hidden by them
+    # are neither requested as late changes nor kept in the cache
     sql = """SELECT
       rc_id,
-      ct_id,
-      CONVERT(ctd_name USING utf8) AS ctd_name
+      rc_patrolled
+    FROM
+      recentchanges
+        JOIN actor_recentchanges ON rc_actor=actor_id
+        JOIN comment_recentchanges ON rc_comment_id=comment_id
+    WHERE
+      rc_patrolled IN (0, 1)
+      AND rc_namespace=0"""
+    dtypes = {
+        'rc_id' : 'int64',
+        'rc_patrolled' : 'uint8',
+    }
+
+    patrol_status = _query_mediawiki_to_dataframe(sql, dtypes=dtypes)
+
+    LOG.info('Queried patrol status')
+
+    return patrol_status
+
+
+@timed_stage
+def query_change_flags(min_timestamp:str) -> pd.DataFrame:
+    sql = f"""SELECT
+      rc_id,
+      {SQL_CHANGE_FLAG_COLUMNS}
+    FROM
+      recentchanges
+        {SQL_CHANGE_FLAG_JOINS}
+    WHERE
+      rc_patrolled IN (0, 1)
+      AND rc_namespace=0
+      AND rc_timestamp>=?
+    GROUP BY
+      rc_id"""
+    params = ( min_timestamp, )
+    dtypes = {
+        'rc_id' : 'int64',
+        **CHANGE_FLAG_DTYPES,
+    }
+
+    change_flags = _query_mediawiki_to_dataframe(sql, params, dtypes)
+
+    LOG.info(f'Queried change flags of changes since {min_timestamp}')
+
+    return change_flags
+
+
+@timed_stage
+def query_change_tag_counts() -> pd.DataFrame:
+    sql = """SELECT
+      CONVERT(ctd_name USING utf8) AS ctd_name,
+      COUNT(*) AS count
     FROM
       recentchanges
-        LEFT JOIN change_tag ON rc_id=ct_rc_id
-        LEFT JOIN change_tag_def ON ct_tag_id=ctd_id
+        JOIN change_tag ON rc_id=ct_rc_id
+        JOIN change_tag_def ON ct_tag_id=ctd_id
     WHERE
       rc_patrolled IN (0, 1)
       AND rc_namespace=0
-      AND ct_id IS NOT NULL"""
-    change_tags = _query_mediawiki_to_dataframe(sql)
+    GROUP BY
+      ctd_name
+    ORDER BY
+      count DESC"""
+    dtypes = {
+        'ctd_name' : 'object',
+        'count' : 'int64',
+    }
+    change_tag_counts = _query_mediawiki_to_dataframe(sql, dtypes=dtypes)
 
-    LOG.info('Queried change tags')
+    LOG.info('Queried change tag counts')
 
-    return change_tags
+    return change_tag_counts
 
 
+@timed_stage
 def query_top_patrollers(min_timestamp:int) -> pd.DataFrame:
+    # curid is cut out of the serialized log_params in SQL: a:3:{s:8:"4::curid";s:10:"<curid>";...};
+    # entries without curid are skipped, as the substring expression would yield 0 or garbage for them
     sql = f"""SELECT
       log_id,
       CONVERT(log_timestamp USING utf8) AS log_timestamp,
-      CONVERT(log_params USING utf8) AS log_params,
+      CAST(SUBSTRING_INDEX(SUBSTRING_INDEX(SUBSTRING_INDEX(log_params, '"4::curid";', -1), '"', 2), '"', -1) AS UNSIGNED) AS rc_curid,
       CONVERT(actor_name USING utf8) AS actor_name
     FROM
       logging
@@ -186,57 +701,32 @@ def query_top_patrollers(min_timestamp:int) -> pd.DataFrame:
       AND log_type='patrol'
       AND log_namespace=0
       AND log_timestamp>=?
+      AND log_params LIKE '%"4::curid";s:%'
     ORDER BY
       log_timestamp ASC"""
     params = ( min_timestamp, )
-
-    top_patrollers = _query_mediawiki_to_dataframe(sql, params)
-
-    top_patrollers = top_patrollers.merge(
-        right=top_patrollers['log_params'].str.extract(
-            pat=r's:8:"4::curid";s:10:"(\d+)";?',
-            expand=True
-        ).astype(int),
-        how='left',
-        left_index=True,
-        right_index=True
+    dtypes = {
+        'log_id' : 'int64',
+        'log_timestamp' : 'object',
+        'rc_curid' : 'int64',
+        'actor_name' : 'category',
+    }
+
+    top_patrollers = _query_mediawiki_to_dataframe(sql, params, dtypes)
+
+    top_patrollers['log_time'] = pd.to_datetime(
+        arg=top_patrollers['log_timestamp'],
+        format='%Y%m%d%H%M%S'
     )
 
-    top_patrollers.rename(
-        columns={
-            0 : 'rc_curid'
-        },
-        inplace=True
-    )
-
-    top_patrollers.drop(labels='log_params', axis=1, inplace=True)
+    top_patrollers.drop(labels='log_timestamp', axis=1, inplace=True)
 
     LOG.info('Queried top patrollers')
 
     return top_patrollers
 
 
-def query_ores_scores() -> pd.DataFrame:
-    sql = """SELECT
-      oresc_rev,
-      oresc_model,
-      oresc_class,
-      oresc_probability,
-      oresc_is_predicted
-    FROM
-      ores_classification
-        JOIN recentchanges ON oresc_rev=rc_this_oldid
-    WHERE
-      rc_patrolled IN (0, 1)"""
-    ores_scores = _query_mediawiki_to_dataframe(sql)
-
-    ores_scores['oresc_probability'] = ores_scores['oresc_probability'].astype(float)
-
-    LOG.info('Queried ORES scores')
-
-    return ores_scores
-
-
+@timed_stage
 def query_unpatrolled_changes_outside_main_namespace() -> pd.DataFrame:
     sql = """SELECT
       rc_id,
@@ -258,7 +748,21 @@ def query_unpatrolled_changes_outside_main_namespace() -> pd.DataFrame:
     WHERE
       rc_patrolled IN (0, 1)
       AND rc_namespace!=0"""
-    unpatrolled_changes = _query_mediawiki_to_dataframe(sql)
+    dtypes = {
+        'rc_id' : 'int64',
+        'rc_timestamp' : 'object',
+        'rc_namespace' : 'int64',
+        'rc_title' : 'object',
+        'rc_source' : 'object',
+        'rc_patrolled' : 'int64',
+        'rc_new_len' : 'Int64',
+        'rc_old_len' : 'Int64',
+        'rc_this_oldid' : 'int64',
+        'actor_user' : 'float64',
+        'actor_name' : 'object',
+        'comment_text' : 'object',
+    }
+    unpatrolled_changes = _query_mediawiki_to_dataframe(sql, dtypes=dtypes)
 
     try:
         unpatrolled_changes['time'] = pd.to_datetime(
@@ -283,6 +787,7 @@ def query_unpatrolled_changes_outside_main_namespace() -> pd.DataFrame:
     return unpatrolled_changes
 
 
+@timed_stage
 def query_translation_pages() -> list[str]:
     sql = """SELECT
       CONVERT(page_title USING utf8) AS page_title
@@ -293,7 +798,10 @@ def query_translation_pages() -> list[str]:
     WHERE
       rc_patrolled=0
       AND page_namespace=1198"""
-    translation_pages = _query_mediawiki_to_dataframe(sql)
+    dtypes = {
+        'page_title' : 'object',
+    }
+    translation_pages = _query_mediawiki_to_dataframe(sql, dtypes=dtypes)
 
     translation_pages['translatable_page'] = translation_pages['page_title'].apply(
         lambda x : '/'.join(x.split('/')[:-2])
@@ -314,17 +822,31 @@ def query_translation_pages() -> list[str]:
     return translation_pages['translation_page'].unique().tolist()
 
 
-def query_block_history() -> pd.DataFrame:
-    sql = """SELECT
+@timed_stage
+def query_block_history(min_timestamp:Optional[str]=None) -> pd.DataFrame:
+    min_timestamp_condition = ''
+    params = None
+    if min_timestamp is not None:
+        min_timestamp_condition = """
+      AND log_timestamp>=?"""
+        params = ( min_timestamp, )
+
+    sql = f"""SELECT
+      log_id,
       CONVERT(log_title USING utf8) AS user_name,
       CONVERT(log_timestamp USING utf8) AS log_timestamp
     FROM
       logging
     WHERE
       log_type='block'
-      AND log_action='block'"""
+      AND log_action='block'{min_timestamp_condition}"""
+    dtypes = {
+        'log_id' : 'int64',
+        'user_name' : 'object',
+        'log_timestamp' : 'object',
+    }
 
-    block_history = _query_mediawiki_to_dataframe(sql)
+    block_history = _query_mediawiki_to_dataframe(sql, params=params, dtypes=dtypes)
 
     try:
         block_history['time'] = pd.to_datetime(
@@ -335,8 +857,11 @@ def query_block_history() -> pd.DataFrame:
         LOG.warning('ValueError', exception)
 
     block_history['user_name'] = block_history['user_name'].str.replace('_', ' ')
-    block_history['user_type'] = block_history['user_name'].apply(_user_type)
-    block_history['user_type'] = block_history['user_type'].astype('category')
+
+    block_history = pd.concat(
+        objs=[block_history, classify_user_names(block_history['user_name'])],
+        axis=1
+    )
 
     block_history.drop(labels=['log_timestamp'], axis=1, inplace=True)
 
@@ -345,6 +870,7 @@ def query_block_history() -> pd.DataFrame:
     return block_history
 
 
+@timed_stage
 def query_current_blocks() -> pd.DataFrame:
     sql_anon = """SELECT
       CONVERT(bt_address USING utf8) AS user_name,
@@ -357,8 +883,14 @@ def query_current_blocks() -> pd.DataFrame:
     WHERE
       bt_user IS NULL
       AND bt_auto=0"""
+    dtypes = {
+        'user_name' : 'object',
+        'is_blocked' : 'object',
+        'range_start' : 'object',
+        'range_end' : 'object',
+    }
 
-    current_blocks_anon = _query_mediawiki_to_dataframe(sql_anon)
+    current_blocks_anon = _query_mediawiki_to_dataframe(sql_anon, dtypes=dtypes)
 
     sql_registered = """SELECT
       CONVERT(bt_user_text USING utf8) AS user_name,
@@ -372,7 +904,7 @@ def query_current_blocks() -> pd.DataFrame:
       bt_address IS NULL
       AND bt_auto=0"""
 
-    current_blocks_registered = _query_mediawiki_to_dataframe(sql_registered)
+    current_blocks_registered = _query_mediawiki_to_dataframe(sql_registered, dtypes=dtypes)
 
     # range: range_start and range_end not null
     # ip: range_start and range_end null
@@ -397,7 +929,8 @@ def retrieve_namespace_resolver() -> dict[int, str]:
             'formatversion' : '2',
             'format' : 'json'
         },
-        headers={ 'User-Agent': USER_AGENT }
+        headers={ 'User-Agent': USER_AGENT },
+        timeout=HTTP_TIMEOUT
     )
 
     if response.status_code not in [ 200 ]:
@@ -418,20 +951,43 @@ def retrieve_namespace_resolver() -> dict[int, str]:
     return namespaces
 
 
+@timed_stage
 def retrieve_highly_used_item_list() -> pd.DataFrame:
-    highly_used_items_toplist = pd.read_csv(
-        HIGHLY_USED_ITEMS_URL,
-        sep='\t',
-        header=0,
-        names=[
-            'qid',
-            'entity_usage_count'
-        ],
-        dtype={
-            'qid' : 'str',
-            'entity_usage_count' : 'float'
-        },
-        compression='gzip',
+    # the list is only downloaded if it has changed since the cached copy was stored;
+    # the cache holds int QIDs and usage counts of items with at least MIN_ENTITY_USAGE uses
+    cache = _load_highly_used_items_cache()
+
+    headers = { 'User-Agent': USER_AGENT }
+    if cache is not None and cache['etag'] != '':
+        headers['If-None-Match'] = cache['etag']
+    if cache is not None and cache['last_modified'] != '':
+        headers['If-Modified-Since'] = cache['last_modified']
+
+    response = requests.get(
+        url=HIGHLY_USED_ITEMS_URL,
+        headers=headers,
+        timeout=HTTP_TIMEOUT
+    )
+
+    if response.status_code == 304 and cache is not None:
+        qid_nums, entity_usage_counts = cache['qid_nums'], cache['entity_usage_counts']
+        LOG.info('Highly used item list is unchanged; loaded cached copy')
+    else:
+        response.raise_for_status()
+        qid_nums, entity_usage_counts = _parse_highly_used_item_list(response.content)
+        _dump_highly_used_items_cache(
+            qid_nums,
+            entity_usage_counts,
+            response.headers.get('ETag', ''),
+            response.headers.get('Last-Modified', '')
+        )
+        LOG.info(f'Downloaded highly used item list; cached {qid_nums.shape[0]} items')
+
+    highly_used_items_toplist = pd.DataFrame(
+        data={
+            'qid_num' : qid_nums,
+            'entity_usage_count' : entity_usage_counts.astype('float')
+        }
     )
 
     LOG.info('Retrieved highly used item list')
@@ -439,7 +995,8 @@ def retrieve_highly_used_item_list() -> pd.DataFrame:
     return highly_used_items_toplist
 
 
-def retrieve_wdrfd_links() -> list[str]:
+@timed_stage
+def retrieve_wdrfd_links() -> list[int]:
     response = requests.post(
         url=WIKIDATA_API_ENDPOINT,
         data={
@@ -450,171 +1007,64 @@ def retrieve_wdrfd_links() -> list[str]:
             'pllimit' : 'max',
             'format' : 'json'
         },
-        headers={ 'User-Agent': USER_AGENT }
+        headers={ 'User-Agent': USER_AGENT },
+        timeout=HTTP_TIMEOUT
     )
     payload = response.json()
 
     linked_items = []
     for page_info_dict in payload.get('query', {}).get('pages', {}).values():
         for elem in page_info_dict.get('links', []):
-            linked_items.append(elem.get('title'))
+            title = elem.get('title', '')
+            if title.startswith('Q') and title[1:].isdigit():
+                linked_items.append(int(title[1:]))
 
     LOG.info('Retrieved items linked from WD:RfD')
 
     return linked_items
 
 
-def _amend_change_tags(unpatrolled_changes:pd.DataFrame, change_tags:pd.DataFrame) -> pd.DataFrame:
-    reverted = [ 'mw-reverted' ]
-    unpatrolled_changes = unpatrolled_changes.merge(
-        right=change_tags.loc[change_tags['ctd_name'].isin(reverted), ['rc_id', 'ctd_name']],
-        how='left',
-        on='rc_id'
-    )
-    unpatrolled_changes.rename(columns={'ctd_name' : 'reverted'}, inplace=True)
-
-    suggested_edit = [ 'apps-suggested-edits' ]
-    unpatrolled_changes = unpatrolled_changes.merge(
-        right=change_tags.loc[change_tags['ctd_name'].isin(suggested_edit), ['rc_id', 'ctd_name']],
-        how='left',
-        on='rc_id'
-    )
-    unpatrolled_changes.rename(columns={'ctd_name' : 'suggested_edit'}, inplace=True)
-
-    LOG.info('Amended changed tags to unpatrolled changes')
-
-    return unpatrolled_changes
-
-
 def _amend_edit_summaries(unpatrolled_changes:pd.DataFrame, actions:dict[str, list[str]]) -> pd.DataFrame:
-    unpatrolled_changes = unpatrolled_changes.merge(
-        right=unpatrolled_changes['comment_text'].str.extract(
-            pat=r'^\/\* ((?<!\*\/).+?) \*\/ ?(.*)?',
-            expand=True
-        ),
-        how='left',
-        left_index=True,
-        right_index=True
-    )
-    unpatrolled_changes.rename(
-        columns={
-            0 : 'editsummary-magic',
-            1 : 'editsummary-free'
-        },
-        inplace=True
+    edit_summaries = unpatrolled_changes['comment_text'].str.extract(
+        pat=EDIT_SUMMARY_PATTERN,
+        expand=True
     )
 
-    unpatrolled_changes = unpatrolled_changes.merge(
-        right=unpatrolled_changes['editsummary-magic'].str.extract(
-            pat=r'^([a-z\-]+):(.*)',
-            expand=True
-        ),
-        how='left',
-        left_index=True,
-        right_index=True
-    )
-    unpatrolled_changes.rename(
-        columns={
-            0 : 'editsummary-magic-action',
-            1 : 'editsummary-magic-rest'
-        },
-        inplace=True
-    )
+    filt_claims = edit_summaries['action'].isin(actions['allclaims'])
+    edit_summaries[['property', 'value']] = edit_summaries[['property', 'value']].where(filt_claims)
 
-    unpatrolled_changes = unpatrolled_changes.merge(
-        right=unpatrolled_changes['editsummary-magic-rest'].str.extract(
-            pat=r'^([\d]+)\|([^\|]+)?[\|]?([^\|]+)?[\|]?([^\|]+)?',
-            expand=True
-        ),
-        how='left',
-        left_index=True,
-        right_index=True
-    )
-    unpatrolled_changes.rename(
-        columns={
-            0 : 'editsummary-magic-param0',
-            1 : 'editsummary-magic-param1',
-            2 : 'editsummary-magic-param2',
-            3 : 'editsummary-magic-param3'
-        },
-        inplace=True
-    )
+    magic_actions = edit_summaries['action'].astype('category')
+    broad_categories = _edit_summary_broad_categories(actions)
+    edit_summaries['action_broad'] = magic_actions.map(
+        { magic_action : broad_categories.get(magic_action, 'NO_CAT') for magic_action in magic_actions.cat.categories },
+        na_action='ignore'
+    ).astype('object').fillna('NO_CAT')
 
-    filt_merge = (unpatrolled_changes['editsummary-magic-action'].isin(actions['allclaims']))
-    unpatrolled_changes = unpatrolled_changes.merge(
-        right=unpatrolled_changes.loc[filt_merge, 'editsummary-free'].str.extract(
-            pat=r'^\[\[Property:(P\d+)]]: (.*)$',
-            expand=True
-        ),
-        how='left',
-        left_index=True,
-        right_index=True
-    )
-    unpatrolled_changes.rename(
-        columns={
-            0 : 'editsummary-free-property',
-            1 : 'editsummary-free-value'
-        },
-        inplace=True
-    )
-
-    unpatrolled_changes['editsummary-magic-action-broad'] = \
-        unpatrolled_changes['editsummary-magic-action'].apply(
-            _edit_summary_broad_category,
-            args=(actions,)
-        )
+    edit_summaries.rename(columns=EDIT_SUMMARY_COLUMNS, inplace=True)
+    unpatrolled_changes[list(EDIT_SUMMARY_COLUMNS.values())] = edit_summaries[list(EDIT_SUMMARY_COLUMNS.values())]
 
     LOG.info('Amended edit summary details to unpatrolled changes')
 
     return unpatrolled_changes
 
 
-def _amend_ores_scores(unpatrolled_changes:pd.DataFrame, ores_scores:pd.DataFrame) -> pd.DataFrame:
-    ores_model_names = [ 'damaging', 'goodfaith' ]
-
-    for ores_model_name in ores_model_names:
-        ores_model_ids = _query_ores_model_ids(ores_model_name)
-        filt_merge = (ores_scores['oresc_model'].isin(ores_model_ids))
-        unpatrolled_changes = unpatrolled_changes.merge(
-            right=ores_scores.loc[filt_merge, ['oresc_rev', 'oresc_probability']],
-            how='left',
-            left_on='rc_this_oldid',
-            right_on='oresc_rev'
-        )
-        unpatrolled_changes.rename(
-            columns={
-                'oresc_probability' : f'oresc_{ores_model_name}'
-            },
-            inplace=True
-        )
-        unpatrolled_changes.drop(labels='oresc_rev', axis=1, inplace=True)
-
-    LOG.info('Amended ORES scores to unpatrolled changes')
-
-    return unpatrolled_changes
-
-
+@timed_stage
 def compile_patrol_progress(unpatrolled_changes:pd.DataFrame, \
                             top_patrollers:pd.DataFrame) -> pd.DataFrame:
     action_filter = unpatrolled_changes['editsummary-magic-action-broad'].isin(
         ['label', 'description', 'alias', 'anyterms']
     )
+    patrol_progress = unpatrolled_changes.loc[action_filter, ['rc_this_oldid', 'time', 'actor_name', 'editsummary-magic-param1']]
 
-    patrol_progress = unpatrolled_changes.loc[action_filter].merge(
-        right=top_patrollers,
-        how='left',
-        left_on='rc_this_oldid',
-        right_on='rc_curid'
-    )
+    # first patrol per revision, looked up through a sorted unique integer index
+    patrol_log = top_patrollers.drop_duplicates(subset='rc_curid').set_index('rc_curid').sort_index()
+    patrols = patrol_log.reindex(patrol_progress['rc_this_oldid'])
 
-    try:
-        patrol_progress['log_time'] = pd.to_datetime(
-            arg=patrol_progress['log_timestamp'],
-            format='%Y%m%d%H%M%S'
-        )
-    except ValueError as exception:
-        LOG.warning('ValueError', exception)
-        raise exception
+    patrol_progress = patrol_progress.assign(
+        log_id=patrols['log_id'].array,
+        log_time=patrols['log_time'].array,
+        actor_name_y=patrols['actor_name'].array  # patroller; the name is part of the dumped table header
+    ).reset_index(drop=True)
 
     patrol_progress['patrol_delay'] = patrol_progress['log_time'] \
         - patrol_progress['time']
@@ -628,3 +1078,31 @@ def compile_patrol_progress(unpatrolled_changes:pd.DataFrame, \
     LOG.info('Compiled patrol progress dataframe')
 
     return patrol_progress
+
+
+@timed_stage
+def compile_patrol_delay_stats(patrol_progress:pd.DataFrame) -> PatrolDelayStats:
+    languages = patrol_progress['editsummary-magic-param1']
+    delays = patrol_progress['patrol_delay_seconds']
+
+    describe = delays.groupby(by=languages, observed=True).describe()
+    patrolled_languages = describe.index[describe['count']>0]
+
+    patrolled = delays.notna() & languages.isin(patrolled_languages)
+    hours = delays.loc[patrolled].dt.total_seconds() / 3600
+    hours_by_language = hours.groupby(by=languages.loc[patrolled], observed=True)
+
+    patrol_delay_stats:PatrolDelayStats = {
+        'describe' : describe,
+        'unpatrolled' : delays.isna().groupby(by=languages, observed=True).sum(),
+        'patrollers' : patrol_progress.loc[delays.notna()].groupby(
+            by=[ 'editsummary-magic-param1', 'actor_name_y' ],
+            observed=True
+        ).size(),
+        'percentiles' : hours_by_language.quantile([ percentile/100 for percentile in PATROL_DELAY_PERCENTILES ]).unstack(),
+        'max_hours' : hours_by_language.max().apply(m_ceil),
+    }
+
+    LOG.info(f'Compiled patrol delay statistics for {len(describe.index)} languages')
+
+    return patrol_delay_stats